@@ -0,0 +1,297 @@
+import hashlib
+import json
+import re
+import threading
+import time
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+# --- 스트리밍 JSON 응답에서 analysis/suggestion 필드를 도착하는 대로 꺼내는 파서 ---
+# 응답 전체를 매번 다시 파싱하지 않고 들어온 글자만 한 번씩 처리함.
+class StreamingFeedbackParser:
+    def __init__(self, fields=("analysis", "suggestion")):
+        self._values = {name: [] for name in fields}
+        self._depth = 0
+        self._in_string = False
+        self._string_is_key = False
+        self._escape = False
+        self._unicode = None
+        self._high_surrogate = None
+        self._expect_key = False
+        self._key_chars = []
+        self._current_key = None
+        self._changed = False
+
+    def feed(self, text):
+        self._changed = False
+        for ch in text:
+            if self._in_string:
+                self._feed_string_char(ch)
+            elif ch == '"':
+                self._in_string = True
+                self._string_is_key = self._depth == 1 and self._expect_key
+                self._key_chars = []
+            elif ch in "{[":
+                self._depth += 1
+                if ch == "{" and self._depth == 1:
+                    self._expect_key = True
+            elif ch in "}]":
+                self._depth -= 1
+            elif self._depth == 1 and ch == ":":
+                self._expect_key = False
+            elif self._depth == 1 and ch == ",":
+                self._expect_key = True
+                self._current_key = None
+        return self._changed
+
+    def _feed_string_char(self, ch):
+        if self._unicode is not None:
+            self._unicode += ch
+            if len(self._unicode) == 4:
+                code = int(self._unicode, 16)
+                self._unicode = None
+                if 0xD800 <= code <= 0xDBFF:
+                    self._high_surrogate = code
+                elif 0xDC00 <= code <= 0xDFFF and self._high_surrogate is not None:
+                    self._emit(chr(0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)))
+                    self._high_surrogate = None
+                else:
+                    self._emit(chr(code))
+        elif self._escape:
+            self._escape = False
+            if ch == "u":
+                self._unicode = ""
+            else:
+                self._emit(_ESCAPES.get(ch, ch))
+        elif ch == "\\":
+            self._escape = True
+        elif ch == '"':
+            self._in_string = False
+            if self._string_is_key:
+                self._current_key = "".join(self._key_chars)
+        else:
+            self._emit(ch)
+
+    def _emit(self, ch):
+        if self._string_is_key:
+            self._key_chars.append(ch)
+        elif self._depth == 1 and self._current_key in self._values:
+            self._values[self._current_key].append(ch)
+            self._changed = True
+
+    def values(self):
+        return {name: "".join(chars) for name, chars in self._values.items()}
+
+
+def consume_feedback_stream(stream, on_delta=None, min_interval=0.05, started=None):
+    # OpenAI chat completions 스트림을 끝까지 읽어 (전체 JSON 문자열, 첫 피드백 토큰까지 걸린 시간, 사용량)을 돌려줌.
+    # on_delta는 analysis/suggestion이 바뀔 때 (최대 min_interval 간격으로) 호출됨.
+    # started는 create(stream=True)를 부르기 전에 잰 시각. create()가 응답 헤더를 받을 때까지 기다리므로
+    # 스트림을 받은 뒤부터 재면 첫 토큰까지의 시간이 그만큼 짧게 나옴
+    if started is None:
+        started = time.perf_counter()
+    parser = StreamingFeedbackParser()
+    parts = []
+    first_token_at = None
+    last_emit = 0.0
+    pending = False
+    usage = None
+    for chunk in stream:
+        if getattr(chunk, "usage", None) is not None:
+            usage = chunk.usage
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        parts.append(delta)
+        if parser.feed(delta):
+            now = time.perf_counter()
+            if first_token_at is None:
+                first_token_at = now
+            pending = True
+            if on_delta is not None and now - last_emit >= min_interval:
+                on_delta(parser.values())
+                last_emit = now
+                pending = False
+    if on_delta is not None and pending:
+        on_delta(parser.values())
+    time_to_first_token = (first_token_at - started) if first_token_at is not None else None
+    return "".join(parts), time_to_first_token, usage
+
+
+def validate_feedback(feedback, max_score):
+    # 점수 기록 전에 응답이 약속한 형식을 지켰는지 확인. 문제가 있으면 이유를, 없으면 None을 돌려줌
+    if not isinstance(feedback, dict):
+        return "응답이 JSON 객체가 아닙니다."
+    if not isinstance(feedback.get("scores"), dict):
+        return "scores 항목이 없습니다."
+    try:
+        total_score = int(feedback.get("total_score"))
+    except (TypeError, ValueError):
+        return "total_score가 숫자가 아닙니다."
+    if not 0 <= total_score <= max_score:
+        return f"total_score({total_score})가 0~{max_score} 범위를 벗어났습니다."
+    for field in ("analysis", "suggestion"):
+        if not isinstance(feedback.get(field), str):
+            return f"{field} 항목이 없습니다."
+    return None
+
+
+def parse_feedback(content, max_score):
+    try:
+        feedback = json.loads(content)
+    except (TypeError, ValueError):
+        return None, "응답을 JSON으로 읽을 수 없습니다."
+    return feedback, validate_feedback(feedback, max_score)
+
+
+# --- 모델 단계(cascade): 빠른 모델로 먼저 채점하고, 믿기 어려운 결과만 큰 모델로 다시 채점 ---
+def _score_number(value):
+    # "1", 1, "1점"처럼 모델마다 다르게 쓰는 요소별 점수에서 숫자만 꺼냄
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    match = re.search(r"-?\d+(?:\.\d+)?", str(value))
+    return float(match.group()) if match else None
+
+
+def model_route(routes, q_key, default_model):
+    # 질문별 (빠른 모델, 다시 채점할 모델). 표에 없는 질문은 기본 모델 하나로만 채점함
+    return routes.get(q_key, (default_model, None))
+
+
+def escalation_reason(feedback, validation_error, max_score, min_confidence=0.0, escalate_partial=True):
+    # 빠른 모델의 결과를 그대로 써도 되면 None을, 큰 모델로 다시 채점해야 하면 그 이유를 돌려줌
+    if validation_error:
+        return "invalid"
+    element_scores = [_score_number(value) for value in feedback["scores"].values()]
+    total_score = int(feedback["total_score"])
+    if None in element_scores or (element_scores and sum(element_scores) != total_score):
+        return "inconsistent"
+    confidence = _score_number(feedback.get("confidence", ""))
+    if confidence is not None and confidence < min_confidence:
+        return "low_confidence"
+    # 2점 문항의 부분 점수(1점)는 채점자 사이에서도 갈리기 쉬운 경계라 다시 확인함
+    if escalate_partial and max_score > 1 and 0 < total_score < max_score:
+        return "borderline"
+    return None
+
+
+class ModelCascadeStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_tier = {}
+        self._by_question = {}
+
+    def record_call(self, tier, model, usage, latency):
+        with self._lock:
+            row = self._by_tier.setdefault(f"{tier}:{model}", {
+                "calls": 0, "latency_total": 0.0, "prompt_tokens": 0, "completion_tokens": 0
+            })
+            row["calls"] += 1
+            row["latency_total"] += latency
+            if usage is not None:
+                row["prompt_tokens"] += usage.prompt_tokens or 0
+                row["completion_tokens"] += usage.completion_tokens or 0
+
+    def record_result(self, q_key, reason, fallback=False):
+        # reason: 다시 채점한 이유 (빠른 모델 결과를 그대로 썼으면 None), fallback: 재채점이 실패해 빠른 모델 결과를 씀
+        with self._lock:
+            row = self._by_question.setdefault(q_key, {"graded": 0, "escalated": 0, "fallbacks": 0, "reasons": {}})
+            row["graded"] += 1
+            if reason is not None:
+                row["escalated"] += 1
+                row["reasons"][reason] = row["reasons"].get(reason, 0) + 1
+            if fallback:
+                row["fallbacks"] += 1
+
+    def stats(self):
+        with self._lock:
+            by_tier = {key: dict(row) for key, row in self._by_tier.items()}
+            by_question = {q_key: dict(row, reasons=dict(row["reasons"])) for q_key, row in self._by_question.items()}
+        for row in by_tier.values():
+            row["mean_latency"] = row.pop("latency_total") / row["calls"] if row["calls"] else 0.0
+        graded = sum(row["graded"] for row in by_question.values())
+        escalated = sum(row["escalated"] for row in by_question.values())
+        return {
+            "graded": graded,
+            "escalated": escalated,
+            "escalation_rate": escalated / graded if graded else 0.0,
+            "by_tier": by_tier,
+            "by_question": by_question,
+        }
+
+
+# --- 질문별 프롬프트 미리 만들기 ---
+# 지시사항·채점 기준·모범 답안은 질문마다 고정이므로 한 번만 만들어 맨 앞 system 메시지로 두고,
+# 학생 답변만 뒤따르는 user 메시지로 보냄. 앞부분이 요청마다 똑같아야 제공자 쪽 프롬프트 캐시가 재사용됨.
+class CompiledPrompt:
+    def __init__(self, q_key, system_prompt, answer_template, max_score, criteria=""):
+        self.q_key = q_key
+        self.system_prompt = system_prompt
+        self.answer_template = answer_template
+        self.max_score = max_score
+        # 규칙 채점(pre_grader)이 채점 요소 이름을 꺼낼 때 씀
+        self.criteria = criteria
+        self.fingerprint = hashlib.sha256((system_prompt + "\x00" + answer_template).encode("utf-8")).hexdigest()
+
+    def messages(self, student_answer):
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": self.answer_template.format(student_answer=student_answer)}
+        ]
+
+
+def compile_prompts(questions, scoring_rubric, model_answers, prompt_template, answer_template):
+    compiled = {}
+    for q_key, q_info in questions.items():
+        dimension = q_info["dimension"]
+        criteria_key = next((key for key in scoring_rubric.get(dimension, {}) if q_key.startswith(key)), q_key)
+        criteria_text = scoring_rubric.get(dimension, {}).get(criteria_key, "채점 기준을 찾을 수 없습니다.")
+        model_answer_text = model_answers.get(q_key, "해당 질문에 대한 모범 답안이 제공되지 않았습니다.")
+        system_prompt = prompt_template.format(
+            dimension=dimension,
+            question_text=q_info["text"],
+            scoring_criteria=criteria_text,
+            model_answer=model_answer_text
+        )
+        compiled[q_key] = CompiledPrompt(q_key, system_prompt, answer_template, q_info["max_score"], criteria_text)
+    return compiled
+
+
+# --- 토큰 사용량 집계 ---
+class TokenUsageLedger:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_question = {}
+
+    def record(self, q_key, usage, latency):
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None) or 0
+        with self._lock:
+            row = self._by_question.setdefault(q_key, {
+                "calls": 0, "prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0,
+                "latency_total": 0.0, "cached_calls": 0, "cached_latency_total": 0.0
+            })
+            row["calls"] += 1
+            row["prompt_tokens"] += usage.prompt_tokens or 0
+            row["cached_prompt_tokens"] += cached_tokens
+            row["completion_tokens"] += usage.completion_tokens or 0
+            row["latency_total"] += latency
+            if cached_tokens:
+                # 프롬프트 캐시가 적중한 호출만 따로 모아 지연 시간을 비교할 수 있게 함
+                row["cached_calls"] += 1
+                row["cached_latency_total"] += latency
+
+    def summary(self):
+        with self._lock:
+            by_question = {q_key: dict(row) for q_key, row in self._by_question.items()}
+        totals = {"calls": 0, "prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0}
+        for row in by_question.values():
+            for key in totals:
+                totals[key] += row[key]
+        totals["cached_share"] = totals["cached_prompt_tokens"] / totals["prompt_tokens"] if totals["prompt_tokens"] else 0.0
+        return {"totals": totals, "by_question": by_question}
@@ -0,0 +1,196 @@
+import itertools
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerTimeout(Exception):
+    pass
+
+
+def is_retryable_error(exc):
+    # 429(요청/토큰 한도)와 5xx, 연결 끊김/시간 초과만 다시 시도함
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return type(exc).__name__ in ("APITimeoutError", "APIConnectionError") or isinstance(exc, (TimeoutError, ConnectionError))
+
+
+def retry_after_seconds(exc):
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+# --- 분당 한도를 지키는 토큰 버킷 ---
+class TokenBucket:
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        # amount만큼 꺼낼 수 있을 때까지 남은 시간 (0이면 지금 바로 가능)
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount):
+        # 실제 사용량이 추정치와 다를 때 차이만큼 되돌리거나 더 차감 (음수가 되면 다음 요청이 그만큼 기다림)
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class Ticket:
+    def __init__(self, ticket_id, estimated_tokens, deadline):
+        self.id = ticket_id
+        self.estimated_tokens = estimated_tokens
+        self.deadline = deadline
+        self.enqueued_at = time.monotonic()
+        self.admitted_at = None
+        self.waited = False
+        self.actual_tokens = None
+
+    def remaining(self):
+        return max(0.0, self.deadline - time.monotonic())
+
+    def record_usage(self, total_tokens):
+        self.actual_tokens = total_tokens
+
+
+# --- 학급 전체가 공유하는 OpenAI 요청 스케줄러 ---
+# 요청 수/토큰 수 버킷과 동시 실행 상한으로 입장을 제한하고, 기다리는 학생에게는 대기 순번을 알려줌.
+class AIRequestScheduler:
+    def __init__(self, max_concurrency=8, requests_per_minute=500, tokens_per_minute=300000,
+                 max_retries=4, base_backoff=1.0, max_backoff=30.0, default_deadline=90.0):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.default_deadline = default_deadline
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._cond = threading.Condition()
+        self._waiting = deque()
+        self._active = 0
+        self._ids = itertools.count(1)
+        self._stats = {"admitted": 0, "completed": 0, "retries": 0, "timeouts": 0, "failures": 0, "max_queue": 0}
+
+    def _admission_wait(self, ticket, now):
+        if self._waiting[0] is not ticket or self._active >= self.max_concurrency:
+            return None
+        return max(self._requests.wait_time(1, now), self._tokens.wait_time(ticket.estimated_tokens, now))
+
+    @contextmanager
+    def slot(self, estimated_tokens, deadline=None, on_wait=None):
+        ticket = Ticket(next(self._ids), estimated_tokens, deadline or time.monotonic() + self.default_deadline)
+        self._acquire(ticket, on_wait)
+        try:
+            if on_wait is not None and ticket.waited:
+                on_wait(0)
+            yield ticket
+        finally:
+            self._release(ticket)
+
+    def _acquire(self, ticket, on_wait):
+        last_position = None
+        with self._cond:
+            self._waiting.append(ticket)
+            self._stats["max_queue"] = max(self._stats["max_queue"], len(self._waiting))
+        try:
+            while True:
+                with self._cond:
+                    now = time.monotonic()
+                    wait = self._admission_wait(ticket, now)
+                    if wait == 0.0:
+                        self._waiting.popleft()
+                        self._requests.consume(1)
+                        self._tokens.consume(ticket.estimated_tokens)
+                        self._active += 1
+                        self._stats["admitted"] += 1
+                        ticket.admitted_at = now
+                        self._cond.notify_all()
+                        metrics.observe("ai_scheduler.queue_wait", now - ticket.enqueued_at)
+                        return
+                    if now >= ticket.deadline:
+                        self._stats["timeouts"] += 1
+                        metrics.increment("ai_scheduler_timeouts_total")
+                        raise SchedulerTimeout("대기 시간이 초과되었습니다.")
+                    position = self._waiting.index(ticket) + 1
+                    self._cond.wait(min(wait if wait is not None else 0.5, ticket.deadline - now, 0.5))
+                if on_wait is not None and position != last_position:
+                    ticket.waited = True
+                    on_wait(position)
+                    last_position = position
+        except BaseException:
+            # 시간 초과나 Streamlit 재실행으로 중단되면 대기열에서 빠져 뒤 사람을 막지 않게 함
+            with self._cond:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                self._cond.notify_all()
+            raise
+
+    def _release(self, ticket):
+        with self._cond:
+            self._active -= 1
+            if ticket.actual_tokens is not None:
+                self._tokens.adjust(ticket.actual_tokens - ticket.estimated_tokens)
+            self._cond.notify_all()
+
+    def call(self, fn, estimated_tokens, deadline=None, on_wait=None, on_retry=None):
+        # fn(ticket)을 실행하고, 다시 시도할 만한 오류면 지터가 섞인 지수 백오프 후 재시도.
+        # 재시도도 처음 요청의 마감 시간 안에서만 함.
+        deadline = deadline or time.monotonic() + self.default_deadline
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.slot(estimated_tokens, deadline, on_wait) as ticket:
+                    result = fn(ticket)
+                with self._cond:
+                    self._stats["completed"] += 1
+                return result
+            except SchedulerTimeout:
+                raise
+            except Exception as e:
+                if not is_retryable_error(e) or attempt == self.max_retries:
+                    with self._cond:
+                        self._stats["failures"] += 1
+                    raise
+                delay = retry_after_seconds(e) or min(self.max_backoff, self.base_backoff * (2 ** attempt))
+                delay *= random.uniform(0.8, 1.2)
+                if time.monotonic() + delay >= deadline:
+                    with self._cond:
+                        self._stats["timeouts"] += 1
+                    raise SchedulerTimeout("재시도할 시간이 남아 있지 않습니다.") from e
+                with self._cond:
+                    self._stats["retries"] += 1
+                metrics.increment("openai_retries_total", error=type(e).__name__)
+                logger.warning("OpenAI 요청 실패, %.1f초 후 재시도합니다 (%d/%d): %s", delay, attempt + 1, self.max_retries, e)
+                if on_retry is not None:
+                    on_retry(attempt + 1, self.max_retries)
+                time.sleep(delay)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["active"] = self._active
+            stats["waiting"] = len(self._waiting)
+        return stats
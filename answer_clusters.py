@@ -0,0 +1,236 @@
+# 교사가 비슷한 최종 답변을 묶음(cluster) 단위로 한 번에 검토하도록 질문별 답변 색인을 유지함
+# 답변은 문자 2~3-gram을 해싱한 고정 길이 벡터로 바꿈. 모델 파일이나 네트워크가 필요 없고, 띄어쓰기/조사 차이에도 강함.
+# 새 최종 제출이 들어오면 그 행만 벡터로 바꿔 색인 끝에 붙이고 가장 가까운 묶음에 넣음 (전체를 다시 계산하지 않음).
+import re
+import threading
+import unicodedata
+
+import numpy as np
+
+NGRAM_SIZES = (2, 3)
+_SPACES = re.compile(r"\s+")
+_PRIME = np.uint64(1000003)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_SIGN_BIT = np.uint64(1 << 31)
+
+
+def normalize_answer(text):
+    return _SPACES.sub(" ", unicodedata.normalize("NFKC", text or "").lower()).strip()
+
+
+class CharNgramVectorizer:
+    def __init__(self, n_features=1024, ngram_sizes=NGRAM_SIZES):
+        self.n_features = n_features
+        self.ngram_sizes = ngram_sizes
+
+    def transform_one(self, text):
+        # 글자 코드 배열에서 n-gram 해시를 한 번에 계산하고 bincount로 열마다 더함 (n-gram마다 도는 Python 반복 없음)
+        codes = np.frombuffer(normalize_answer(text).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        vector = np.zeros(self.n_features, dtype=np.float64)
+        for n in self.ngram_sizes:
+            count = len(codes) - n + 1
+            if count <= 0:
+                continue
+            hashes = np.full(count, n, dtype=np.uint64)
+            for i in range(n):
+                hashes = hashes * _PRIME + codes[i:i + count]
+            hashes *= _MIX
+            columns = ((hashes >> np.uint64(32)) % np.uint64(self.n_features)).astype(np.intp)
+            # 부호를 섞어 해시 충돌로 값이 한쪽으로 쌓이지 않게 함
+            signs = np.where(hashes & _SIGN_BIT, 1.0, -1.0)
+            vector += np.bincount(columns, weights=signs, minlength=self.n_features)
+        # 같은 표현을 여러 번 반복한 답변이 지나치게 커지지 않도록 로그로 줄인 뒤 길이를 1로 맞춤
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).astype(np.float32)
+
+    def transform(self, texts):
+        if not texts:
+            return np.zeros((0, self.n_features), dtype=np.float32)
+        return np.vstack([self.transform_one(text) for text in texts])
+
+
+def _grow(array, size):
+    # 행이 모자라면 두 배로 늘림 (추가할 때마다 배열 전체를 복사하지 않게)
+    if size <= len(array):
+        return array
+    grown = np.zeros((max(size, 2 * len(array)),) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+# --- 한 질문의 답변 색인과 묶음 ---
+# 묶음은 순서대로 들어온 답변을 가장 가까운 묶음 중심과 비교해, 유사도가 threshold 이상이면 그 묶음에 넣고 아니면 새 묶음을 만듦.
+# 학생마다 가장 최근 최종 답변 하나만 두고, 다시 제출하면 이전 답변을 묶음에서 빼고 새 답변을 넣음.
+class AnswerIndex:
+    def __init__(self, vectorizer, threshold=0.6, initial_capacity=64):
+        self.vectorizer = vectorizer
+        self.threshold = threshold
+        dims = vectorizer.n_features
+        self._vectors = np.zeros((initial_capacity, dims), dtype=np.float32)
+        self._active = np.zeros(initial_capacity, dtype=bool)
+        self._cluster = np.full(initial_capacity, -1, dtype=np.int32)
+        self._size = 0
+        self._keys = []
+        self._payloads = []
+        self._positions = {}
+        # 묶음 중심: 합계 벡터와, 비교에 쓰는 길이 1로 맞춘 벡터 (바뀐 묶음만 다시 계산)
+        self._sums = np.zeros((initial_capacity, dims), dtype=np.float32)
+        self._centroids = np.zeros((initial_capacity, dims), dtype=np.float32)
+        self._cluster_sizes = np.zeros(initial_capacity, dtype=np.int32)
+        self._n_clusters = 0
+
+    def __len__(self):
+        return len(self._positions)
+
+    def add(self, key, text, **payload):
+        self.add_vector(key, self.vectorizer.transform_one(text), dict(payload, answer=text))
+
+    def add_many(self, items):
+        # items: (key, text, payload dict) 목록. 벡터는 한 번에 만들고 묶음 배정은 들어온 순서대로 함
+        items = list(items)
+        vectors = self.vectorizer.transform([text for _, text, _ in items])
+        for (key, text, payload), vector in zip(items, vectors):
+            self.add_vector(key, vector, dict(payload, answer=text))
+
+    def add_vector(self, key, vector, payload):
+        if key in self._positions:
+            self._remove(self._positions[key])
+        position = self._size
+        self._size += 1
+        self._vectors = _grow(self._vectors, self._size)
+        self._active = _grow(self._active, self._size)
+        self._cluster = _grow(self._cluster, self._size)
+        self._vectors[position] = vector
+        self._active[position] = True
+        self._keys.append(key)
+        self._payloads.append(payload)
+        self._positions[key] = position
+        self._cluster[position] = self._assign(vector)
+
+    def _assign(self, vector):
+        if self._n_clusters:
+            similarities = self._centroids[:self._n_clusters] @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                self._update_cluster(best, vector, 1)
+                return best
+        cluster = self._n_clusters
+        self._n_clusters += 1
+        self._sums = _grow(self._sums, self._n_clusters)
+        self._centroids = _grow(self._centroids, self._n_clusters)
+        self._cluster_sizes = _grow(self._cluster_sizes, self._n_clusters)
+        self._update_cluster(cluster, vector, 1)
+        return cluster
+
+    def _update_cluster(self, cluster, vector, sign):
+        self._sums[cluster] += sign * vector
+        self._cluster_sizes[cluster] += sign
+        norm = np.linalg.norm(self._sums[cluster])
+        # 비어 버린 묶음은 중심을 0으로 두어 다시 고르지 않게 함
+        self._centroids[cluster] = self._sums[cluster] / norm if self._cluster_sizes[cluster] and norm else 0.0
+
+    def _remove(self, position):
+        self._active[position] = False
+        self._update_cluster(self._cluster[position], self._vectors[position], -1)
+        self._payloads[position] = None
+
+    def query(self, text, k=10):
+        # 주어진 글과 가장 비슷한 답변 k개: [(key, 유사도, payload)]
+        if not self._positions:
+            return []
+        similarities = self._vectors[:self._size] @ self.vectorizer.transform_one(text)
+        similarities[~self._active[:self._size]] = -np.inf
+        k = min(k, len(self._positions))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        return [(self._keys[i], float(similarities[i]), self._payloads[i]) for i in top]
+
+    def clusters(self):
+        # 큰 묶음부터: 묶음 번호, 답변 수, 중심에 가까운 순서의 구성원 [(key, 중심과의 유사도, payload)]
+        positions = np.flatnonzero(self._active[:self._size])
+        if not len(positions):
+            return []
+        cluster_ids = self._cluster[positions]
+        similarities = np.einsum("ij,ij->i", self._vectors[positions], self._centroids[cluster_ids])
+        result = []
+        for cluster in np.unique(cluster_ids):
+            members = positions[cluster_ids == cluster]
+            member_similarities = similarities[cluster_ids == cluster]
+            order = np.argsort(-member_similarities)
+            result.append({
+                "cluster": int(cluster),
+                "size": int(len(members)),
+                "cohesion": float(member_similarities.mean()),
+                "members": [(self._keys[members[i]], float(member_similarities[i]), self._payloads[members[i]]) for i in order],
+            })
+        result.sort(key=lambda c: (-c["size"], c["cluster"]))
+        return result
+
+    def stats(self):
+        return {
+            "answers": len(self._positions),
+            "clusters": int(np.count_nonzero(self._cluster_sizes[:self._n_clusters])),
+            "bytes": int(self._vectors.nbytes + self._sums.nbytes + self._centroids.nbytes),
+        }
+
+
+def score_distribution(members, max_score):
+    # 묶음 구성원의 AI total_score 분포: {점수: 답변 수} (0점부터 만점까지 모두 포함)
+    counts = {score: 0 for score in range(int(max_score) + 1)}
+    for _, _, payload in members:
+        score = payload.get("total_score")
+        if score is not None:
+            counts[int(score)] = counts.get(int(score), 0) + 1
+    return counts
+
+
+# --- 모든 질문의 색인: 저장소에 새로 들어온 최종 제출만 읽어 붙임 ---
+class AnswerClusterIndex:
+    def __init__(self, n_features=1024, threshold=0.6):
+        self.vectorizer = CharNgramVectorizer(n_features)
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._last_id = 0
+
+    def sync(self, store):
+        # 마지막으로 읽은 행 뒤의 최종 제출만 가져와 질문별 색인에 넣음. 반환값: 새로 넣은 답변 수
+        with self._lock:
+            rows = store.final_answers(self._last_id)
+            by_question = {}
+            for row in rows:
+                by_question.setdefault(row["question_id"], []).append(
+                    (row["student_name"], row["answer"], {"id": row["id"], "total_score": row["total_score"]})
+                )
+            for question_id, items in by_question.items():
+                self._index(question_id).add_many(items)
+            if rows:
+                self._last_id = rows[-1]["id"]
+            return len(rows)
+
+    def _index(self, question_id):
+        index = self._indexes.get(question_id)
+        if index is None:
+            index = self._indexes[question_id] = AnswerIndex(self.vectorizer, self.threshold)
+        return index
+
+    def clusters(self, question_id):
+        with self._lock:
+            index = self._indexes.get(question_id)
+            return index.clusters() if index is not None else []
+
+    def query(self, question_id, text, k=10):
+        with self._lock:
+            index = self._indexes.get(question_id)
+            return index.query(text, k) if index is not None else []
+
+    def stats(self):
+        with self._lock:
+            by_question = {question_id: index.stats() for question_id, index in self._indexes.items()}
+        return {
+            "answers": sum(row["answers"] for row in by_question.values()),
+            "clusters": sum(row["clusters"] for row in by_question.values()),
+            "bytes": sum(row["bytes"] for row in by_question.values()),
+            "by_question": by_question,
+        }
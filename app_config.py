@@ -0,0 +1,52 @@
+# 앱 설정 기본값
+# streamlit_app.py와 오프라인 도구(tools/)가 같은 값을 쓰도록 Streamlit에 의존하지 않는 별도 모듈로 둠
+CONFIG = {
+    "TEACHER_PASSWORD": "2025",
+    "AI_MODEL": "gpt-4-turbo",  # AI_MODEL_ROUTES에 없는 질문에 씀
+    # 질문별 (먼저 부르는 빠른 모델, 결과가 믿기 어려울 때 다시 채점할 모델). 두 번째를 None으로 두면 다시 채점하지 않음
+    "AI_MODEL_ROUTES": {
+        "1-1": ("gpt-4o-mini", "gpt-4-turbo"),
+        "1-2": ("gpt-4o-mini", "gpt-4-turbo"),
+        "1-3": ("gpt-4o-mini", "gpt-4-turbo"),
+        "2-1": ("gpt-4o", "gpt-4-turbo"),
+        "2-2": ("gpt-4o", "gpt-4-turbo"),
+        "3-1": ("gpt-4o", "gpt-4-turbo"),
+        "3-2": ("gpt-4o", "gpt-4-turbo"),
+    },
+    "AI_MIN_CONFIDENCE": 0.7,  # 빠른 모델이 밝힌 확신도가 이보다 낮으면 다시 채점
+    # True면 2점 문항의 부분 점수(1점)도 모두 다시 채점함. 부분 점수는 흔한 정상 결과라 기본은 확신도로만 판단
+    "AI_ESCALATE_PARTIAL_SCORE": False,
+    "AI_TEMPERATURE": 0.3,
+    "AI_STREAMING": True,
+    "AI_MAX_CONCURRENCY": 8,
+    "AI_REQUESTS_PER_MINUTE": 500,
+    "AI_TOKENS_PER_MINUTE": 300000,
+    "AI_MAX_RETRIES": 4,
+    "AI_REQUEST_DEADLINE": 90,
+    "AI_COMPLETION_TOKEN_ESTIMATE": 800,
+    "MIN_ANSWER_LENGTH": 10,
+    "PRE_GRADER": True,
+    "GSHEET_NAME": "trigonometric music",
+    "LOCAL_DB_PATH": "class_data.sqlite3",
+    "SHEETS_MIRROR": True,
+    "SHEET_JOURNAL_PATH": "sheet_journal.jsonl",  # 이전 버전의 Sheets 저널 (시작할 때 저장소로 옮김)
+    "SHEET_HANDLE_TTL": 600,
+    "FEEDBACK_CACHE_DIR": "ai_feedback_cache",
+    "FEEDBACK_CACHE_MAX_ENTRIES": 2000,
+    "FEEDBACK_CACHE_MAX_AGE": 7 * 24 * 3600,
+    "IMAGE_UPLOAD_DIR": "image_uploads",
+    "IMAGE_MAX_SIDE": 1600,
+    "IMAGE_THUMB_SIDE": 320,
+    "IMAGE_INGEST_WORKERS": 2,
+    "SOUND_SAMPLE_RATE": 22050,
+    "SOUND_CACHE_ENTRIES": 256,
+    "SOUND_MAX_DURATION": 5.0,
+    "ANSWER_CLUSTER_FEATURES": 1024,  # 답변 벡터 길이 (문자 n-gram 해시 열 수)
+    "ANSWER_CLUSTER_THRESHOLD": 0.6,  # 묶음 중심과의 코사인 유사도가 이 이상이면 같은 묶음
+    "SESSION_IDLE_TIMEOUT": 1800,
+    "MEMORY_LOG_INTERVAL": 60,
+    "METRICS_DUMP_DIR": "metrics",  # 비워 두면 파일로 내보내지 않음
+    "METRICS_DUMP_INTERVAL": 15,
+    "WARMUP_DELAY": 1.0,
+    "WARMUP_IMPORTS": ["openai", "pandas", "gspread", "google.oauth2.service_account", "PIL.Image"]
+}
@@ -0,0 +1,116 @@
+# 교사 대시보드의 학급 전체 통계
+# 모든 학생의 제출 기록을 한 번에 DataFrame으로 읽어 group-by로 집계함 (학생별 반복문 없음).
+import numpy as np
+import pandas as pd
+
+ACHIEVEMENT_BINS = [0, 25, 50, 75, np.inf]
+ACHIEVEMENT_LABELS = ["0~25%", "25~50%", "50~75%", "75~100%"]
+ATTEMPT_BUCKETS = [0, 1, 2, 3, np.inf]
+ATTEMPT_LABELS = ["1회", "2회", "3회", "4회 이상"]
+
+
+def submissions_frame(rows):
+    frame = pd.DataFrame.from_records(
+        [tuple(row) for row in rows],
+        columns=["id", "student_name", "question_id", "attempt", "is_final", "total_score"]
+    )
+    frame["is_final"] = frame["is_final"].astype(bool)
+    frame["total_score"] = pd.to_numeric(frame["total_score"], errors="coerce").fillna(0)
+    return frame
+
+
+def compute_class_overview(rows, questions, question_order):
+    frame = submissions_frame(rows)
+    frame = frame[frame["question_id"].isin(question_order)]
+    if frame.empty:
+        return None
+
+    question_info = pd.DataFrame.from_dict(questions, orient="index")[["dimension", "max_score"]]
+    frame = frame.join(question_info, on="question_id")
+
+    # 학생·질문마다 마지막 최종 제출 한 건과, 최종 제출 전 첫 피드백 한 건
+    finals = frame[frame["is_final"]].sort_values("id").drop_duplicates(["student_name", "question_id"], keep="last")
+    first_tries = frame[~frame["is_final"]].sort_values("id").drop_duplicates(["student_name", "question_id"], keep="first")
+
+    achievement = _dimension_scores(finals, questions)
+    return {
+        "summary": _summary(frame, finals, question_order),
+        "dimension_scores": achievement,
+        "dimension_distribution": _dimension_distribution(achievement),
+        "attempts": _attempts_to_completion(frame, finals, question_order),
+        "improvement": _improvement(first_tries, finals, question_order),
+    }
+
+
+def _summary(frame, finals, question_order):
+    completed_questions = finals.groupby("student_name")["question_id"].nunique()
+    return {
+        "students": int(frame["student_name"].nunique()),
+        "submissions": int(len(frame)),
+        "completed_students": int((completed_questions >= len(question_order)).sum()),
+        "final_answers": int(len(finals)),
+    }
+
+
+def _dimension_scores(finals, questions):
+    # 학생 × 평가 차원 성취도(%) 표. 최종 제출한 질문만 분모에 포함 (completion_page의 리포트와 같은 기준)
+    totals = finals.groupby(["student_name", "dimension"])[["total_score", "max_score"]].sum()
+    achievement = (totals["total_score"] / totals["max_score"].replace(0, np.nan) * 100).clip(0, 100)
+    achievement = achievement.unstack("dimension")
+    dimensions = list(dict.fromkeys(info["dimension"] for info in questions.values()))
+    # 아직 최종 제출이 하나도 없으면 열이 없는 표가 되므로, 평가 차원 열은 항상 모두 둠 (값은 NaN)
+    achievement = achievement.reindex(columns=dimensions).astype(float)
+    achievement.index.name = "학생"
+    achievement.columns.name = "평가 차원"
+    return achievement
+
+
+def _dimension_distribution(achievement):
+    stats = achievement.describe(percentiles=[0.25, 0.5, 0.75]).T[["count", "mean", "25%", "50%", "75%"]]
+    stats.columns = ["학생 수", "평균(%)", "하위 25%", "중앙값", "상위 25%"]
+    stats["학생 수"] = stats["학생 수"].astype(int)
+    # 구간별 학생 수 (열 전체를 한 번에 구간으로 나눠 셈)
+    long = achievement.melt(var_name="dimension", value_name="achievement").dropna()
+    long["구간"] = pd.cut(long["achievement"], ACHIEVEMENT_BINS, labels=ACHIEVEMENT_LABELS, right=False)
+    histogram = long.groupby(["dimension", "구간"], observed=False).size().unstack("구간", fill_value=0)
+    stats = stats.join(histogram.reindex(index=stats.index, columns=ACHIEVEMENT_LABELS, fill_value=0))
+    stats.index.name = "평가 차원"
+    return stats
+
+
+def _attempts_to_completion(frame, finals, question_order):
+    # 최종 제출까지 받은 AI 피드백 횟수 (최종 행의 attempt 값)
+    attempts = finals.set_index(["student_name", "question_id"])["attempt"].clip(lower=1)
+    grouped = attempts.groupby("question_id")
+    stats = grouped.agg(["count", "mean", "median"])
+    stats.columns = ["완료 학생 수", "평균 시도", "중앙값"]
+    stats["상위 10%"] = grouped.quantile(0.9)
+    buckets = pd.cut(attempts, ATTEMPT_BUCKETS, labels=ATTEMPT_LABELS)
+    histogram = buckets.groupby(level="question_id", observed=False).value_counts().unstack(fill_value=0)
+    started = frame.groupby("question_id")["student_name"].nunique()
+    stats = stats.join(histogram).reindex(question_order)
+    stats["시작한 학생 수"] = started.reindex(question_order).fillna(0).astype(int)
+    stats["완료율(%)"] = stats["완료 학생 수"].fillna(0) / stats["시작한 학생 수"].replace(0, np.nan) * 100
+    stats.index.name = "질문"
+    return stats
+
+
+def _improvement(first_tries, finals, question_order):
+    # 첫 피드백 점수 → 최종 제출 점수 변화 (두 기록이 모두 있는 학생·질문만)
+    keys = ["student_name", "question_id"]
+    paired = first_tries[keys + ["total_score", "max_score"]].merge(
+        finals[keys + ["total_score"]], on=keys, suffixes=("_first", "_final")
+    )
+    paired["delta"] = paired["total_score_final"] - paired["total_score_first"]
+    paired["improved"] = (paired["delta"] > 0) * 100.0
+    stats = paired.groupby("question_id").agg(
+        pairs=("delta", "size"),
+        first_mean=("total_score_first", "mean"),
+        final_mean=("total_score_final", "mean"),
+        delta_mean=("delta", "mean"),
+        improved=("improved", "mean"),
+        max_score=("max_score", "first"),
+    ).reindex(question_order)
+    stats.columns = ["학생 수", "첫 점수 평균", "최종 점수 평균", "평균 향상", "향상된 비율(%)", "만점"]
+    stats.index.name = "질문"
+    return stats
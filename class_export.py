@@ -0,0 +1,227 @@
+# 학급 전체 기록 내보내기 (Parquet, gzip CSV)
+# 저장소(또는 Sheets)에서 행을 조금씩 읽어 정규화하고, row group 크기만큼 모이면 바로 파일에 씀 (학생 수가 많아도 메모리 사용량이 일정함).
+# Scores(JSON) 열은 채점 요소별 정수 열로 펼치고, 수업 만족도(Final_Feedback) 행은 별도 파일로 나눔.
+import io
+import json
+import os
+import tempfile
+import zipfile
+from datetime import datetime
+
+import metrics
+from gsheet_sync import a1_range
+from local_store import parse_sheet_row
+from pre_grader import rubric_elements
+
+SUBMISSION_COLUMNS = [
+    "created_at", "student_name", "question_id", "dimension", "attempt", "is_final", "total_score", "max_score",
+    "graded_by", "question_text", "answer", "image_path", "analysis", "suggestion",
+]
+FINAL_FEEDBACK_COLUMNS = ["created_at", "student_name", "rating", "good_points", "bad_points"]
+
+
+def score_elements(scoring_rubric):
+    # 채점 기준 전체에 나오는 요소 이름 (열 순서는 기준에 나온 순서)
+    elements = []
+    for criteria_by_question in scoring_rubric.values():
+        for criteria in criteria_by_question.values():
+            for name, _ in rubric_elements(criteria):
+                if name not in elements:
+                    elements.append(name)
+    return elements
+
+
+def score_column(element):
+    return f"score_{element}"
+
+
+def _to_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _load_json(text):
+    try:
+        value = json.loads(text) if text else {}
+    except ValueError:
+        return {}
+    return value if isinstance(value, dict) else {}
+
+
+def _parse_timestamp(text):
+    # 저장 형식("%Y-%m-%d %H:%M:%S")은 ISO 형식이라 strptime보다 훨씬 빠른 fromisoformat으로 읽음
+    try:
+        return datetime.fromisoformat(text)
+    except (TypeError, ValueError):
+        return None
+
+
+# --- 원본: (표 이름, 저장소 열 값 dict)를 차례로 돌려줌 ---
+def store_rows(store, batch_size=1000):
+    for row in store.iter_submissions(batch_size):
+        yield "submissions", row
+    for row in store.iter_final_feedback(batch_size):
+        yield "final_feedback", row
+
+
+def sheet_rows(handles, ranges_per_request=100, last_column="J", exclude=("Sheet1", "기본시트")):
+    # 워크시트 ranges_per_request개를 values_batch_get 한 번으로 받아 다 돌려준 뒤 다음 묶음을 받음
+    # (수업 한 반이면 요청 한 번. 받은 묶음 말고는 메모리에 들고 있지 않음)
+    titles = sorted(title for title in handles.worksheets() if title not in exclude)
+    spreadsheet = handles.spreadsheet()
+    for start in range(0, len(titles), ranges_per_request):
+        chunk = titles[start:start + ranges_per_request]
+        with metrics.span("sheets.values_batch_get"):
+            response = spreadsheet.values_batch_get([a1_range(title, f"A1:{last_column}") for title in chunk])
+        handles.count_api_call()
+        for title, value_range in zip(chunk, response.get("valueRanges", [])):
+            for row in value_range.get("values", []):
+                parsed = parse_sheet_row(title, row)
+                if parsed is not None:
+                    yield parsed
+
+
+# --- 정규화 ---
+def normalize_submission(row, elements, questions):
+    feedback = _load_json(row["feedback"])
+    question = questions.get(row["question_id"], {})
+    record = {
+        "created_at": _parse_timestamp(row["created_at"]),
+        "student_name": row["student_name"],
+        "question_id": row["question_id"],
+        "dimension": question.get("dimension"),
+        "attempt": _to_int(row["attempt"]),
+        "is_final": bool(row["is_final"]),
+        "total_score": _to_int(row["total_score"]),
+        "max_score": question.get("max_score"),
+        "graded_by": feedback.get("graded_by", ""),
+        "question_text": row["question_text"],
+        "answer": row["answer"],
+        "image_path": row["image_path"],
+        "analysis": feedback.get("analysis", ""),
+        "suggestion": feedback.get("suggestion", ""),
+    }
+    # 채점 기준에 없는 이름으로 돌아온 점수도 버리지 않고 scores_other(JSON)에 남김
+    other = {}
+    for name, value in _load_json(row["scores"]).items():
+        if name in elements:
+            record[score_column(name)] = _to_int(value)
+        else:
+            other[name] = value
+    record["scores_other"] = json.dumps(other, ensure_ascii=False) if other else ""
+    return record
+
+
+def normalize_final_feedback(row):
+    return {
+        "created_at": _parse_timestamp(row["created_at"]),
+        "student_name": row["student_name"],
+        "rating": _to_int(row["rating"]),
+        "good_points": row["good_points"],
+        "bad_points": row["bad_points"],
+    }
+
+
+# --- 한 표를 Parquet과 gzip CSV에 row group 단위로 씀 ---
+# 모인 행을 Arrow 표로 한 번 만들고, 같은 표를 두 파일에 씀
+class TableWriter:
+    def __init__(self, directory, name, schema, row_group_size=5000):
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+        import pyarrow.parquet as pq
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.parquet_path = os.path.join(directory, f"{name}.parquet")
+        self.csv_path = os.path.join(directory, f"{name}.csv.gz")
+        self._parquet = pq.ParquetWriter(self.parquet_path, schema, compression="zstd")
+        self._csv_stream = pa.CompressedOutputStream(self.csv_path, "gzip")
+        # 엑셀에서 한글이 깨지지 않도록 BOM을 붙임
+        self._csv_stream.write(b"\xef\xbb\xbf")
+        self._csv = pa_csv.CSVWriter(self._csv_stream, schema)
+        self._buffer = []
+        self.rows = 0
+        self.row_groups = 0
+
+    def add(self, record):
+        self._buffer.append(record)
+        if len(self._buffer) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        import pyarrow as pa
+        table = pa.Table.from_pylist(self._buffer, schema=self.schema)
+        self._parquet.write_table(table, row_group_size=len(self._buffer))
+        self._csv.write_table(table)
+        self.rows += len(self._buffer)
+        self.row_groups += 1
+        self._buffer = []
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._parquet.close()
+            self._csv.close()
+            self._csv_stream.close()
+
+
+def submission_schema(elements):
+    import pyarrow as pa
+    types = {
+        "created_at": pa.timestamp("s"), "attempt": pa.int32(), "is_final": pa.bool_(),
+        "total_score": pa.int32(), "max_score": pa.int32(),
+    }
+    fields = [pa.field(name, types.get(name, pa.string())) for name in SUBMISSION_COLUMNS]
+    fields += [pa.field(score_column(element), pa.int32()) for element in elements]
+    fields.append(pa.field("scores_other", pa.string()))
+    return pa.schema(fields)
+
+
+def final_feedback_schema():
+    import pyarrow as pa
+    types = {"created_at": pa.timestamp("s"), "rating": pa.int32()}
+    return pa.schema([pa.field(name, types.get(name, pa.string())) for name in FINAL_FEEDBACK_COLUMNS])
+
+
+def export_class(rows, directory, scoring_rubric, questions, row_group_size=5000):
+    # rows: store_rows()/sheet_rows()가 돌려주는 (표 이름, 열 값) 목록. 만든 파일과 행 수를 돌려줌
+    os.makedirs(directory, exist_ok=True)
+    elements = score_elements(scoring_rubric)
+    element_set = set(elements)
+    writers = {
+        "submissions": TableWriter(directory, "submissions", submission_schema(elements), row_group_size),
+        "final_feedback": TableWriter(directory, "final_feedback", final_feedback_schema(), row_group_size),
+    }
+    try:
+        for table, row in rows:
+            if table == "submissions":
+                writers[table].add(normalize_submission(row, element_set, questions))
+            else:
+                writers[table].add(normalize_final_feedback(row))
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return {
+        table: {
+            "rows": writer.rows,
+            "row_groups": writer.row_groups,
+            "files": [writer.parquet_path, writer.csv_path],
+        }
+        for table, writer in writers.items()
+    }
+
+
+def export_zip_bytes(rows, scoring_rubric, questions, row_group_size=5000):
+    # 교사 대시보드의 다운로드 버튼용: 임시 폴더에 내보낸 뒤 zip 하나로 묶음 (파일이 이미 압축되어 있어 다시 압축하지 않음)
+    with tempfile.TemporaryDirectory(prefix="class_export_") as directory:
+        summary = export_class(rows, directory, scoring_rubric, questions, row_group_size)
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+            for table in summary.values():
+                for path in table["files"]:
+                    archive.write(path, os.path.basename(path))
+    return buffer.getvalue(), summary
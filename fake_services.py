@@ -0,0 +1,255 @@
+# 부하 시험용 OpenAI / Google Sheets 대역
+# secrets에 [fake_services] 섹션이 있으면 get_openai_client()와 get_gspread_client()가 실제 서비스 대신 이것을 돌려줌.
+# 지연 시간, 오류율, 할당량을 설정할 수 있고, 모든 호출의 지연 시간을 CALLS에 기록함.
+import hashlib
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import gspread
+
+DEFAULTS = {
+    "openai_latency": 3.0,              # 응답 완료까지 걸리는 평균 시간(초)
+    "openai_first_token_latency": 0.8,  # 스트리밍 첫 토큰까지 걸리는 시간(초)
+    "openai_model_latency": {},         # 모델별 응답 완료 시간(초). 없는 모델은 openai_latency
+    "openai_error_rate": 0.0,           # 500을 낼 확률
+    "openai_rate_limit_rate": 0.0,      # 무작위로 429를 낼 확률
+    "openai_requests_per_minute": 0,    # 0이면 한도 없음, 넘으면 429
+    "sheets_latency": 0.4,
+    "sheets_error_rate": 0.0,
+    "sheets_requests_per_minute": 60,   # 실제 Sheets API 사용자당 기본 한도
+    "jitter": 0.3,                      # 지연 시간을 ±30% 범위에서 흔듦
+}
+
+FAKE_FEEDBACK = {
+    "scores": {"평가요소": 1},
+    "total_score": 1,
+    "confidence": 0.9,
+    "analysis": "변수와 소리의 특징을 연결하려고 한 점이 좋아요.",
+    "suggestion": "B 값이 커지면 그래프의 모양은 어떻게 바뀌고, 소리는 어떻게 달라질까요?"
+}
+
+
+def fake_feedback(messages):
+    # 같은 프롬프트에는 같은 점수를, 답변마다는 0점 또는 1점을 돌려줌 (모든 문항 배점 안이라 검증에 걸리지 않음).
+    # 확신도는 항상 0.9라서 대역으로는 확신도 때문에 다시 채점되는 경우가 생기지 않음
+    digest = hashlib.sha256(json.dumps(messages, ensure_ascii=False, sort_keys=True).encode("utf-8")).digest()
+    score = digest[0] % 2
+    return dict(FAKE_FEEDBACK, scores={"평가요소": score}, total_score=score)
+
+
+class CallRecorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = []
+
+    def record(self, service, operation, latency, ok):
+        with self._lock:
+            self._calls.append((service, operation, latency, ok))
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._calls)
+
+    def reset(self):
+        with self._lock:
+            self._calls = []
+
+
+CALLS = CallRecorder()
+
+
+class FakeServiceConfig:
+    def __init__(self, overrides=None):
+        values = dict(DEFAULTS)
+        values.update(overrides or {})
+        for key, value in values.items():
+            setattr(self, key, value)
+
+    def delay(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+
+class MinuteQuota:
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self._lock = threading.Lock()
+        self._times = []
+
+    def allow(self):
+        if not self.per_minute:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            self._times = [t for t in self._times if now - t < 60]
+            if len(self._times) >= self.per_minute:
+                return False
+            self._times.append(now)
+            return True
+
+
+# --- OpenAI 대역 ---
+class FakeOpenAIError(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(f"Error code: {status_code} - {message}")
+        self.status_code = status_code
+        self.response = None
+
+
+class _FakeCompletions:
+    def __init__(self, config):
+        self.config = config
+        self.quota = MinuteQuota(config.openai_requests_per_minute)
+
+    def create(self, model, messages, stream=False, stream_options=None, **kwargs):
+        started = time.perf_counter()
+        operation = "chat.completions.stream" if stream else "chat.completions"
+        try:
+            if not self.quota.allow() or random.random() < self.config.openai_rate_limit_rate:
+                raise FakeOpenAIError(429, "Rate limit reached")
+            if random.random() < self.config.openai_error_rate:
+                raise FakeOpenAIError(500, "The server had an error")
+        except FakeOpenAIError:
+            CALLS.record("openai", operation, time.perf_counter() - started, False)
+            raise
+
+        prompt_tokens = sum(len(m.get("content", "")) for m in messages)
+        content = json.dumps(fake_feedback(messages), ensure_ascii=False)
+        usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens, completion_tokens=len(content), total_tokens=prompt_tokens + len(content),
+            prompt_tokens_details=SimpleNamespace(cached_tokens=len(messages[0].get("content", "")) if len(messages) > 1 else 0)
+        )
+        latency = self.config.openai_model_latency.get(model, self.config.openai_latency)
+        if stream:
+            return self._stream(content, usage, started, latency, include_usage=bool((stream_options or {}).get("include_usage")))
+        self.config.delay(latency)
+        CALLS.record("openai", operation, time.perf_counter() - started, True)
+        message = SimpleNamespace(role="assistant", content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")], usage=usage, model=model)
+
+    def _stream(self, content, usage, started, latency, include_usage):
+        first_token_latency = min(self.config.openai_first_token_latency, latency)
+        self.config.delay(first_token_latency)
+        CALLS.record("openai", "chat.completions.first_token", time.perf_counter() - started, True)
+        pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+        per_piece = max(0.0, latency - first_token_latency) / max(1, len(pieces))
+        for piece in pieces:
+            time.sleep(per_piece)
+            yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=piece), finish_reason=None)], usage=None)
+        if include_usage:
+            yield SimpleNamespace(choices=[], usage=usage)
+        CALLS.record("openai", "chat.completions.stream", time.perf_counter() - started, True)
+
+
+class FakeOpenAI:
+    def __init__(self, config):
+        self.chat = SimpleNamespace(completions=_FakeCompletions(config))
+
+
+# --- Google Sheets 대역 ---
+class _FakeResponse:
+    def __init__(self, status_code, message):
+        self.status_code = status_code
+        self.text = message
+        self._message = message
+
+    def json(self):
+        return {"error": {"code": self.status_code, "message": self._message, "status": "RESOURCE_EXHAUSTED"}}
+
+
+class _FakeSheetsBackend:
+    def __init__(self, config):
+        self.config = config
+        self.quota = MinuteQuota(config.sheets_requests_per_minute)
+
+    def call(self, operation, fn):
+        started = time.perf_counter()
+        try:
+            if not self.quota.allow():
+                raise gspread.exceptions.APIError(_FakeResponse(429, "Quota exceeded for quota metric 'Write requests'"))
+            if random.random() < self.config.sheets_error_rate:
+                raise gspread.exceptions.APIError(_FakeResponse(500, "Internal error encountered."))
+            self.config.delay(self.config.sheets_latency)
+            result = fn()
+        except Exception:
+            CALLS.record("sheets", operation, time.perf_counter() - started, False)
+            raise
+        CALLS.record("sheets", operation, time.perf_counter() - started, True)
+        return result
+
+
+class FakeWorksheet:
+    def __init__(self, backend, title):
+        self._backend = backend
+        self.title = title
+        self.rows = []
+        self._lock = threading.Lock()
+
+    def _append(self, rows):
+        with self._lock:
+            self.rows.extend([str(v) for v in row] for row in rows)
+
+    def append_row(self, values, value_input_option=None):
+        return self._backend.call("append_row", lambda: self._append([values]))
+
+    def append_rows(self, values, value_input_option=None):
+        return self._backend.call("append_rows", lambda: self._append(values))
+
+    def get_all_records(self):
+        def read():
+            with self._lock:
+                header, body = (self.rows[0], self.rows[1:]) if self.rows else ([], [])
+            return [dict(zip(header, gspread.utils.numericise_all(row))) for row in body]
+        return self._backend.call("get_all_records", read)
+
+
+class FakeSpreadsheet:
+    def __init__(self, backend):
+        self._backend = backend
+        self._worksheets = {}
+        self._lock = threading.Lock()
+
+    def worksheets(self):
+        return self._backend.call("worksheets", lambda: list(self._worksheets.values()))
+
+    def worksheet(self, title):
+        def find():
+            if title not in self._worksheets:
+                raise gspread.WorksheetNotFound(title)
+            return self._worksheets[title]
+        return self._backend.call("worksheet", find)
+
+    def add_worksheet(self, title, rows, cols, index=None):
+        def add():
+            with self._lock:
+                return self._worksheets.setdefault(title, FakeWorksheet(self._backend, title))
+        return self._backend.call("add_worksheet", add)
+
+    def values_batch_get(self, ranges, params=None):
+        def read():
+            value_ranges = []
+            for a1 in ranges:
+                title, cell_range = a1.rsplit("!", 1)
+                title = title[1:-1].replace("''", "'") if title.startswith("'") else title
+                start_row = int("".join(ch for ch in cell_range.split(":")[0] if ch.isdigit()) or 1)
+                worksheet = self._worksheets.get(title)
+                values = [list(row) for row in worksheet.rows[start_row - 1:]] if worksheet else []
+                value_ranges.append({"range": a1, "values": values} if values else {"range": a1})
+            return {"valueRanges": value_ranges}
+        return self._backend.call("values_batch_get", read)
+
+
+class FakeGspreadClient:
+    def __init__(self, config):
+        self._backend = _FakeSheetsBackend(config)
+        self._spreadsheets = {}
+        self._lock = threading.Lock()
+
+    def open(self, title):
+        def open_sheet():
+            with self._lock:
+                return self._spreadsheets.setdefault(title, FakeSpreadsheet(self._backend))
+        return self._backend.call("open", open_sheet)
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_answer(text):
+    # 공백/유니코드 표기만 다른 답변은 같은 답변으로 취급
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def feedback_cache_key(q_key, student_answer, model, temperature, fingerprint):
+    payload = json.dumps([q_key, normalize_answer(student_answer), model, temperature, fingerprint], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# --- AI 피드백 응답 캐시 (메모리 LRU + 디스크) ---
+class FeedbackCache:
+    def __init__(self, directory, max_entries=2000, max_disk_entries=20000, max_age=7 * 24 * 3600):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        os.makedirs(self.directory, exist_ok=True)
+        self._disk_entries = sum(1 for _ in self._iter_disk_files())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _iter_disk_files(self):
+        for sub in os.scandir(self.directory):
+            if sub.is_dir():
+                for entry in os.scandir(sub.path):
+                    if entry.name.endswith(".json"):
+                        yield entry
+
+    def _expired(self, created_at):
+        return time.time() - created_at > self.max_age
+
+    def get(self, key):
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                created_at, value = item
+                if not self._expired(created_at):
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+                self._stats["evictions"] += 1
+
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            record = None
+
+        with self._lock:
+            if record is None:
+                self._stats["misses"] += 1
+                return None
+            if self._expired(record["created_at"]):
+                self._remove_disk(path)
+                self._stats["evictions"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._remember(key, record["created_at"], record["value"])
+            self._stats["disk_hits"] += 1
+            return record["value"]
+
+    def put(self, key, value):
+        created_at = time.time()
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"created_at": created_at, "value": value}, f, ensure_ascii=False)
+        is_new = not os.path.exists(path)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._remember(key, created_at, value)
+            if is_new:
+                self._disk_entries += 1
+            if self._disk_entries > self.max_disk_entries:
+                self._prune_disk()
+
+    def _remember(self, key, created_at, value):
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _remove_disk(self, path):
+        try:
+            os.remove(path)
+            self._disk_entries -= 1
+        except OSError:
+            pass
+
+    def _prune_disk(self):
+        # 오래된 항목을 먼저 지우고, 그래도 많으면 가장 오래된 순으로 한도의 90%까지 줄임
+        entries = sorted(self._iter_disk_files(), key=lambda e: e.stat().st_mtime)
+        self._disk_entries = len(entries)
+        target = int(self.max_disk_entries * 0.9)
+        for entry in entries:
+            if self._disk_entries <= target and not self._expired(entry.stat().st_mtime):
+                break
+            self._remove_disk(entry.path)
+            self._stats["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = self._disk_entries
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
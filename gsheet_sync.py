@@ -0,0 +1,346 @@
+import atexit
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# 학생별 워크시트의 헤더 (save_to_gsheet가 기록하는 열 순서와 동일)
+SHEET_HEADER = [
+    "Timestamp", "Question ID", "Attempt", "Is Final", "Question Text",
+    "Student Answer", "Image Path", "Scores", "Total Score", "Feedback"
+]
+
+
+def is_retryable_error(exc):
+    # 할당량 초과(429)와 서버 오류(5xx), 네트워크 오류는 잠시 후 다시 시도하면 성공할 수 있음
+    # (gspread는 무거워서 앱 시작 시간에 포함되지 않도록 실제로 필요할 때 불러옴)
+    from gspread.exceptions import APIError
+    if isinstance(exc, APIError):
+        status = getattr(exc.response, "status_code", None) or exc.code
+        return status == 429 or (isinstance(status, int) and status >= 500)
+    return isinstance(exc, OSError)
+
+
+# --- 스프레드시트/워크시트 핸들 캐시 ---
+# gc.open()과 sh.worksheet() 조회를 매번 하지 않도록, sh.worksheets() 한 번으로 이름→워크시트 맵을 채워두고
+# 워크시트를 새로 만들 때마다 갱신함. ttl이 지나면 다시 불러옴.
+class SheetHandleCache:
+    def __init__(self, gspread_client, spreadsheet_name, ttl=600):
+        self.gspread_client = gspread_client
+        self.spreadsheet_name = spreadsheet_name
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._spreadsheet = None
+        self._worksheets = {}
+        self._loaded_at = 0.0
+        self._stats = {"api_calls": 0, "api_calls_saved": 0, "reloads": 0}
+
+    def _ensure_loaded(self):
+        if self._spreadsheet is not None and time.monotonic() - self._loaded_at < self.ttl:
+            self._stats["api_calls_saved"] += 1
+            return
+        with metrics.span("sheets.open"):
+            spreadsheet = self.gspread_client.open(self.spreadsheet_name)
+            worksheets = spreadsheet.worksheets()
+        self._stats["api_calls"] += 2
+        self._stats["reloads"] += 1
+        self._spreadsheet = spreadsheet
+        self._worksheets = {ws.title: ws for ws in worksheets}
+        self._loaded_at = time.monotonic()
+
+    def spreadsheet(self):
+        with self._lock:
+            self._ensure_loaded()
+            return self._spreadsheet
+
+    def worksheets(self):
+        with self._lock:
+            self._ensure_loaded()
+            return dict(self._worksheets)
+
+    def worksheet(self, title):
+        # 없는 워크시트는 WorksheetNotFound 대신 None을 돌려줌 (존재 확인용 API 호출이 필요 없음)
+        with self._lock:
+            self._ensure_loaded()
+            self._stats["api_calls_saved"] += 1
+            return self._worksheets.get(title)
+
+    def add_worksheet(self, title, rows="1000", cols="10"):
+        with self._lock:
+            self._ensure_loaded()
+            worksheet = self._worksheets.get(title)
+            if worksheet is None:
+                with metrics.span("sheets.add_worksheet"):
+                    worksheet = self._spreadsheet.add_worksheet(title=title, rows=rows, cols=cols)
+                self._stats["api_calls"] += 1
+                self._worksheets[title] = worksheet
+            return worksheet
+
+    def count_api_call(self, n=1):
+        # 핸들을 받아 간 쪽에서 보낸 읽기/쓰기 호출도 함께 집계
+        with self._lock:
+            self._stats["api_calls"] += n
+
+    def invalidate(self):
+        with self._lock:
+            self._spreadsheet = None
+            self._worksheets = {}
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["worksheets"] = len(self._worksheets)
+            return stats
+
+
+def a1_range(worksheet_title, cell_range):
+    return "'{}'!{}".format(worksheet_title.replace("'", "''"), cell_range)
+
+
+# --- 교사 대시보드용 학급 스냅샷 캐시 ---
+# 워크시트마다 지금까지 받은 행을 보관하고, 새로고침 때는 마지막으로 알고 있는 행 다음부터만
+# 학급 전체를 values_batch_get 한 번으로 받아옴 (학생마다 get_all_records를 부르지 않음).
+class ClassSnapshotCache:
+    def __init__(self, handles, refresh_interval=30, last_column="J", exclude=("Sheet1", "기본시트"), ranges_per_request=100):
+        self.handles = handles
+        self.refresh_interval = refresh_interval
+        self.last_column = last_column
+        self.exclude = set(exclude)
+        self.ranges_per_request = ranges_per_request
+        self._lock = threading.RLock()
+        self._rows = {}
+        self._refreshed_at = None
+        self.version = 0
+
+    def refresh(self, force=False):
+        with self._lock:
+            if not force and self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.refresh_interval:
+                return False
+            titles = sorted(title for title in self.handles.worksheets() if title not in self.exclude)
+            spreadsheet = self.handles.spreadsheet()
+            for start in range(0, len(titles), self.ranges_per_request):
+                chunk = titles[start:start + self.ranges_per_request]
+                ranges = [a1_range(title, f"A{len(self._rows.get(title, [])) + 1}:{self.last_column}") for title in chunk]
+                response = spreadsheet.values_batch_get(ranges)
+                self.handles.count_api_call()
+                for title, value_range in zip(chunk, response.get("valueRanges", [])):
+                    new_rows = value_range.get("values", [])
+                    if new_rows:
+                        self._rows.setdefault(title, []).extend(new_rows)
+                        self.version += len(new_rows)
+                    else:
+                        self._rows.setdefault(title, [])
+            for title in set(self._rows) - set(titles):
+                del self._rows[title]
+                self.version += 1
+            self._refreshed_at = time.monotonic()
+            return True
+
+    def reset(self):
+        # 시트를 직접 수정한 경우처럼 행 수 기준 증분이 맞지 않을 때 전체를 다시 받도록 비움
+        with self._lock:
+            self._rows = {}
+            self._refreshed_at = None
+            self.version += 1
+
+    def student_names(self):
+        with self._lock:
+            return sorted(self._rows)
+
+    def records(self, worksheet_title):
+        # get_all_records()와 같은 형태(헤더를 키로 하는 dict 목록, 숫자 변환 포함)로 돌려줌
+        with self._lock:
+            rows = list(self._rows.get(worksheet_title, []))
+        if not rows:
+            return []
+        from gspread.utils import numericise_all
+        header, body = rows[0], rows[1:]
+        return [
+            dict(zip(header, numericise_all(row + [""] * (len(header) - len(row)))))
+            for row in body
+        ]
+
+
+# --- 이전 버전의 디스크 저널: 시작할 때 남은 행을 로컬 저장소로 옮기는 데만 읽음 ---
+class JsonlJournal:
+    def __init__(self, path):
+        self.path = path
+        self._pending = OrderedDict()
+        self._load()
+        self._fh = open(self.path, "a", encoding="utf-8")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 프로세스가 쓰는 도중 종료되어 마지막 줄이 잘린 경우
+                    continue
+                if record.get("op") == "add":
+                    self._pending[record["id"]] = (record["worksheet"], record["row"])
+                elif record.get("op") == "ack":
+                    for entry_id in record["ids"]:
+                        self._pending.pop(entry_id, None)
+        if self._pending:
+            logger.info("Sheets 저널에서 미전송 행 %d개를 복구했습니다.", len(self._pending))
+
+    def pending(self):
+        return [(entry_id, worksheet, row) for entry_id, (worksheet, row) in self._pending.items()]
+
+    def ack(self, entry_ids):
+        self._fh.write(json.dumps({"op": "ack", "ids": list(entry_ids)}, ensure_ascii=False) + "\n")
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        for entry_id in entry_ids:
+            self._pending.pop(entry_id, None)
+
+    def close(self):
+        self._fh.close()
+
+    def __len__(self):
+        return len(self._pending)
+
+
+# --- 백그라운드 작성기: 워크시트별로 행을 모아 append_rows 한 번으로 기록 ---
+class SheetWriter:
+    def __init__(self, handles, journal,
+                 linger=0.5, max_batch_rows=200, base_backoff=1.0, max_backoff=60.0, poll_interval=30.0):
+        self.handles = handles
+        self.journal = journal
+        self.linger = linger
+        self.max_batch_rows = max_batch_rows
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        # 알림이 없어도 이 간격으로 확인함 (다른 인스턴스가 맡던 복제를 이어받을 때)
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._failures = 0
+        self._stats_lock = threading.Lock()
+        self._stats = {"enqueued": 0, "rows_written": 0, "batches": 0, "retries": 0, "last_error": ""}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sheet-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+            if len(self.journal):
+                self._wake.set()
+        return self
+
+    def notify(self):
+        # 저장소에 새 행이 생겼음을 알림
+        with self._stats_lock:
+            self._stats["enqueued"] += 1
+        self._idle.clear()
+        self._wake.set()
+
+    def flush(self, timeout=10.0):
+        # 대기 중인 행이 모두 기록될 때까지 기다림 (종료 시 또는 관리 작업용)
+        self._wake.set()
+        deadline = time.monotonic() + timeout
+        while len(self.journal) and time.monotonic() < deadline:
+            self._idle.wait(timeout=0.1)
+        return not len(self.journal)
+
+    def stop(self, timeout=5.0):
+        if self._thread is None:
+            return
+        self.flush(timeout=timeout)
+        self._stopping = True
+        self._wake.set()
+        self._thread.join(timeout=1.0)
+        if hasattr(self.journal, "close"):
+            self.journal.close()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["pending"] = len(self.journal)
+        return stats
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(timeout=self.poll_interval)
+            self._wake.clear()
+            if self._stopping:
+                break
+            # 잠깐 기다려 동시에 들어온 제출들을 한 배치로 묶음
+            time.sleep(self.linger)
+            delay = self._drain()
+            if delay:
+                with self._stats_lock:
+                    self._stats["retries"] += 1
+                metrics.increment("sheets_retries_total")
+                time.sleep(delay)
+                self._wake.set()
+            elif len(self.journal):
+                self._wake.set()
+            else:
+                self._idle.set()
+
+    def _drain(self):
+        entries = self.journal.pending()
+        if not entries:
+            return 0
+        batches = OrderedDict()
+        for entry_id, worksheet, row in entries:
+            batches.setdefault(worksheet, []).append((entry_id, row))
+
+        try:
+            for worksheet, items in batches.items():
+                for start in range(0, len(items), self.max_batch_rows):
+                    chunk = items[start:start + self.max_batch_rows]
+                    self._write_batch(worksheet, [row for _, row in chunk])
+                    self.journal.ack([entry_id for entry_id, _ in chunk])
+                    with self._stats_lock:
+                        self._stats["rows_written"] += len(chunk)
+                        self._stats["batches"] += 1
+        except Exception as e:
+            self._failures += 1
+            with self._stats_lock:
+                self._stats["last_error"] = str(e)
+            delay = min(self.max_backoff, self.base_backoff * (2 ** (self._failures - 1)))
+            delay *= random.uniform(0.5, 1.0)
+            if is_retryable_error(e):
+                logger.warning("Sheets 할당량/서버 오류, %.1f초 후 재시도합니다: %s", delay, e)
+            else:
+                # 워크시트가 밖에서 지워졌을 수 있으므로 핸들 캐시를 비우고,
+                # 행은 저널에 남겨둔 채 최대 간격으로 재시도
+                self.handles.invalidate()
+                delay = self.max_backoff
+                logger.error("Sheets 기록 실패, 행은 저널에 보관합니다: %s", e)
+            return delay
+
+        self._failures = 0
+        return 0
+
+    def _write_batch(self, worksheet_title, rows):
+        worksheet = self.handles.worksheet(worksheet_title)
+        if worksheet is None:
+            worksheet = self.handles.add_worksheet(worksheet_title)
+            # 헤더는 첫 배치와 함께 기록 (기록이 실패하거나 재시작해도 다음 시도에서 헤더를 다시 붙임)
+            self.journal.set_header_pending(worksheet_title, True)
+            header_pending = True
+        else:
+            header_pending = self.journal.header_pending(worksheet_title)
+        if header_pending:
+            rows = [SHEET_HEADER] + rows
+        self.handles.count_api_call()
+        with metrics.span("sheets.append_rows"):
+            worksheet.append_rows(rows, value_input_option='USER_ENTERED')
+        metrics.increment("sheets_rows_written_total", len(rows))
+        if header_pending:
+            self.journal.set_header_pending(worksheet_title, False)
@@ -0,0 +1,123 @@
+# 학생이 올린 그래프 이미지 처리
+# 스크립트 스레드에서는 내용 해시만 계산하고, 디코딩/축소/인코딩은 스레드 풀에서 처리함.
+# 같은 이미지는 해시가 같으므로 한 번만 저장되고, 저장 경로는 해시로 정해져 처리 완료 전에도 Sheets에 기록할 수 있음.
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+logger = logging.getLogger("trigonometric_music")
+
+
+def thumbnail_path(image_path):
+    # 해시 이름 이미지(ab/abcd….webp)든 예전 방식의 PNG든 같은 규칙으로 썸네일 경로를 정함
+    return os.path.splitext(image_path)[0] + ".thumb.webp"
+
+
+class ImageIngestor:
+    def __init__(self, directory, max_side=1600, thumb_side=320, quality=80, workers=2):
+        self.directory = directory
+        self.max_side = max_side
+        self.thumb_side = thumb_side
+        self.quality = quality
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-ingest")
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._errors = {}
+        self._stats = {"submitted": 0, "deduplicated": 0, "stored": 0, "failed": 0, "bytes_in": 0, "bytes_out": 0}
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path_for(self, digest):
+        return os.path.join(self.directory, digest[:2], digest + ".webp")
+
+    def submit(self, data):
+        # 저장될 경로를 바로 돌려주고 실제 처리는 백그라운드에서 함
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest)
+        with self._lock:
+            self._stats["submitted"] += 1
+            if path in self._pending or os.path.exists(path):
+                self._stats["deduplicated"] += 1
+                return path
+            self._errors.pop(path, None)
+            self._pending[path] = self._executor.submit(self._ingest, data, path)
+        return path
+
+    def is_pending(self, path):
+        with self._lock:
+            return path in self._pending
+
+    def error(self, path, timeout=None):
+        # 처리 중이면 timeout까지 기다린 뒤, 실패했으면 예외를 돌려줌
+        with self._lock:
+            future = self._pending.get(path)
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+        with self._lock:
+            return self._errors.get(path)
+
+    def _ingest(self, data, path):
+        from io import BytesIO
+        from PIL import Image, ImageOps
+        with metrics.span("image.ingest") as span:
+            try:
+                with Image.open(BytesIO(data)) as img:
+                    # JPEG는 디코딩 단계에서 바로 줄여 읽음 (전체 해상도로 풀지 않음)
+                    img.draft("RGB", (self.max_side, self.max_side))
+                    img = ImageOps.exif_transpose(img)
+                    img = img.convert("RGBA" if "A" in img.getbands() or img.mode == "P" else "RGB")
+                    img.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    self._save_webp(img, path)
+                    thumb = img.copy()
+                    thumb.thumbnail((self.thumb_side, self.thumb_side), Image.LANCZOS)
+                    self._save_webp(thumb, thumbnail_path(path))
+                with self._lock:
+                    self._stats["stored"] += 1
+                    self._stats["bytes_in"] += len(data)
+                    self._stats["bytes_out"] += os.path.getsize(path)
+            except Exception as e:
+                span.fail(type(e).__name__)
+                logger.warning("이미지 처리 실패 (%s): %s", path, e)
+                with self._lock:
+                    self._errors[path] = e
+                    self._stats["failed"] += 1
+            finally:
+                with self._lock:
+                    self._pending.pop(path, None)
+
+    def _save_webp(self, img, path):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        img.save(tmp_path, "WEBP", quality=self.quality, method=4)
+        os.replace(tmp_path, path)
+
+    def ensure_thumbnail(self, image_path):
+        # 예전 방식으로 저장된 원본 PNG에는 썸네일이 없으므로 대시보드에서 처음 볼 때 한 번 만들어 둠
+        thumb = thumbnail_path(image_path)
+        if os.path.exists(thumb):
+            return thumb
+        if not os.path.exists(image_path):
+            return None
+        from PIL import Image
+        try:
+            with Image.open(image_path) as img:
+                img.draft("RGB", (self.thumb_side, self.thumb_side))
+                img = img.convert("RGBA" if "A" in img.getbands() or img.mode == "P" else "RGB")
+                img.thumbnail((self.thumb_side, self.thumb_side), Image.LANCZOS)
+                self._save_webp(img, thumb)
+        except Exception as e:
+            logger.warning("썸네일 생성 실패 (%s): %s", image_path, e)
+            return None
+        return thumb
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._pending)
+        return stats
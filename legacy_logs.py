@@ -0,0 +1,163 @@
+# 예전 버전 앱이 student_data/*.json 에 남긴 로그 읽기
+# 파일 전체를 메모리에 올리지 않고 JSON 배열의 원소를 하나씩 꺼내 처리함.
+import codecs
+import hashlib
+import json
+import os
+
+_DECODER = json.JSONDecoder()
+
+
+def iter_json_array(path, chunk_size=1 << 16, on_progress=None):
+    # [ {...}, {...}, ... ] 형태의 파일에서 원소를 하나씩 돌려줌 (메모리는 가장 큰 원소 하나 크기 정도만 사용)
+    # on_progress(읽은 바이트 수)는 파일을 새로 읽을 때마다 불림 (큰 파일의 진행률 표시용)
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    with open(path, "rb") as f:
+        buffer = ""
+        pos = 0
+        eof = False
+        started = False
+        bytes_read = 0
+
+        def fill():
+            nonlocal buffer, pos, eof, bytes_read
+            raw = f.read(chunk_size)
+            if not raw:
+                eof = True
+            bytes_read += len(raw)
+            if on_progress is not None:
+                on_progress(bytes_read)
+            # 여러 바이트로 된 한글이 청크 경계에서 잘려도 증분 디코더가 다음 청크와 이어 붙임
+            buffer = buffer[pos:] + decoder.decode(raw, final=not raw)
+            pos = 0
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buffer):
+                if eof:
+                    if started:
+                        raise ValueError(f"{path}: JSON 배열이 닫히지 않았습니다.")
+                    return
+                fill()
+                continue
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError(f"{path}: JSON 배열로 시작하지 않습니다.")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                item, end = _DECODER.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # 숫자는 끝이 모호해 청크 경계에서 잘렸을 수 있으므로("2.5"를 "2."까지만 읽은 경우),
+            # 뒤에 구분자(, 또는 ])가 보일 때까지 더 읽어서 확인
+            if not eof:
+                next_pos = end
+                while next_pos < len(buffer) and buffer[next_pos] in " \t\r\n":
+                    next_pos += 1
+                if next_pos == len(buffer) or (isinstance(item, (int, float)) and buffer[next_pos] not in ",]"):
+                    fill()
+                    continue
+            pos = end
+            yield item
+
+
+def _as_bool(value):
+    return str(value).strip().lower() in ("true", "1")
+
+
+def legacy_submission(entry, student_name, source):
+    # 시그니처 사운드 과제의 옛 로그 한 건을 재채점/적재에 쓰는 공통 형태로 바꿈. 두 가지 형식이 있음:
+    #   - step / question / ai_feedback.{evaluation_dimension, score, reasoning, ...}
+    #   - question_id / attempt / is_final / question_text / ai_feedback.{understanding_level, analysis, ...}
+    # 이차함수 과제처럼 다른 활동의 로그(problem_index 형식)는 None을 돌려줌.
+    question_id = entry.get("step") or entry.get("question_id")
+    if not question_id:
+        return None
+    ai_feedback = entry.get("ai_feedback") or {}
+    if not isinstance(ai_feedback, dict):
+        ai_feedback = {"analysis": str(ai_feedback)}
+    original_score = ai_feedback.get("score", ai_feedback.get("understanding_level"))
+    answer = entry.get("student_answer", "")
+    timestamp = entry.get("timestamp", "")
+    is_final = _as_bool(entry.get("is_final", False))
+    submission_id = hashlib.sha256(
+        json.dumps([source, student_name, question_id, timestamp, is_final, answer], ensure_ascii=False).encode("utf-8")
+    ).hexdigest()[:20]
+    try:
+        attempt = int(entry.get("attempt", 1))
+    except (TypeError, ValueError):
+        attempt = 1
+    return {
+        "submission_id": submission_id,
+        "source": source,
+        "student_name": student_name,
+        "timestamp": timestamp,
+        "question_id": question_id,
+        "attempt": attempt,
+        "is_final": is_final,
+        "question_text": entry.get("question") or entry.get("question_text", ""),
+        "answer": answer,
+        "original_total_score": original_score,
+        "original_feedback": ai_feedback,
+    }
+
+
+def iter_legacy_submissions(path, student_name=None, on_progress=None, on_skip=None):
+    # 로그에는 학생 이름이 없으므로 따로 주지 않으면 파일 이름을 학생 이름으로 씀
+    # on_skip(entry)은 이 과제의 로그가 아니어서 건너뛴 원소마다 불림
+    student_name = student_name or os.path.splitext(os.path.basename(path))[0]
+    source = f"legacy:{os.path.basename(path)}"
+    for entry in iter_json_array(path, on_progress=on_progress):
+        submission = legacy_submission(entry, student_name, source) if isinstance(entry, dict) else None
+        if submission is not None:
+            yield submission
+        elif on_skip is not None:
+            on_skip(entry)
+
+
+def _legacy_feedback(submission):
+    # 옛 ai_feedback을 지금의 피드백 형식으로 바꿈. 옛 평가 차원 이름은 지금 채점 요소와 달라 scores에 그대로 둠.
+    # 원래 내용은 legacy_feedback에 남겨 분석할 때 참고할 수 있게 함
+    original = submission["original_feedback"]
+    try:
+        total_score = int(float(submission["original_total_score"]))
+    except (TypeError, ValueError):
+        total_score = None
+    dimension = original.get("evaluation_dimension")
+    return {
+        "scores": {dimension: total_score} if dimension and total_score is not None else {},
+        "total_score": total_score,
+        "analysis": original.get("analysis") or original.get("reasoning", ""),
+        "suggestion": original.get("suggestion") or original.get("improvement_suggestion", ""),
+        "graded_by": "legacy",
+        "legacy_feedback": original,
+    }
+
+
+def legacy_store_row(submission, synced=True):
+    # LocalStore.insert_submissions에 넣을 submissions 표의 열 값.
+    # source_key는 재채점 도구와 같은 submission_id를 써서 다시 적재해도 한 번만 들어가게 함
+    feedback = _legacy_feedback(submission)
+    return {
+        "created_at": submission["timestamp"],
+        "student_name": submission["student_name"],
+        "question_id": submission["question_id"],
+        "attempt": submission["attempt"],
+        "is_final": int(submission["is_final"]),
+        "question_text": submission["question_text"],
+        "answer": submission["answer"],
+        "image_path": "",
+        "scores": json.dumps(feedback["scores"], ensure_ascii=False),
+        "total_score": feedback["total_score"],
+        "feedback": json.dumps(feedback, ensure_ascii=False),
+        "source_key": f"legacy:{submission['submission_id']}",
+        "synced": int(synced),
+    }
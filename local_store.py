@@ -0,0 +1,562 @@
+# 학생 제출 기록의 로컬 저장소 (SQLite, WAL 모드)
+# 모든 제출과 최종 피드백은 여기에 먼저 기록되고(시스템 기록), Google Sheets에는 SheetWriter가 백그라운드에서 복제함.
+# 교사 대시보드는 원격 호출 없이 이 저장소를 바로 조회함.
+import hashlib
+import json
+import re
+import secrets
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from gsheet_sync import SHEET_HEADER
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id            INTEGER PRIMARY KEY,
+    created_at    TEXT NOT NULL,
+    student_name  TEXT NOT NULL,
+    question_id   TEXT NOT NULL,
+    attempt       INTEGER NOT NULL,
+    is_final      INTEGER NOT NULL,
+    question_text TEXT NOT NULL DEFAULT '',
+    answer        TEXT NOT NULL DEFAULT '',
+    image_path    TEXT NOT NULL DEFAULT '',
+    scores        TEXT NOT NULL DEFAULT '{}',
+    total_score   INTEGER,
+    feedback      TEXT NOT NULL DEFAULT '{}',
+    source_key    TEXT UNIQUE,
+    synced        INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_student ON submissions (student_name, created_at);
+CREATE INDEX IF NOT EXISTS idx_submissions_question ON submissions (question_id, is_final, created_at);
+CREATE INDEX IF NOT EXISTS idx_submissions_unsynced ON submissions (id) WHERE synced = 0;
+
+CREATE TABLE IF NOT EXISTS final_feedback (
+    id            INTEGER PRIMARY KEY,
+    created_at    TEXT NOT NULL,
+    student_name  TEXT NOT NULL,
+    rating        INTEGER,
+    good_points   TEXT NOT NULL DEFAULT '',
+    bad_points    TEXT NOT NULL DEFAULT '',
+    source_key    TEXT UNIQUE,
+    synced        INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_final_feedback_student ON final_feedback (student_name, created_at);
+CREATE INDEX IF NOT EXISTS idx_final_feedback_unsynced ON final_feedback (id) WHERE synced = 0;
+
+-- 학생 세션: 이어하기 코드(token)로 구별하고 이름은 표시용으로만 씀 (이름이 같은 학생도 서로의 진행 상황을 덮어쓰지 않음)
+CREATE TABLE IF NOT EXISTS student_sessions (
+    token         TEXT PRIMARY KEY,
+    student_name  TEXT NOT NULL,
+    created_at    TEXT NOT NULL,
+    updated_at    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_student_sessions_name ON student_sessions (student_name);
+
+-- 세션 체크포인트: part는 "session"(현재 페이지/질문) 또는 질문 번호이고, 바뀐 부분만 덮어씀
+CREATE TABLE IF NOT EXISTS session_parts (
+    token         TEXT NOT NULL,
+    part          TEXT NOT NULL,
+    state         TEXT NOT NULL,
+    updated_at    TEXT NOT NULL,
+    PRIMARY KEY (token, part)
+);
+
+-- 여러 서버 인스턴스가 한 저장소를 쓸 때 한 곳만 맡아야 하는 작업(Sheets 복제)의 임차권
+CREATE TABLE IF NOT EXISTS leases (
+    name          TEXT PRIMARY KEY,
+    owner         TEXT NOT NULL,
+    expires_at    REAL NOT NULL
+);
+
+-- 만들었지만 아직 헤더를 쓰지 못한 워크시트 (재시작 후에도 헤더를 한 번만 씀)
+CREATE TABLE IF NOT EXISTS sheet_headers_pending (
+    worksheet     TEXT PRIMARY KEY
+);
+
+-- 교사가 답변 묶음 검토에서 남긴 메모 (학생·질문마다 하나)
+CREATE TABLE IF NOT EXISTS answer_notes (
+    student_name  TEXT NOT NULL,
+    question_id   TEXT NOT NULL,
+    note          TEXT NOT NULL,
+    updated_at    TEXT NOT NULL,
+    PRIMARY KEY (student_name, question_id)
+);
+"""
+
+FINAL_FEEDBACK_QUESTION_ID = "Final_Feedback"
+FINAL_FEEDBACK_QUESTION_TEXT = "수업 만족도 및 피드백"
+
+
+def worksheet_title(student_name):
+    # 학생별 워크시트 이름 (예전 save_to_gsheet와 같은 규칙)
+    return "".join(c for c in student_name if c.isalnum() or c in " _-")
+
+
+def now_timestamp():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+# 헷갈리는 글자(0/O, 1/I/L)를 뺀 대문자와 숫자 8자리 (학생이 직접 옮겨 적을 수 있게)
+RESUME_TOKEN_ALPHABET = "ABCDEFGHJKMNPQRSTUVWXYZ23456789"
+RESUME_TOKEN_LENGTH = 8
+
+
+def new_resume_token():
+    return "".join(secrets.choice(RESUME_TOKEN_ALPHABET) for _ in range(RESUME_TOKEN_LENGTH))
+
+
+def format_final_feedback(rating_text, good_points, bad_points):
+    return f"별점: {rating_text}\n\n좋았던 점:\n{good_points}\n\n아쉬웠던 점:\n{bad_points}"
+
+
+def format_feedback_cell(feedback):
+    return f"Analysis: {feedback.get('analysis', '')}\nSuggestion: {feedback.get('suggestion', '')}"
+
+
+def _to_int(value, default=None):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+_FINAL_FEEDBACK_RE = re.compile(r"별점:\s*(\d*)\s*점?\n\n좋았던 점:\n(.*)\n\n아쉬웠던 점:\n(.*)", re.S)
+_FEEDBACK_CELL_RE = re.compile(r"Analysis:\s*(.*?)\nSuggestion:\s*(.*)", re.S)
+
+
+def parse_sheet_row(student_name, row):
+    # Sheets 형식의 행(SHEET_HEADER 순서)을 (표 이름, 열 값 dict)로 바꿈. 헤더 행이면 None
+    row = [str(v) if v is not None else "" for v in row] + [""] * (len(SHEET_HEADER) - len(row))
+    if row == SHEET_HEADER:
+        return None
+    created_at, question_id, attempt, is_final, question_text, answer, image_path, scores, total_score, feedback = row[:10]
+    source_key = "sheet:" + hashlib.sha256(json.dumps([student_name, row], ensure_ascii=False).encode("utf-8")).hexdigest()[:32]
+    if question_id == FINAL_FEEDBACK_QUESTION_ID:
+        match = _FINAL_FEEDBACK_RE.match(answer)
+        rating, good_points, bad_points = match.groups() if match else ("", answer, "")
+        return "final_feedback", {
+            "created_at": created_at, "student_name": student_name, "rating": _to_int(rating),
+            "good_points": good_points, "bad_points": bad_points, "source_key": source_key,
+        }
+    try:
+        scores_json = json.loads(scores) if scores else {}
+    except ValueError:
+        scores_json = {}
+    match = _FEEDBACK_CELL_RE.match(feedback)
+    analysis, suggestion = match.groups() if match else (feedback, "")
+    total = _to_int(total_score)
+    feedback_json = {"scores": scores_json, "total_score": total, "analysis": analysis, "suggestion": suggestion}
+    return "submissions", {
+        "created_at": created_at, "student_name": student_name, "question_id": question_id,
+        "attempt": _to_int(attempt, 1), "is_final": int(is_final.upper() == "TRUE"), "question_text": question_text,
+        "answer": answer, "image_path": image_path, "scores": json.dumps(scores_json, ensure_ascii=False),
+        "total_score": total, "feedback": json.dumps(feedback_json, ensure_ascii=False), "source_key": source_key,
+    }
+
+
+# 이미 저장소에 있는 같은 기록인지 판단하는 열 (Sheets에서 가져올 때 앱이 복제한 행을 다시 넣지 않도록)
+_SAME_RECORD_COLUMNS = {
+    "submissions": ("student_name", "question_id", "attempt", "is_final", "created_at"),
+    "final_feedback": ("student_name", "created_at"),
+}
+_SAME_RECORD_SQL = {
+    table: f"SELECT 1 FROM {table} WHERE " + " AND ".join(f"{column} = ?" for column in columns) + " LIMIT 1"
+    for table, columns in _SAME_RECORD_COLUMNS.items()
+}
+
+
+class LocalStore:
+    def __init__(self, path, busy_timeout=5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        # 스크립트는 rerun마다 다른 스레드에서 돌기 때문에 스레드별 연결 대신 연결을 빌려 쓰고 돌려놓음
+        self._pool_lock = threading.Lock()
+        self._idle = []
+        # SQLite는 쓰기를 한 번에 하나만 받으므로 프로세스 안에서 먼저 줄 세워 busy 대기를 피함
+        self._write_lock = threading.Lock()
+        with self._write_lock, self._connection() as conn:
+            conn.executescript(SCHEMA)
+        self._migrate_name_keyed_checkpoints()
+
+    def _migrate_name_keyed_checkpoints(self):
+        # 이름으로 구별하던 예전 체크포인트 표(session_checkpoints, resume_tokens)가 있으면 세션별 표로 옮기고 지움
+        with self._transaction() as conn:
+            tables = {row["name"] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            if "session_checkpoints" not in tables:
+                return
+            if "resume_tokens" in tables:
+                conn.execute(
+                    "INSERT OR IGNORE INTO student_sessions (token, student_name, created_at, updated_at)"
+                    " SELECT token, student_name, created_at, created_at FROM resume_tokens"
+                )
+            untokened = conn.execute(
+                "SELECT DISTINCT student_name FROM session_checkpoints"
+                " WHERE student_name NOT IN (SELECT student_name FROM student_sessions)"
+            ).fetchall()
+            created_at = now_timestamp()
+            conn.executemany(
+                "INSERT INTO student_sessions (token, student_name, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                [(new_resume_token(), row["student_name"], created_at, created_at) for row in untokened]
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO session_parts (token, part, state, updated_at)"
+                " SELECT s.token, c.part, c.state, c.updated_at FROM session_checkpoints c"
+                " JOIN student_sessions s ON s.student_name = c.student_name"
+            )
+            conn.execute("DROP TABLE session_checkpoints")
+            conn.execute("DROP TABLE IF EXISTS resume_tokens")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL에서는 NORMAL로도 프로세스가 죽어 커밋이 사라지지 않음 (전원 장애 시 마지막 트랜잭션만 잃을 수 있음)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        with self._pool_lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            with self._pool_lock:
+                self._idle.append(conn)
+
+    @contextmanager
+    def _transaction(self):
+        with self._write_lock, self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _query(self, sql, params=()):
+        with self._connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    # --- 기록 ---
+    def add_submission(self, student_name, question_id, attempt, is_final, question_text, answer, image_path, feedback,
+                       created_at=None, source_key=None, synced=False):
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO submissions (created_at, student_name, question_id, attempt, is_final, question_text, answer,"
+                " image_path, scores, total_score, feedback, source_key, synced) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (created_at or now_timestamp(), student_name, question_id, int(attempt), int(bool(is_final)), question_text,
+                 answer, image_path or "", json.dumps(feedback.get("scores", {}), ensure_ascii=False),
+                 feedback.get("total_score"), json.dumps(feedback, ensure_ascii=False), source_key, int(synced))
+            )
+            return cursor.lastrowid
+
+    def add_final_feedback(self, student_name, rating, good_points, bad_points, created_at=None, source_key=None, synced=False):
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO final_feedback (created_at, student_name, rating, good_points, bad_points, source_key, synced)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (created_at or now_timestamp(), student_name, rating, good_points, bad_points, source_key, int(synced))
+            )
+            return cursor.lastrowid
+
+    def import_sheet_rows(self, student_name, rows, synced):
+        # Sheets 형식의 행(SHEET_HEADER 순서)을 저장소로 옮김. 같은 행은 source_key로 걸러 여러 번 실행해도 한 번만 들어감.
+        # 앱이 기록해 Sheets로 복제한 행은 source_key가 없으므로 (학생, 질문, 시도, 최종 여부, 시각)이 같은 행이 있으면 건너뜀.
+        # 반환값: 새로 들어간 행 수
+        inserted = 0
+        with self._transaction() as conn:
+            for row in rows:
+                parsed = parse_sheet_row(student_name, row)
+                if parsed is None:
+                    continue
+                table, values = parsed
+                if conn.execute(_SAME_RECORD_SQL[table], tuple(values[column] for column in _SAME_RECORD_COLUMNS[table])).fetchone():
+                    continue
+                values["synced"] = int(synced)
+                columns = ", ".join(values)
+                placeholders = ", ".join("?" for _ in values)
+                cursor = conn.execute(f"INSERT OR IGNORE INTO {table} ({columns}) VALUES ({placeholders})", tuple(values.values()))
+                inserted += cursor.rowcount
+        return inserted
+
+    def insert_submissions(self, rows):
+        # submissions 표의 열 값 dict 목록을 한 트랜잭션에서 executemany로 넣음 (대량 적재용).
+        # source_key가 이미 있는 행은 건너뜀. 반환값: 새로 들어간 행 수
+        if not rows:
+            return 0
+        columns = list(rows[0])
+        sql = f"INSERT OR IGNORE INTO submissions ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(sql, [tuple(row[column] for column in columns) for row in rows])
+            return conn.total_changes - before
+
+    # --- 학생 세션과 체크포인트 (이어하기 코드로 구별) ---
+    def create_session(self, student_name):
+        # 새 세션을 만들고 이어하기 코드를 돌려줌
+        token = new_resume_token()
+        created_at = now_timestamp()
+        with self._transaction() as conn:
+            conn.execute("INSERT INTO student_sessions (token, student_name, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                         (token, student_name, created_at, created_at))
+        return token
+
+    def student_for_resume_token(self, token):
+        rows = self._query("SELECT student_name FROM student_sessions WHERE token = ?", ((token or "").strip().upper(),))
+        return rows[0]["student_name"] if rows else None
+
+    def save_checkpoint(self, token, parts):
+        # parts: {part: 상태 dict}. 바뀐 부분만 받아 한 트랜잭션으로 덮어씀
+        if not parts:
+            return
+        updated_at = now_timestamp()
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO session_parts (token, part, state, updated_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (token, part) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                [(token, part, json.dumps(state, ensure_ascii=False), updated_at) for part, state in parts.items()]
+            )
+            conn.execute("UPDATE student_sessions SET updated_at = ? WHERE token = ?", (updated_at, token))
+
+    def load_checkpoint(self, token):
+        rows = self._query("SELECT part, state FROM session_parts WHERE token = ?", (token,))
+        return {row["part"]: json.loads(row["state"]) for row in rows}
+
+    def has_checkpoint(self, student_name):
+        # 이 이름으로 진행 상황이 저장된 세션이 하나라도 있는지
+        return bool(self._query(
+            "SELECT 1 FROM student_sessions s WHERE s.student_name = ?"
+            " AND EXISTS (SELECT 1 FROM session_parts p WHERE p.token = s.token) LIMIT 1", (student_name,)
+        ))
+
+    def delete_checkpoint(self, token):
+        # 세션도 함께 지워, 예전 이어하기 코드와 주소로는 더 이상 되살릴 수 없게 함
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM session_parts WHERE token = ?", (token,))
+            conn.execute("DELETE FROM student_sessions WHERE token = ?", (token,))
+
+    def saved_sessions(self):
+        # 진행 상황이 저장된 세션 목록 (교사 화면): 이름, 이어하기 코드, 마지막 저장 시각, 현재 페이지/질문 상태
+        rows = self._query(
+            "SELECT s.token, s.student_name, s.updated_at, p.state FROM student_sessions s"
+            " JOIN session_parts p ON p.token = s.token AND p.part = 'session' ORDER BY s.student_name, s.updated_at DESC"
+        )
+        return [{"token": row["token"], "student_name": row["student_name"], "updated_at": row["updated_at"],
+                 "session": json.loads(row["state"])} for row in rows]
+
+    # --- 답변 묶음 검토 메모 ---
+    def save_answer_notes(self, question_id, student_names, note):
+        # 묶음 전체에 같은 메모를 한 번에 남김. 빈 메모면 지움
+        with self._transaction() as conn:
+            if note:
+                updated_at = now_timestamp()
+                conn.executemany(
+                    "INSERT INTO answer_notes (student_name, question_id, note, updated_at) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT (student_name, question_id) DO UPDATE SET note = excluded.note, updated_at = excluded.updated_at",
+                    [(student_name, question_id, note, updated_at) for student_name in student_names]
+                )
+            else:
+                conn.executemany("DELETE FROM answer_notes WHERE student_name = ? AND question_id = ?",
+                                 [(student_name, question_id) for student_name in student_names])
+
+    def answer_notes(self, question_id):
+        rows = self._query("SELECT student_name, note FROM answer_notes WHERE question_id = ?", (question_id,))
+        return {row["student_name"]: row["note"] for row in rows}
+
+    # --- 조회 ---
+    def student_names(self):
+        rows = self._query(
+            "SELECT student_name FROM submissions UNION SELECT student_name FROM final_feedback ORDER BY student_name"
+        )
+        return [row["student_name"] for row in rows]
+
+    def names_by_worksheet(self):
+        # 워크시트 이름(worksheet_title로 특수문자를 뺀 이름) → 저장소의 학생 이름. Sheets에서 가져온 행을 앱이 기록한 이름으로 되돌릴 때 씀
+        # 같은 워크시트 이름이 되는 학생이 여럿이면 워크시트 이름과 똑같은 이름을, 없으면 가나다순으로 처음 이름을 씀
+        names = {}
+        for student_name in self.student_names():
+            title = worksheet_title(student_name)
+            if title not in names or student_name == title:
+                names[title] = student_name
+        return names
+
+    def sheet_records(self, student_name):
+        # 예전 대시보드가 쓰던 get_all_records()와 같은 형태 (SHEET_HEADER를 키로 하는 dict 목록, 시간순)
+        submissions = self._query(
+            "SELECT * FROM submissions WHERE student_name = ? ORDER BY created_at, id", (student_name,)
+        )
+        finals = self._query(
+            "SELECT * FROM final_feedback WHERE student_name = ? ORDER BY created_at, id", (student_name,)
+        )
+        records = [dict(zip(SHEET_HEADER, self._submission_row(row))) for row in submissions]
+        records += [dict(zip(SHEET_HEADER, self._final_feedback_row(row))) for row in finals]
+        records.sort(key=lambda record: record["Timestamp"])
+        return records
+
+    def submission_feedback(self, submission_id):
+        rows = self._query("SELECT feedback FROM submissions WHERE id = ?", (submission_id,))
+        return json.loads(rows[0]["feedback"]) if rows else None
+
+    def iter_submissions(self, batch_size=500):
+        # 제출 전체를 id 순서로 조금씩 읽어 돌려줌 (오프라인 도구, 내보내기용)
+        return self._iter_rows("submissions", batch_size)
+
+    def iter_final_feedback(self, batch_size=500):
+        return self._iter_rows("final_feedback", batch_size)
+
+    def _iter_rows(self, table, batch_size):
+        last_id = 0
+        while True:
+            rows = self._query(f"SELECT * FROM {table} WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size))
+            if not rows:
+                return
+            for row in rows:
+                yield dict(row)
+            last_id = rows[-1]["id"]
+
+    def final_answers(self, since_id=0):
+        # 답변 묶음 색인용: since_id 뒤에 들어온 최종 제출 (id 순서)
+        return self._query(
+            "SELECT id, student_name, question_id, answer, total_score FROM submissions"
+            " WHERE is_final = 1 AND id > ? ORDER BY id", (since_id,)
+        )
+
+    def analytics_rows(self):
+        # 학급 통계용: 점수 계산에 필요한 열만 한 번에 읽음
+        return self._query(
+            "SELECT id, student_name, question_id, attempt, is_final, total_score FROM submissions ORDER BY id"
+        )
+
+    def data_version(self):
+        # 행은 추가만 되므로 두 표의 마지막 id로 내용이 바뀌었는지 알 수 있음 (통계 캐시 키로 사용)
+        row = self._query(
+            "SELECT (SELECT IFNULL(MAX(id), 0) FROM submissions) AS submissions,"
+            " (SELECT IFNULL(MAX(id), 0) FROM final_feedback) AS final_feedback"
+        )[0]
+        return f"{row['submissions']}:{row['final_feedback']}"
+
+    def counts(self):
+        row = self._query(
+            "SELECT (SELECT COUNT(*) FROM submissions) AS submissions, (SELECT COUNT(*) FROM final_feedback) AS final_feedback,"
+            " (SELECT COUNT(*) FROM submissions WHERE synced = 0) + (SELECT COUNT(*) FROM final_feedback WHERE synced = 0) AS unsynced"
+        )[0]
+        return dict(row)
+
+    @staticmethod
+    def _submission_row(row):
+        feedback = json.loads(row["feedback"])
+        return [
+            row["created_at"], row["question_id"], row["attempt"], bool(row["is_final"]), row["question_text"],
+            row["answer"], row["image_path"], row["scores"],
+            row["total_score"] if row["total_score"] is not None else 0, format_feedback_cell(feedback)
+        ]
+
+    @staticmethod
+    def _final_feedback_row(row):
+        rating_text = f"{row['rating']}점" if row["rating"] is not None else ""
+        return [
+            row["created_at"], FINAL_FEEDBACK_QUESTION_ID, 1, True, FINAL_FEEDBACK_QUESTION_TEXT,
+            format_final_feedback(rating_text, row["good_points"], row["bad_points"]), "", "", "", ""
+        ]
+
+    # --- Sheets 복제용 ---
+    def unsynced_rows(self, limit=1000):
+        # (항목 id, 워크시트 이름, Sheets 행) 목록을 기록된 순서대로 돌려줌
+        submissions = self._query("SELECT * FROM submissions WHERE synced = 0 ORDER BY id LIMIT ?", (limit,))
+        finals = self._query("SELECT * FROM final_feedback WHERE synced = 0 ORDER BY id LIMIT ?", (limit,))
+        entries = [(row["created_at"], f"s:{row['id']}", worksheet_title(row["student_name"]), self._submission_row(row)) for row in submissions]
+        entries += [(row["created_at"], f"f:{row['id']}", worksheet_title(row["student_name"]), self._final_feedback_row(row)) for row in finals]
+        entries.sort(key=lambda entry: entry[0])
+        return [(entry_id, title, row) for _, entry_id, title, row in entries[:limit]]
+
+    def mark_synced(self, entry_ids):
+        ids = {"s": [], "f": []}
+        for entry_id in entry_ids:
+            table, _, row_id = entry_id.partition(":")
+            ids[table].append(int(row_id))
+        with self._transaction() as conn:
+            for table, name in (("s", "submissions"), ("f", "final_feedback")):
+                if ids[table]:
+                    conn.executemany(f"UPDATE {name} SET synced = 1 WHERE id = ?", [(row_id,) for row_id in ids[table]])
+
+    def unsynced_count(self):
+        return self.counts()["unsynced"]
+
+    def acquire_lease(self, name, owner, seconds):
+        # 비어 있거나 만료됐거나 이미 내 것이면 seconds만큼 (다시) 잡고 True. 다른 인스턴스가 쥐고 있으면 False
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?)"
+                " ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at"
+                " WHERE leases.owner = excluded.owner OR leases.expires_at < ?",
+                (name, owner, now + seconds, now)
+            )
+            row = conn.execute("SELECT owner FROM leases WHERE name = ?", (name,)).fetchone()
+        return row["owner"] == owner
+
+    def release_lease(self, name, owner):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+    def header_pending(self, worksheet):
+        return bool(self._query("SELECT 1 FROM sheet_headers_pending WHERE worksheet = ?", (worksheet,)))
+
+    def set_header_pending(self, worksheet, pending):
+        with self._transaction() as conn:
+            if pending:
+                conn.execute("INSERT OR IGNORE INTO sheet_headers_pending (worksheet) VALUES (?)", (worksheet,))
+            else:
+                conn.execute("DELETE FROM sheet_headers_pending WHERE worksheet = ?", (worksheet,))
+
+
+# --- SheetWriter가 쓰는 저널 인터페이스(pending/ack/len)를 저장소의 미동기화 행으로 구현 ---
+# 행은 LocalStore에 직접 기록하고 SheetWriter.notify()로 작성기를 깨움.
+# 여러 인스턴스가 같은 저장소를 쓰면 각자 작성기가 돌므로, 임차권(lease)을 쥔 한 곳만 행을 넘겨받아 Sheets에 씀.
+# 다른 인스턴스는 빈 목록을 받고 기다리다가, 쥐고 있던 인스턴스가 죽어 임차권이 만료되면 이어받음.
+SHEET_WRITER_LEASE = "sheet_writer"
+
+
+class StoreSyncJournal:
+    def __init__(self, store, batch_limit=1000, lease_seconds=120.0, owner=None):
+        self.store = store
+        self.batch_limit = batch_limit
+        self.lease_seconds = lease_seconds
+        self.owner = owner or uuid.uuid4().hex
+
+    def _holds_lease(self):
+        return self.store.acquire_lease(SHEET_WRITER_LEASE, self.owner, self.lease_seconds)
+
+    def pending(self):
+        if not self._holds_lease():
+            return []
+        return self.store.unsynced_rows(limit=self.batch_limit)
+
+    def ack(self, entry_ids):
+        self.store.mark_synced(entry_ids)
+        # 배치마다 임차권을 연장해 긴 복제 중에 다른 인스턴스가 같은 행을 가져가지 않게 함
+        self._holds_lease()
+
+    def header_pending(self, worksheet):
+        return self.store.header_pending(worksheet)
+
+    def set_header_pending(self, worksheet, pending):
+        self.store.set_header_pending(worksheet, pending)
+
+    def close(self):
+        self.store.release_lease(SHEET_WRITER_LEASE, self.owner)
+
+    def __len__(self):
+        # 이 인스턴스가 맡지 않은 행은 기다리지 않음 (flush/종료가 다른 인스턴스의 몫까지 기다리지 않게)
+        if not self._holds_lease():
+            return 0
+        return self.store.unsynced_count()
@@ -0,0 +1,82 @@
+# 서버 메모리 사용량 집계
+# 세션마다 st.session_state가 차지하는 크기를 재실행 때마다 기록하고, 프로세스 전체 RSS와 함께 보여줌.
+# 일정 간격으로 로그에도 남겨, 수업 인원에 맞는 서버 크기를 정할 수 있게 함.
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger("trigonometric_music")
+
+
+def deep_sizeof(obj, seen=None):
+    # 객체와 그 안에 담긴 값들의 크기 합 (같은 객체는 한 번만 셈)
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, dict):
+        return size + sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(deep_sizeof(item, seen) for item in obj)
+    for name in getattr(type(obj), "__slots__", ()):
+        if hasattr(obj, name):
+            size += deep_sizeof(getattr(obj, name), seen)
+    if hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+def process_rss_bytes():
+    # 현재 RSS (리눅스는 /proc에서, 그 밖에는 최대 RSS로 대신함)
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class SessionFootprints:
+    def __init__(self, idle_timeout=1800, log_interval=60):
+        self.idle_timeout = idle_timeout
+        self.log_interval = log_interval
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._last_log = time.monotonic()
+
+    def update(self, session_id, label, state):
+        size = deep_sizeof(state)
+        now = time.monotonic()
+        with self._lock:
+            self._sessions[session_id] = (label, size, now)
+            # 한동안 재실행이 없던 세션은 끝난 것으로 보고 뺌
+            for stale_id in [sid for sid, (_, _, seen) in self._sessions.items() if now - seen > self.idle_timeout]:
+                del self._sessions[stale_id]
+            should_log = now - self._last_log >= self.log_interval
+            if should_log:
+                self._last_log = now
+        if should_log:
+            summary = self.summary()
+            logger.info("memory_footprint rss_mb=%.1f sessions=%d session_state_total_kb=%.1f session_state_max_kb=%.1f",
+                        summary["rss_bytes"] / 2**20, summary["sessions"], summary["total_bytes"] / 1024, summary["max_bytes"] / 1024)
+        return size
+
+    def summary(self):
+        with self._lock:
+            sessions = sorted(((label, size) for label, size, _ in self._sessions.values()), key=lambda item: -item[1])
+        total = sum(size for _, size in sessions)
+        return {
+            "rss_bytes": process_rss_bytes(),
+            "sessions": len(sessions),
+            "total_bytes": total,
+            "max_bytes": sessions[0][1] if sessions else 0,
+            "mean_bytes": total / len(sessions) if sessions else 0,
+            "largest": sessions[:10],
+        }
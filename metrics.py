@@ -0,0 +1,286 @@
+# 서버 내부 지표: 구간(span)별 지연 시간 히스토그램과 오류/재시도/토큰 카운터
+# 외부 호출(OpenAI, Sheets, 이미지 저장, 저장소 읽기)과 페이지 렌더링을 span으로 감싸 걸린 시간과 오류 수를 모음.
+# 진단 페이지에서 보여주고 Prometheus 텍스트/JSON 파일로도 내보내, 수업 중에 OpenAI와 Sheets 중 어디가 병목인지 확인함.
+# 캐시/스케줄러처럼 자체 통계를 가진 객체는 collector로 등록해 같은 출력에 함께 담음.
+import bisect
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("trigonometric_music")
+
+PREFIX = "tm"
+# 5 ms(로컬 저장소 읽기)부터 60초(OpenAI 재시도 포함)까지를 나눈 구간 (초)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum", "min", "max")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        # 구간 안에서는 고르게 퍼져 있다고 보고 보간하고, 실제로 관측한 최솟값~최댓값 밖으로는 나가지 않게 함
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        estimate = self.max
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if i < len(self.buckets):
+                    low = self.buckets[i - 1] if i else 0.0
+                    estimate = low + (self.buckets[i] - low) * (rank - seen) / count
+                break
+            seen += count
+        return min(max(estimate, self.min), self.max)
+
+
+class Span:
+    __slots__ = ("labels", "error")
+
+    def __init__(self, labels):
+        self.labels = labels
+        self.error = None
+
+    def set(self, **labels):
+        # 결과(캐시 적중, 규칙 채점 등)처럼 끝나 봐야 아는 라벨을 붙임
+        self.labels.update({key: str(value) for key, value in labels.items()})
+
+    def fail(self, kind):
+        # 예외 없이 오류 응답을 돌려주는 경우에도 오류로 셈
+        self.error = kind
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _sanitize(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{_sanitize(key)}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _flatten(prefix, value, labels):
+    # collector가 돌려준 통계(dict)에서 숫자만 골라 (이름, 라벨, 값)으로 펼침.
+    # 값이 모두 dict인 dict(질문별, 규칙별 등)는 키를 라벨로, 나머지는 키를 이름에 붙임
+    if isinstance(value, bool):
+        yield prefix, labels, int(value)
+    elif isinstance(value, (int, float)):
+        if math.isfinite(value):
+            yield prefix, labels, value
+    elif isinstance(value, dict) and value:
+        if all(isinstance(sub, dict) for sub in value.values()):
+            label_name = "key" if not labels else f"key{len(labels) + 1}"
+            for key, sub in value.items():
+                yield from _flatten(prefix, sub, labels + ((label_name, str(key)),))
+        else:
+            for key, sub in value.items():
+                yield from _flatten(f"{prefix}_{key}", sub, labels)
+
+
+class MetricsRegistry:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._errors = {}
+        self._counters = {}
+        self._collectors = {}
+        self._started = time.time()
+
+    @contextmanager
+    def span(self, name, **labels):
+        # with 블록이 걸린 시간을 기록하고, 예외가 나면 오류 종류별로 셈.
+        # Streamlit의 st.rerun()/st.stop()은 BaseException이라 오류로 세지 않음
+        current = Span({key: str(value) for key, value in labels.items()})
+        started = time.perf_counter()
+        try:
+            yield current
+        except Exception as e:
+            current.fail(type(e).__name__)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, error=current.error, **current.labels)
+
+    def observe(self, name, seconds, error=None, **labels):
+        key = (name, _label_key({k: str(v) for k, v in labels.items()}))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            if error is not None:
+                error_key = key + (error,)
+                self._errors[error_key] = self._errors.get(error_key, 0) + 1
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, _label_key({k: str(v) for k, v in labels.items()}))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def register_collector(self, name, collect):
+        # collect()는 숫자가 담긴 dict를 돌려주는 함수 (각 객체의 stats()/summary())
+        with self._lock:
+            self._collectors[name] = collect
+
+    def _collect(self):
+        with self._lock:
+            collectors = dict(self._collectors)
+        components = {}
+        for name, collect in collectors.items():
+            try:
+                components[name] = collect()
+            except Exception as e:
+                logger.warning("지표 수집 실패 (%s): %s", name, e)
+        return components
+
+    def snapshot(self):
+        with self._lock:
+            histograms = [(name, labels, histogram.count, histogram.sum, list(histogram.counts),
+                           histogram.quantile(0.5), histogram.quantile(0.95), histogram.quantile(0.99))
+                          for (name, labels), histogram in self._histograms.items()]
+            errors = dict(self._errors)
+            counters = dict(self._counters)
+        spans = []
+        for name, labels, count, total, counts, p50, p95, p99 in sorted(histograms):
+            span_errors = {error: n for (e_name, e_labels, error), n in errors.items() if (e_name, e_labels) == (name, labels)}
+            spans.append({
+                "span": name,
+                "labels": dict(labels),
+                "count": count,
+                "errors": sum(span_errors.values()),
+                "errors_by_type": span_errors,
+                "sum_seconds": total,
+                "mean_ms": total / count * 1000 if count else 0.0,
+                "p50_ms": p50 * 1000,
+                "p95_ms": p95 * 1000,
+                "p99_ms": p99 * 1000,
+                "buckets": {("+Inf" if i == len(self.buckets) else str(self.buckets[i])): n for i, n in enumerate(counts)},
+            })
+        return {
+            "generated_at": time.time(),
+            "uptime_seconds": time.time() - self._started,
+            "spans": spans,
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in sorted(counters.items())],
+            "components": self._collect(),
+        }
+
+    def span_totals(self, name):
+        # 라벨을 모두 합친 한 span의 호출 수/오류 수/평균·p95 지연 (진단 페이지 요약용)
+        merged = Histogram(self.buckets)
+        with self._lock:
+            for (span_name, _), histogram in self._histograms.items():
+                if span_name == name:
+                    merged.merge(histogram)
+            errors = sum(n for (span_name, _, _), n in self._errors.items() if span_name == name)
+        return {
+            "count": merged.count,
+            "errors": errors,
+            "mean_ms": merged.sum / merged.count * 1000 if merged.count else 0.0,
+            "p95_ms": merged.quantile(0.95) * 1000,
+        }
+
+    def prometheus_text(self, snapshot=None):
+        snapshot = snapshot or self.snapshot()
+        lines = [
+            f"# HELP {PREFIX}_span_duration_seconds Time spent in instrumented spans.",
+            f"# TYPE {PREFIX}_span_duration_seconds histogram",
+        ]
+        for span in snapshot["spans"]:
+            labels = (("span", span["span"]),) + tuple(sorted(span["labels"].items()))
+            cumulative = 0
+            for le, count in span["buckets"].items():
+                cumulative += count
+                lines.append(f"{PREFIX}_span_duration_seconds_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{PREFIX}_span_duration_seconds_sum{_format_labels(labels)} {_format_value(span['sum_seconds'])}")
+            lines.append(f"{PREFIX}_span_duration_seconds_count{_format_labels(labels)} {span['count']}")
+        lines += [
+            f"# HELP {PREFIX}_span_errors_total Spans that ended with an error, by error type.",
+            f"# TYPE {PREFIX}_span_errors_total counter",
+        ]
+        for span in snapshot["spans"]:
+            labels = (("span", span["span"]),) + tuple(sorted(span["labels"].items()))
+            for error, count in sorted(span["errors_by_type"].items()):
+                lines.append(f"{PREFIX}_span_errors_total{_format_labels(labels + (('error', error),))} {count}")
+
+        counter_names = sorted({counter["name"] for counter in snapshot["counters"]})
+        for name in counter_names:
+            metric = f"{PREFIX}_{_sanitize(name)}"
+            lines.append(f"# TYPE {metric} counter")
+            for counter in snapshot["counters"]:
+                if counter["name"] == name:
+                    lines.append(f"{metric}{_format_labels(tuple(sorted(counter['labels'].items())))} {_format_value(counter['value'])}")
+
+        gauges = {}
+        for component, stats in sorted(snapshot["components"].items()):
+            for name, labels, value in _flatten(f"{PREFIX}_{component}", stats, ()):
+                gauges.setdefault(_sanitize(name), []).append((labels, value))
+        for metric, samples in gauges.items():
+            lines.append(f"# TYPE {metric} gauge")
+            for labels, value in samples:
+                lines.append(f"{metric}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self, snapshot=None):
+        return json.dumps(snapshot or self.snapshot(), ensure_ascii=False, indent=2, default=str)
+
+    def dump(self, directory):
+        # node_exporter의 textfile 수집기나 다른 도구가 읽을 수 있게 같은 시점의 값을 두 형식으로 씀
+        os.makedirs(directory, exist_ok=True)
+        snapshot = self.snapshot()
+        for filename, text in (("metrics.prom", self.prometheus_text(snapshot)), ("metrics.json", self.to_json(snapshot))):
+            path = os.path.join(directory, filename)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+
+
+# 프로세스 전체가 공유하는 기본 저장소 (백그라운드 스레드에서도 그대로 씀)
+REGISTRY = MetricsRegistry()
+span = REGISTRY.span
+observe = REGISTRY.observe
+increment = REGISTRY.increment
+register_collector = REGISTRY.register_collector
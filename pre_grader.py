@@ -0,0 +1,196 @@
+# AI를 부르기 전에 규칙으로 먼저 확인하는 채점 단계
+# 판단이 필요 없는 답변(모르겠다는 답, 질문과 무관한 답, 1-1/1-3에서 변수를 하나도 언급하지 않은 답, 목표(G5)와 다른 함수식)은
+# 정해진 촉진 질문을 바로 돌려주고, 나머지 답변만 AI에게 보냄.
+# 규칙으로 돌려주는 경우는 모두 채점 요소 전부가 0점으로 정해지는 경우뿐임 (일부 요소만 정해지면 AI에게 맡김).
+import math
+import re
+import threading
+
+G5_FREQUENCY = 784.0
+FREQUENCY_TOLERANCE = 0.01
+# 문제에서 정한 '적당한 볼륨'은 최대 진폭 1 이하. 0이면 소리가 나지 않음
+MAX_AMPLITUDE = 1.0
+
+DONT_KNOW_RE = re.compile(r"^(?:[\s.,!?~ㅠㅜㅋㅎ]*(?:진짜|정말|잘|너무|아직|전혀|하나도|그냥)?\s*(?:모르겠\w*|몰라\w*|모름|모르\w*|글쎄\w*))+[\s.,!?~ㅠㅜㅋㅎ]*$")
+JAMO_RE = re.compile(r"[ㄱ-ㅣ]")
+VARIABLE_LETTER_RE = re.compile(r"(?<![A-Za-z])[ABCDabcd](?![A-Za-z])")
+VARIABLE_WORDS = ("진폭", "주파수", "진동수", "위상", "수직 이동", "수직이동", "평행이동", "평행 이동", "주기")
+# 변수를 한글 읽기(에이, 비, 씨, 디)나 소리의 속성(높이, 크기, 볼륨)으로 말한 답변도 변수를 언급한 것으로 봄.
+# 비교, 준비, 어디, 씨앗처럼 다른 낱말의 일부인 경우를 거르려고 앞뒤에 다른 한글이 붙지 않은 낱말만 인정함
+# (변수 이름 뒤에는 "에이는", "비를"처럼 조사 하나만 붙을 수 있음)
+VARIABLE_NAME_RE = re.compile(r"(?<![가-힣])(?:에이|비|씨|디)(?:는|은|가|이|를|을|의|와|과|도|로|값)?(?![가-힣])")
+PROPERTY_WORD_RE = re.compile(r"(?<![가-힣])(?:음높이|높이|크기|볼륨)(?![가-힣])")
+# 변수와 소리 속성을 짝짓는 것 자체가 과제인 질문에서만 "변수 언급 없음"을 규칙으로 채점함
+# (2-2, 3-1처럼 변수를 다른 방식으로 설명해도 되는 질문은 AI에게 맡김)
+MISSING_VARIABLES_QUESTIONS = ("1-1", "1-3")
+FORMULA_WORDS = ("sin", "사인", "삼각함수", "함수", "그래프", "식", "y=", "y =", "geogebra", "지오지브라")
+FORMULA_RE = re.compile(r"y\s*=\s*(?P<a>[-+]?[\d.]*)\s*\*?\s*sin\s*\((?P<inner>[^()]*(?:\([^()]*\)[^()]*)*)\)\s*(?P<d>[-+]\s*[\d.]+)?", re.I)
+ASSIGNMENT_RE = re.compile(
+    r"(?<![A-Za-z])(?P<var>[ABCDabcd])\s*(?:의\s*)?(?:값\s*)?(?:=|:|는|은|을|를)\s*(?:약\s*)?"
+    r"(?P<value>[-+]?\s*(?:\d+(?:\.\d+)?|pi)(?:\s*[*/]?\s*(?:\d+(?:\.\d+)?|pi))*)"
+)
+NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+# 질문별로 처음 생각을 시작하게 돕는 촉진 질문 (모범 답안의 내용은 직접 알려주지 않음)
+STARTER_QUESTIONS = {
+    "1-1": "소리의 '높낮이', '시작 느낌', '크기' 중 하나를 먼저 골라볼까요? 그 특징은 y = A*sin(B*x + C) + D의 어떤 변수를 바꾸면 달라질까요?",
+    "1-2": "목표 소리는 '한 옥타브 높은 솔(G5)'이에요. GeoGebra 도구 2에서 G5의 주파수를 찾아보고, 그 값을 넣은 함수식을 직접 적어볼까요?",
+    "1-3": "A를 크게 하면 그래프의 어떤 부분이 달라지고, 그때 소리는 어떻게 들릴까요? 나머지 변수도 같은 방법으로 하나씩 생각해볼까요?",
+    "2-1": "G5의 주파수가 몇 Hz인지, 그리고 그 값이 변수 B와 어떻게 연결되는지부터 적어볼까요?",
+    "2-2": "'점점 커지는 소리'를 만들려면 어떤 변수가 시간에 따라 변해야 할까요? 그 변수를 t에 대한 식으로 써볼 수 있을까요?",
+    "3-1": "A를 바꿀 때 소리의 높낮이도 함께 바뀌나요? 변수를 하나씩만 바꿔 보며 어떤 일이 일어나는지 확인해볼까요?",
+    "3-2": "이번 활동에서 수학식을 바꿔 소리가 달라졌던 순간 중 가장 기억에 남는 장면은 무엇이었나요? 그때 어떤 생각이 들었나요?",
+}
+
+
+def rubric_elements(criteria):
+    # "- 절차 선택 (1점): ..." 같은 줄에서 채점 요소 이름과 배점을 꺼냄
+    elements = []
+    for line in criteria.splitlines():
+        match = re.match(r"^\s*-?\s*(.+?)\s*\((\d+)점\)", line)
+        if match:
+            elements.append((match.group(1), int(match.group(2))))
+    return elements
+
+
+def _normalize(text):
+    text = text.replace("·", "*").replace("×", "*").replace("∙", "*").replace("−", "-").replace("π", "pi")
+    text = re.sub(r"(?i)pi", "pi", text)
+    # 2pi, 784(x) 같은 생략된 곱셈 기호를 채워 넣음
+    text = re.sub(r"(?<=[\d.)])\s*(?=pi|\()", "*", text)
+    return re.sub(r"(?<=pi)\s*(?=[\d(])", "*", text)
+
+
+def _value(text):
+    # 식 해석은 소리 합성기와 같은 평가기를 씀 (NumPy를 불러오므로 첫 화면 이후에 필요할 때 불러옴)
+    from sound_synth import SoundExpressionError, evaluate_constant
+    try:
+        value = evaluate_constant(text)
+    except SoundExpressionError:
+        return None
+    return value if math.isfinite(value) else None
+
+
+def extract_parameters(answer):
+    # 답변에 적힌 함수식과 "B = 784", "B 값을 784로" 같은 표현에서 변수 값 후보를 모음
+    text = _normalize(answer)
+    found = {"A": [], "B": [], "C": [], "D": []}
+    for match in FORMULA_RE.finditer(text):
+        inner = match.group("inner")
+        variable = re.search(r"(?<![a-z])[xt](?![a-z])", inner)
+        if variable is None:
+            continue
+        a_text = match.group("a")
+        b_text = inner[:variable.start()].strip().rstrip("*").strip()
+        c_text = inner[variable.end():].strip()
+        candidates = {
+            "A": -1.0 if a_text == "-" else (_value(a_text) if a_text not in ("", "+") else 1.0),
+            "B": _value(b_text) if b_text else 1.0,
+            "C": _value("0" + c_text) if c_text else 0.0,
+            "D": _value(match.group("d").replace(" ", "")) if match.group("d") else 0.0,
+        }
+        for name, value in candidates.items():
+            if value is not None:
+                found[name].append(value)
+    for match in ASSIGNMENT_RE.finditer(text):
+        value = _value(match.group("value"))
+        if value is not None:
+            found[match.group("var").upper()].append(value)
+    return found
+
+
+def is_g5(value):
+    # B를 주파수(Hz)로 쓴 경우와 각진동수(2π·주파수)로 쓴 경우를 모두 인정
+    return any(abs(candidate - G5_FREQUENCY) <= G5_FREQUENCY * FREQUENCY_TOLERANCE for candidate in (value, value / (2 * math.pi)))
+
+
+def mentions_variables(answer):
+    return (bool(VARIABLE_LETTER_RE.search(answer)) or any(word in answer for word in VARIABLE_WORDS)
+            or bool(VARIABLE_NAME_RE.search(answer)) or bool(PROPERTY_WORD_RE.search(answer)))
+
+
+def _is_gibberish(answer):
+    chars = [ch for ch in answer if not ch.isspace()]
+    if not chars:
+        return True
+    return len(JAMO_RE.findall(answer)) / len(chars) >= 0.3 or len(set(chars)) <= 3
+
+
+def find_rule(q_key, answer, question_text):
+    # 규칙에 걸리면 (규칙 이름, 분석 문장, 촉진 질문)을, 판단이 필요하면 None을 돌려줌
+    stripped = answer.strip()
+    starter = STARTER_QUESTIONS.get(q_key, "질문을 다시 천천히 읽어보고, 떠오르는 생각을 한 문장씩 적어볼까요?")
+    if DONT_KNOW_RE.match(stripped):
+        return ("dont_know", "어디서부터 시작해야 할지 막막할 수 있어요. 모르겠다고 솔직하게 적어준 것도 좋은 출발이에요.", starter)
+    if _is_gibberish(stripped):
+        return ("gibberish", "답변을 적어주어 고마워요. 다만 지금 답변은 어떤 생각을 담았는지 알아보기 어려워요.", starter)
+
+    lowered = stripped.lower()
+    if q_key in MISSING_VARIABLES_QUESTIONS and not mentions_variables(stripped):
+        return ("missing_variables",
+                "소리에 대해 생각한 내용을 적어주었네요. 이 질문은 변수 A, B, C, D와 연결해서 설명해야 해요.", starter)
+    if q_key == "1-2":
+        if not any(word in lowered for word in FORMULA_WORDS):
+            return ("off_topic", "답변을 적어주어 고마워요. 다만 지금 답변에서는 함수식을 찾기 어려워요.", starter)
+        parameters = extract_parameters(stripped)
+        # 답변 어딘가에 784(또는 2π·784)가 있으면 식을 잘못 읽었을 수 있으므로 AI에게 맡김
+        mentions_g5 = any(is_g5(float(number)) for number in NUMBER_RE.findall(_normalize(stripped)))
+        if parameters["B"] and not mentions_g5 and not any(is_g5(b) for b in parameters["B"]):
+            frequency = parameters["B"][-1]
+            return ("wrong_frequency",
+                    f"함수식을 직접 세워본 점이 좋아요. 그런데 지금 B 값({frequency:g})으로는 목표한 음높이가 나오지 않아요.",
+                    "목표인 '한 옥타브 높은 솔(G5)'의 주파수는 몇 Hz일까요? GeoGebra 도구 2에서 확인하고, "
+                    "그 값이 B와 어떻게 연결되는지 생각해볼까요? 도구 3에서 지금 식의 소리를 들어보는 것도 좋아요.")
+        if parameters["A"] and all(a == 0 or abs(a) > MAX_AMPLITUDE for a in parameters["A"]):
+            amplitude = parameters["A"][-1]
+            return ("amplitude_out_of_range",
+                    f"함수식을 직접 세워본 점이 좋아요. 그런데 A가 {amplitude:g}이면 '적당한 볼륨'이 되기 어려워요.",
+                    "A 값에 따라 소리의 크기가 어떻게 달라질까요? 소리가 너무 크거나 들리지 않으면 A를 어떤 범위로 정해야 할까요? "
+                    "도구 3에서 직접 들어보며 확인해볼까요?")
+    return None
+
+
+def pre_grade(q_key, answer, q_info, criteria):
+    # 규칙으로 결론이 나는 답변이면 AI 응답과 같은 형식의 피드백(dict)을, 아니면 None을 돌려줌
+    rule = find_rule(q_key, answer, q_info["text"])
+    if rule is None:
+        return None
+    name, analysis, suggestion = rule
+    elements = rubric_elements(criteria) or [("총점", q_info["max_score"])]
+    return {
+        "scores": {element: 0 for element, _ in elements},
+        "total_score": 0,
+        "analysis": analysis,
+        "suggestion": suggestion,
+        "graded_by": f"rule:{name}",
+    }
+
+
+# --- AI 호출을 얼마나 줄였는지 집계 ---
+class PreGraderStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = 0
+        self._by_rule = {}
+        self._by_question = {}
+
+    def record(self, q_key, feedback):
+        rule = feedback["graded_by"] if feedback is not None else None
+        with self._lock:
+            self._checked += 1
+            row = self._by_question.setdefault(q_key, {"checked": 0, "pre_graded": 0})
+            row["checked"] += 1
+            if rule is not None:
+                row["pre_graded"] += 1
+                self._by_rule[rule] = self._by_rule.get(rule, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            pre_graded = sum(self._by_rule.values())
+            return {
+                "checked": self._checked,
+                "pre_graded": pre_graded,
+                "avoided_share": pre_graded / self._checked if self._checked else 0.0,
+                "by_rule": dict(self._by_rule),
+                "by_question": {q_key: dict(row) for q_key, row in self._by_question.items()},
+            }
@@ -0,0 +1,74 @@
+# 학생 세션에 질문별로 남겨 두는 상태
+# 질문마다 dict 여러 개에 흩어져 있던 값을 __slots__ 객체 하나로 모음.
+# AI 피드백 전체(JSON)는 저장소에 기록된 뒤에는 행 번호만 남기고, 화면에 필요한 분석/질문/총점만 들고 있음.
+
+
+class QuestionState:
+    __slots__ = (
+        "answer", "attempts", "finalized", "image_path", "image_upload_id", "upload_round",
+        "total_score", "analysis", "suggestion", "error", "submission_id", "unsaved_feedback",
+    )
+
+    def __init__(self):
+        self.answer = ""
+        self.attempts = 0
+        self.finalized = False
+        self.image_path = ""
+        self.image_upload_id = None
+        # 올린 파일을 처리한 뒤 업로드 위젯의 key를 바꿔 원본이 세션에 남지 않게 함
+        self.upload_round = 0
+        self.total_score = None
+        self.analysis = ""
+        self.suggestion = ""
+        self.error = None
+        self.submission_id = None
+        self.unsaved_feedback = None
+
+    @property
+    def has_feedback(self):
+        return self.error is not None or self.total_score is not None
+
+    def set_feedback(self, feedback, submission_id=None):
+        self.error = feedback.get("error")
+        self.analysis = feedback.get("analysis", "")
+        self.suggestion = feedback.get("suggestion", "")
+        try:
+            self.total_score = int(feedback.get("total_score", 0)) if self.error is None else None
+        except (TypeError, ValueError):
+            self.total_score = 0
+        self.submission_id = submission_id
+        # 저장에 실패한 피드백만 전체를 들고 있다가 최종 제출 때 다시 저장함
+        self.unsaved_feedback = feedback if submission_id is None and self.error is None else None
+
+    def checkpoint(self):
+        # 다른 서버 인스턴스에서도 이어서 할 수 있게 저장소에 남길 값 (업로드 위젯에 묶인 값은 빼고)
+        return {name: getattr(self, name) for name in CHECKPOINT_SLOTS}
+
+    @classmethod
+    def from_checkpoint(cls, data):
+        state = cls()
+        for name in CHECKPOINT_SLOTS:
+            if name in data:
+                setattr(state, name, data[name])
+        return state
+
+    def full_feedback(self, store):
+        # 저장소에 기록된 피드백은 필요할 때(최종 제출, 완료 페이지) 다시 읽어 옴
+        if self.unsaved_feedback is not None:
+            return self.unsaved_feedback
+        if self.submission_id is not None:
+            feedback = store.submission_feedback(self.submission_id)
+            if feedback is not None:
+                return feedback
+        if self.error is not None:
+            return {"error": self.error}
+        if self.total_score is None:
+            return {}
+        return {"total_score": self.total_score, "analysis": self.analysis, "suggestion": self.suggestion}
+
+
+CHECKPOINT_SLOTS = tuple(name for name in QuestionState.__slots__ if name not in ("image_upload_id", "upload_round"))
+
+
+def new_question_states(question_order):
+    return {q_key: QuestionState() for q_key in question_order}
@@ -0,0 +1,58 @@
+# 스크립트 재실행 시간 집계
+# 전체 페이지 재실행과 fragment(답변 영역, 사이드바)만의 재실행을 나눠 걸린 시간과 다시 보낸 iframe 수를 모음.
+# 중첩된 측정(전체 재실행 안에서 실행된 fragment)은 바깥 측정에 포함되므로 따로 기록하지 않음.
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import metrics
+
+logger = logging.getLogger("trigonometric_music")
+
+
+class RerunTimings:
+    def __init__(self, window=500):
+        self.window = window
+        self._lock = threading.Lock()
+        self._runs = {}
+        self._local = threading.local()
+
+    @contextmanager
+    def measure(self, scope):
+        # 스크립트는 세션마다 자기 스레드에서 실행되므로, 스레드별로 바깥 측정만 기록함
+        if getattr(self._local, "run", None) is not None:
+            yield
+            return
+        run = self._local.run = {"iframes": 0}
+        started = time.perf_counter()
+        try:
+            # 같은 시간을 서버 지표(page.render)에도 남겨 진단 페이지와 파일 출력에서 함께 봄
+            with metrics.span("page.render", scope=scope):
+                yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self._local.run = None
+            with self._lock:
+                self._runs.setdefault(scope, deque(maxlen=self.window)).append((elapsed, run["iframes"]))
+            logger.debug("재실행 %s: %.1f ms, iframe %d개", scope, elapsed * 1000, run["iframes"])
+
+    def add_iframes(self, count):
+        run = getattr(self._local, "run", None)
+        if run is not None:
+            run["iframes"] += count
+
+    def summary(self):
+        with self._lock:
+            runs = {scope: list(samples) for scope, samples in self._runs.items()}
+        result = {}
+        for scope, samples in runs.items():
+            times = sorted(elapsed for elapsed, _ in samples)
+            result[scope] = {
+                "runs": len(samples),
+                "mean_ms": sum(times) / len(times) * 1000,
+                "p95_ms": times[min(len(times) - 1, int(len(times) * 0.95))] * 1000,
+                "iframes_per_run": sum(iframes for _, iframes in samples) / len(samples),
+            }
+        return result
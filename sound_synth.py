@@ -0,0 +1,178 @@
+# 학생이 정한 y = A*sin(B*t + C) + D를 실제 소리(WAV)로 만들어 들려주기 위한 합성기
+# A, B, C, D에는 숫자뿐 아니라 t에 대한 식(예: A = 1 - 0.1*t, B = 440 + 100*t)도 쓸 수 있음.
+# 식은 파이썬 eval이 아닌 허용된 연산만 해석하는 작은 평가기로 계산하고, 모든 계산은 NumPy 배열 단위로 한 번에 함.
+import ast
+import io
+import threading
+import time
+import wave
+from collections import OrderedDict
+
+import numpy as np
+
+MAX_EXPRESSION_LENGTH = 200
+MAX_EXPRESSION_NODES = 100
+
+# 식에서 쓸 수 있는 함수와 상수 (t와 x는 모두 시간(초))
+FUNCTIONS = {
+    "sin": np.sin, "cos": np.cos, "tan": np.tan, "exp": np.exp,
+    "sqrt": np.sqrt, "abs": np.abs, "log": np.log,
+}
+CONSTANTS = {"pi": np.pi, "e": np.e}
+TIME_NAMES = ("t", "x")
+BINARY_OPERATORS = {
+    ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply,
+    ast.Div: np.divide, ast.Pow: np.power,
+}
+UNARY_OPERATORS = {ast.UAdd: np.positive, ast.USub: np.negative}
+
+
+class SoundExpressionError(ValueError):
+    pass
+
+
+def parse_expression(text):
+    text = str(text).strip().replace("^", "**").replace("π", "pi")
+    if not text:
+        raise SoundExpressionError("값이 비어 있습니다.")
+    if len(text) > MAX_EXPRESSION_LENGTH:
+        raise SoundExpressionError(f"식이 너무 깁니다. ({MAX_EXPRESSION_LENGTH}자 이하)")
+    try:
+        tree = ast.parse(text, mode="eval")
+    except SyntaxError:
+        raise SoundExpressionError(f"'{text}'을(를) 식으로 읽을 수 없습니다. 곱셈은 0.1*t처럼 *를 써주세요.")
+    nodes = list(ast.walk(tree))
+    if len(nodes) > MAX_EXPRESSION_NODES:
+        raise SoundExpressionError("식이 너무 복잡합니다.")
+    for node in nodes:
+        _check_node(node)
+    return tree.body
+
+
+def _check_node(node):
+    if isinstance(node, (ast.Expression, ast.Load, ast.operator, ast.unaryop)):
+        if isinstance(node, ast.operator) and type(node) not in BINARY_OPERATORS:
+            raise SoundExpressionError("+, -, *, /, ** 연산만 쓸 수 있습니다.")
+        if isinstance(node, ast.unaryop) and type(node) not in UNARY_OPERATORS:
+            raise SoundExpressionError("+, -, *, /, ** 연산만 쓸 수 있습니다.")
+        return
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise SoundExpressionError("숫자만 쓸 수 있습니다.")
+        return
+    if isinstance(node, ast.Name):
+        if node.id not in TIME_NAMES and node.id not in CONSTANTS and node.id not in FUNCTIONS:
+            raise SoundExpressionError(f"'{node.id}'은(는) 쓸 수 없습니다. 시간은 t, 원주율은 pi로 써주세요.")
+        return
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or len(node.args) != 1 or node.keywords:
+            raise SoundExpressionError(f"함수는 {', '.join(FUNCTIONS)}에 값 하나만 넣어 쓸 수 있습니다.")
+        return
+    if isinstance(node, (ast.BinOp, ast.UnaryOp)):
+        return
+    raise SoundExpressionError("숫자, t, pi와 사칙연산, 거듭제곱, sin/cos 같은 함수만 쓸 수 있습니다.")
+
+
+def evaluate_expression(node, t):
+    # 상수도 float64로 바꿔 계산하므로 9**9**9 같은 식도 정수 연산으로 멈추지 않고 inf가 됨
+    if isinstance(node, ast.Constant):
+        return np.float64(node.value)
+    if isinstance(node, ast.Name):
+        return t if node.id in TIME_NAMES else np.float64(CONSTANTS[node.id])
+    if isinstance(node, ast.BinOp):
+        return BINARY_OPERATORS[type(node.op)](evaluate_expression(node.left, t), evaluate_expression(node.right, t))
+    if isinstance(node, ast.UnaryOp):
+        return UNARY_OPERATORS[type(node.op)](evaluate_expression(node.operand, t))
+    return FUNCTIONS[node.func.id](evaluate_expression(node.args[0], t))
+
+
+def evaluate(text, t, name):
+    with np.errstate(all="ignore"):
+        values = np.broadcast_to(evaluate_expression(parse_expression(text), t), t.shape)
+    if not np.all(np.isfinite(values)):
+        raise SoundExpressionError(f"{name} 값이 어떤 시점에서 정의되지 않거나 무한대가 됩니다.")
+    return values
+
+
+def evaluate_constant(text):
+    # t가 없는 식(예: 2*pi*784)을 숫자 하나로 계산. 계산할 수 없으면 nan/inf가 나올 수 있음
+    with np.errstate(all="ignore"):
+        return float(evaluate_expression(parse_expression(text), np.float64(0.0)))
+
+
+def synthesize(a, b, c, d, duration=2.0, sample_rate=22050, b_in_hz=True):
+    # 반환: -1~1 범위의 float32 샘플과, 계산된 주파수(Hz)의 최솟값/최댓값
+    t = np.arange(int(duration * sample_rate), dtype=np.float64) / sample_rate
+    amplitude = evaluate(a, t, "A")
+    frequency = evaluate(b, t, "B")
+    if not b_in_hz:
+        frequency = frequency / (2 * np.pi)
+    nyquist = sample_rate / 2
+    if frequency.min() < 0 or frequency.max() > nyquist:
+        raise SoundExpressionError(f"주파수는 0~{nyquist:,.0f}Hz 사이여야 합니다. (지금: {frequency.min():,.0f}~{frequency.max():,.0f}Hz)")
+    # 주파수가 시간에 따라 변하면(글리산도) 위상은 주파수를 시간에 대해 적분한 값이어야 소리가 끊기지 않음.
+    # sin(2π·B(t)·t)로 계산하면 실제 음높이가 B(t)와 달라지므로, 샘플마다 누적합으로 위상을 구함
+    if np.ptp(frequency) == 0:
+        phase = 2 * np.pi * frequency[0] * t
+    else:
+        phase = 2 * np.pi * np.concatenate(([0.0], np.cumsum(frequency[:-1]))) / sample_rate
+    samples = amplitude * np.sin(phase + evaluate(c, t, "C")) + evaluate(d, t, "D")
+    # 스피커가 낼 수 있는 범위(-1~1)를 넘는 부분은 잘림 (A나 D가 크면 소리가 찌그러지는 것을 그대로 들려줌)
+    np.clip(samples, -1.0, 1.0, out=samples)
+    return samples.astype(np.float32), (float(frequency.min()), float(frequency.max()))
+
+
+def wav_bytes(samples, sample_rate):
+    pcm = (samples * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+# --- 같은 값으로 만든 소리는 다시 계산하지 않음 (모든 세션이 공유하는 LRU) ---
+class SoundSynth:
+    def __init__(self, sample_rate=22050, max_entries=256, max_duration=5.0):
+        self.sample_rate = sample_rate
+        self.max_entries = max_entries
+        self.max_duration = max_duration
+        self._lock = threading.Lock()
+        self._clips = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "render_seconds": 0.0}
+
+    @staticmethod
+    def cache_key(a, b, c, d, duration, b_in_hz):
+        # 공백만 다른 식은 같은 소리로 취급
+        return tuple("".join(str(value).split()) for value in (a, b, c, d)) + (round(float(duration), 3), bool(b_in_hz))
+
+    def render(self, a, b, c, d, duration=2.0, b_in_hz=True):
+        # 반환: (WAV 바이트, (최저 주파수, 최고 주파수)). 식이 잘못되면 SoundExpressionError
+        duration = min(max(float(duration), 0.1), self.max_duration)
+        key = self.cache_key(a, b, c, d, duration, b_in_hz)
+        with self._lock:
+            clip = self._clips.get(key)
+            if clip is not None:
+                self._clips.move_to_end(key)
+                self._stats["hits"] += 1
+                return clip
+        started = time.perf_counter()
+        samples, frequency_range = synthesize(a, b, c, d, duration, self.sample_rate, b_in_hz)
+        clip = (wav_bytes(samples, self.sample_rate), frequency_range)
+        with self._lock:
+            self._stats["misses"] += 1
+            self._stats["render_seconds"] += time.perf_counter() - started
+            self._clips[key] = clip
+            while len(self._clips) > self.max_entries:
+                self._clips.popitem(last=False)
+                self._stats["evictions"] += 1
+        return clip
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._clips)
+        stats["mean_render_ms"] = stats["render_seconds"] / stats["misses"] * 1000 if stats["misses"] else 0.0
+        return stats
@@ -1,19 +1,27 @@
 import streamlit as st
-import pandas as pd
-from openai import OpenAI
 import json
+import time
 from datetime import datetime
-import gspread
-from google.oauth2.service_account import Credentials
 import os
-from PIL import Image
+import logging
+import importlib
+import threading
+import metrics
+from ai_coach import (ModelCascadeStats, TokenUsageLedger, compile_prompts, consume_feedback_stream, escalation_reason, model_route,
+                      parse_feedback)
+from ai_scheduler import AIRequestScheduler, SchedulerTimeout
+from feedback_cache import FeedbackCache, feedback_cache_key
+from gsheet_sync import JsonlJournal, SheetHandleCache, SheetWriter
+from image_ingest import ImageIngestor
+from local_store import LocalStore, StoreSyncJournal
+from memory_footprint import SessionFootprints
+from pre_grader import PreGraderStats, pre_grade
+from question_state import QuestionState, new_question_states
+from rerun_timing import RerunTimings
 
 # --- 1. 기본 설정 및 환경 구성 ---
 st.set_page_config(layout="wide", page_title="수학과 음악 연결 탐구")
-
-# 이미지 업로드 폴더 생성
-if not os.path.exists("image_uploads"):
-    os.makedirs("image_uploads")
+logger = logging.getLogger("trigonometric_music")
 
 # CSS 스타일 적용 함수
 def apply_custom_css():
@@ -26,10 +34,26 @@ def apply_custom_css():
     """, unsafe_allow_html=True)
 
 # --- 외부 서비스 인증 ---
+# pandas, openai, gspread, google.oauth2, PIL은 불러오는 데만 1초 넘게 걸리므로 모듈 맨 위가 아닌
+# 실제로 쓰는 함수 안에서 불러옴. 첫 화면(메인/로그인)은 이 모듈들 없이 그려짐.
+# secrets에 [fake_services]가 있으면 실제 서비스 대신 부하 시험용 대역(fake_services.py)을 씀
+def get_fake_services_config():
+    if "fake_services" not in st.secrets:
+        return None
+    from fake_services import FakeServiceConfig
+    return FakeServiceConfig(dict(st.secrets["fake_services"]))
+
 @st.cache_resource
 def get_openai_client():
+    fake_config = get_fake_services_config()
+    if fake_config is not None:
+        from fake_services import FakeOpenAI
+        return FakeOpenAI(fake_config)
     try:
-        return OpenAI(api_key=st.secrets["openai_api_key"])
+        from openai import OpenAI
+        # 재시도는 AIRequestScheduler가 담당하므로 클라이언트 자체 재시도는 끔.
+        # openai_base_url을 지정하면 로컬 가짜 서버(tools/fake_openai_server.py)로 요청을 보낼 수 있음
+        return OpenAI(api_key=st.secrets["openai_api_key"], base_url=st.secrets.get("openai_base_url"), max_retries=0)
     except KeyError:
         st.error("OpenAI API 키가 secrets에 설정되지 않았습니다.")
         st.stop()
@@ -39,7 +63,13 @@ def get_openai_client():
 
 @st.cache_resource
 def get_gspread_client():
+    fake_config = get_fake_services_config()
+    if fake_config is not None:
+        from fake_services import FakeGspreadClient
+        return FakeGspreadClient(fake_config)
     try:
+        import gspread
+        from google.oauth2.service_account import Credentials
         creds = Credentials.from_service_account_info(
             st.secrets["google_sheets_auth"],
             scopes=['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
@@ -52,214 +82,485 @@ def get_gspread_client():
         st.error(f"Google Sheets 인증에 실패했습니다: {e}")
         st.stop()
 
-client = get_openai_client()
-gc = get_gspread_client()
+# 스프레드시트/워크시트 핸들은 모든 세션이 공유 (매번 gc.open, sh.worksheet를 부르지 않음)
+@st.cache_resource
+def get_sheet_handles():
+    handles = SheetHandleCache(get_gspread_client(), CONFIG["GSHEET_NAME"], ttl=CONFIG["SHEET_HANDLE_TTL"])
+    metrics.register_collector("sheet_handles", handles.stats)
+    return handles
 
-# --- 2. 과제 및 프레임워크 데이터 정의 ---
-# (이전 코드와 동일하므로 생략)
-TASK_INFO = {
-    "TITLE": "나만의 '시그니처 사운드' 만들기",
-    "DESCRIPTION": "요즘 많은 크리에이터들이 영상 중간 부분에 자신만의 독특한 효과음, 즉 '시그니처 사운드'를 사용합니다. 우리도 GeoGebra와 삼각함수 `y = A*sin(Bx+C) + D`를 이용해서 세상에 하나뿐인 나만의 시그니처 사운드를 디자인해 봅시다!",
-    "GOAL": """
-        **<사운드 디자인 목표>**
-        1. 기본음 '도(C4)'보다 **한 옥타브 높은 솔(G5)** 음
-        2. 갑자기 시작하지 않고 **부드럽게** 시작하는 느낌
-        3. 너무 크지 않은 **적당한** 볼륨
-    """
-}
+# 제출 기록의 원본은 로컬 SQLite 저장소. 교사 대시보드도 여기서 바로 읽음
+@st.cache_resource
+def get_local_store():
+    store = LocalStore(CONFIG["LOCAL_DB_PATH"])
+    import_legacy_sheet_journal(store)
+    metrics.register_collector("local_store", store.counts)
+    return store
 
-QUESTIONS = {
-    "1-1": {"step": 1, "title": "Step 1. 소리와 수학 연결하기", "text": "목표 소리의 세 가지 특징을 수학적으로 표현하기 위해 각각 어떤 변수(A, B, C, D)를 사용해야 할지 연결하고 이유를 설명하세요.", "dimension": "다른 표상", "max_score": 1},
-    "1-2": {"step": 1, "title": "Step 1. 소리와 수학 연결하기", "text": "여러분이 디자인한 최종 시그니처 사운드를 나타내는 함수식을 서술하고, 해당 식의 GeoGebra 그래프를 캡처하여 첨부해주세요.", "dimension": "다른 표상", "max_score": 1, "has_image_upload": True},
-    "1-3": {"step": 1, "title": "Step 1. 소리와 수학 연결하기", "text": "완성한 수학식에서 각각의 변수(A, B, C, D)와 그 결과값은 현실 세계의 '소리'에서 구체적으로 무엇을 의미할까요?", "dimension": "다른 표상", "max_score": 1},
-    "2-1": {"step": 2, "title": "Step 2. 나만의 사운드 만들기", "text": "'사운드 디자인 목표'를 달성하기 위해 각각의 변수(A, B, C, D)의 값을 어떻게 정했나요? 값을 정한 이유와 계산 과정을 상세히 서술해주세요.", "dimension": "절차", "max_score": 2},
-    "2-2": {"step": 2, "title": "Step 2. 나만의 사운드 만들기", "text": "만약 사운드 디자인의 목표가 바뀌면 변수(A, B, C, D)들을 어떻게 변형하면 좋을지 구체적으로 서술해주세요. 즉, 수학적 조작이 음악적 결과에 어떤 영향을 미치는지 관계와 그 근거를 구체적으로 서술해주세요.", "dimension": "함의", "max_score": 2},
-    "3-1": {"step": 3, "title": "Step 3. 디자인 분석 및 나의 생각", "text": "여러분이 조절한 여러 변수(A, B, C, D)는 독립적인가요? 혹은 서로 영향을 주나요? 각각의 변수가 어떻게 하나의 '사운드 시스템'으로 작동하는지 설명해보세요.", "dimension": "부분-전체 관계", "max_score": 2},
-    "3-2": {"step": 3, "title": "Step 3. 디자인 분석 및 나의 생각", "text": "이번 '사운드 디자인' 활동을 통해 수학에 대한 여러분의 생각이나 느낌에 어떤 변화가 있었는지, 수학이 우리 생활과 어떻게 연결될 수 있는지 느낀점을 자유롭게 서술해주세요. ", "dimension": "메타인지 성찰", "max_score": 2}
-}
-QUESTION_ORDER = list(QUESTIONS.keys())
-
-SCORING_RUBRIC = {
-    "다른 표상": {
-        "1-1": "현실 → 수학 (1점): 소리의 세 가지 특징(높이, 시작 느낌, 볼륨)을 각각의 수학 변수(B, C, A 등)와 타당하게 연결하여 설명하였는가?",
-        "1-2": "수학적 모델 구축 (1점): 과제 목표(G5 음, 부드러운 시작 등)에 부합하는 타당한 함수식과 그에 맞는 그래프를 올바르게 제시하였는가?",
-        "1-3": "수학 → 현실 (1점): 자신이 설정한 변수(A, B, C, D) 값들이 각각 현실의 소리에서 어떤 구체적인 의미(예: 진폭, 주파수, 위상 이동 등)를 갖는지 정확하게 해석하였는가?"
-    },
-    "절차": {
-        "2-1": """- 절차 선택 (1점): '사운드 디자인 목표(G5, 부드러운 시작, 적당한 볼륨)'를 달성하기 위해 각 변수(A, B, C, D)의 값을 결정하는 합리적인 전략이나 사고 과정을 제시하였는가?
-- 절차 수행 (1점): 특히, B값을 G5의 주파수(약 784Hz)에 근거하여 설정하는 등, 선택한 전략을 구체적이고 논리적으로 수행하여 설명하였는가?"""
-    },
-    "함의": {
-        "2-2": """- 결과 예측 (1점): 바뀐 사운드 목표를 달성하기 위해 각 변수를 어떻게 조작해야 하는지, 그 관계를 타당하게 예측하였는가?
-- 논리적 근거 제시 (1점): 수학적 조작(예: B값 증가)이 음악적 결과(예: 소리 높아짐)로 이어지는 이유를 그래프의 변화와 연결하여 논리적으로 설명하였는가?"""
-    },
-    "부분-전체 관계": {
-        "3-1": """- 요소의 역할 분석 (1점): 각 변수(A, B, C, D)가 소리의 다른 속성(크기, 높낮이 등)을 '독립적으로' 제어하는 역할을 한다는 점을 명확히 설명하였는가?
-- 상호작용 및 전체 구조 설명 (1점): 각 변수들의 독립적인 역할 덕분에, 전체 모델이 어떻게 하나의 정교하고 통합된 '사운드 시스템'으로 작동하는지 종합적으로 설명하였는가?"""
-    },
-    "메타인지 성찰": {
-        "3-2": """- 수학의 가치/유용성 인식 (1점): 이번 활동을 통해 수학이 음악 디자인이나 실생활 문제 해결에 어떻게 창의적/도구적으로 사용될 수 있는지 구체적인 사례를 들어 설명하였는가?
-- 태도/신념의 변화 성찰 (1점): 이번 경험이 수학에 대한 자신의 기존 인식이나 학습 태도에 어떤 긍정적인 변화를 가져왔는지 성찰적으로 서술하였는가?"""
-    }
-}
+def import_legacy_sheet_journal(store):
+    # 이전 버전이 Sheets에 아직 보내지 못하고 저널 파일에 남긴 행은 저장소로 옮겨 이후 복제 대상에 포함시킴
+    journal_path = CONFIG["SHEET_JOURNAL_PATH"]
+    if not os.path.exists(journal_path):
+        return
+    journal = JsonlJournal(journal_path)
+    entries = journal.pending()
+    by_worksheet = {}
+    for _, worksheet, row in entries:
+        by_worksheet.setdefault(worksheet, []).append(row)
+    # 저널에는 워크시트 이름만 있으므로, 앱이 기록한 학생이면 그 이름으로 옮김
+    names = store.names_by_worksheet()
+    for worksheet, rows in by_worksheet.items():
+        store.import_sheet_rows(names.get(worksheet, worksheet), rows, synced=False)
+    journal.ack([entry_id for entry_id, _, _ in entries])
+    # 파일을 연 채로 지우면 Windows에서는 실패하고 다른 곳에서는 핸들이 남으므로 먼저 닫음
+    journal.close()
+    os.remove(journal_path)
+    if entries:
+        logger.info("Sheets 저널의 미전송 행 %d개를 로컬 저장소로 옮겼습니다.", len(entries))
+
+def sheets_mirror_enabled():
+    try:
+        return CONFIG["SHEETS_MIRROR"] and ("google_sheets_auth" in st.secrets or "fake_services" in st.secrets)
+    except FileNotFoundError:
+        # secrets.toml 자체가 없음
+        return False
+
+# Sheets는 교사가 보기 위한 복제본. 저장소에서 아직 복제되지 않은 행을 백그라운드 작성기가 워크시트별로 모아 기록함
+@st.cache_resource
+def get_sheet_writer():
+    if not sheets_mirror_enabled():
+        return None
+    writer = SheetWriter(get_sheet_handles(), StoreSyncJournal(get_local_store())).start()
+    metrics.register_collector("sheet_writer", writer.stats)
+    return writer
 
-MODEL_ANSWERS = {
-    "1-1": "소리의 세 가지 특징은 다음과 같이 수학 변수와 연결됩니다. '소리의 높이'는 그래프의 진동 빈도를 결정하는 변수 B와 관련이 깊습니다. B가 클수록 주파수가 높아져 더 높은 소리가 납니다. '부드러운 시작'은 그래프의 시작점을 좌우로 이동시키는 변수 C(위상 이동)와 관련됩니다. 사인 곡선이 0에서 시작하지 않고 부드럽게 올라가는 지점에서 시작하도록 C 값을 조절할 수 있습니다. 마지막으로 '볼륨(크기)'은 그래프의 위아래 폭, 즉 진폭을 결정하는 변수 A와 직접적으로 관련됩니다.",
-    "1-3": "제가 만든 식 y = 0.7*sin(784x - 1.57)에서 각 변수는 다음과 같은 의미를 가집니다. A=0.7은 소리의 진폭으로, '적당한 볼륨'을 의미합니다. B=784는 주파수로, 목표인 '한 옥타브 높은 솔(G5)' 음을 만들어냅니다. C=-1.57(약 -π/2)은 위상 이동으로, x=0일 때 음수에서 시작하여 부드럽게 소리가 커지는 효과를 줍니다. D=0은 그래프의 중심선을 y=0에 유지시켜 소리가 특정 음높이에 치우치지 않게 합니다.",
-    "2-1": "목표 달성을 위해 각 변수 값을 다음과 같이 정했습니다. 1) '한 옥타브 높은 솔(G5)' 음을 만들기 위해, GeoGebra 도구 2나 관련 자료를 통해 G5의 주파수가 약 784Hz임을 확인했습니다. 그래서 변수 B 값을 784로 설정했습니다. 2) '부드러운 시작'을 위해, x=0에서 y값이 바로 최대가 아닌, 음수에서 시작해 증가하도록 C값을 조절했습니다. sin(C)가 음수가 되도록 C를 -π/2 (-1.57)로 설정하여 사인 그래프가 (0,-1) 근처에서 시작하게 만들었습니다. 3) '적당한 볼륨'을 위해, 진폭 A를 최댓값인 1보다 작은 0.7로 설정하여 너무 크지 않은 소리를 만들었습니다. 4) D는 소리의 전체적인 수직 이동인데, 특별한 목적이 없어 0으로 두었습니다.",
-    "2-2": """
-사운드 디자인의 목표가 바뀌면 그에 맞춰 변수를 유연하게 변형할 수 있습니다. 수학적 조작과 음악적 결과의 관계는 다음과 같습니다.
+# 같은 질문에 같은 답변이 다시 제출되면 AI를 다시 부르지 않고 이전 피드백을 돌려줌
+@st.cache_resource
+def get_feedback_cache():
+    cache = FeedbackCache(
+        CONFIG["FEEDBACK_CACHE_DIR"],
+        max_entries=CONFIG["FEEDBACK_CACHE_MAX_ENTRIES"],
+        max_age=CONFIG["FEEDBACK_CACHE_MAX_AGE"]
+    )
+    metrics.register_collector("feedback_cache", cache.stats)
+    return cache
 
-1.  **'점점 커지거나 작아지는 소리'**: 이는 볼륨의 변화이므로 변수 A(진폭)를 조절해야 합니다. 상수가 아닌 시간에 따라 변하는 함수, 예를 들어 A = 0.1 * t (점점 커짐) 또는 A = 1 - 0.1*t (점점 작아짐) 형태로 바꾸면 시간에 따른 볼륨 변화를 표현할 수 있습니다.
+# 학급 전체의 OpenAI 요청을 한 곳에서 줄 세워 요청/토큰 한도와 동시 실행 수를 지킴
+@st.cache_resource
+def get_ai_scheduler():
+    scheduler = AIRequestScheduler(
+        max_concurrency=CONFIG["AI_MAX_CONCURRENCY"],
+        requests_per_minute=CONFIG["AI_REQUESTS_PER_MINUTE"],
+        tokens_per_minute=CONFIG["AI_TOKENS_PER_MINUTE"],
+        max_retries=CONFIG["AI_MAX_RETRIES"],
+        default_deadline=CONFIG["AI_REQUEST_DEADLINE"]
+    )
+    metrics.register_collector("ai_scheduler", scheduler.stats)
+    return scheduler
 
-2.  **'음이 부드럽게 미끄러지듯 변하는 소리 (글리산도)'**: 이는 음높이의 연속적인 변화이므로 변수 B(주파수)를 조절해야 합니다. 시간에 따라 변하는 함수, 예를 들어 B = 440 + 100*t 와 같이 설정하면 낮은 음에서 높은 음으로 부드럽게 올라가는 소리를 만들 수 있습니다.
+@st.cache_resource
+def get_token_ledger():
+    ledger = TokenUsageLedger()
+    metrics.register_collector("token_ledger", ledger.summary)
+    return ledger
 
-3.  **'소리의 전체적인 음역대(톤)를 바꾸고 싶을 때'**: 이는 그래프의 수직 이동과 관련되므로 변수 D를 조절할 수 있습니다. D값을 양수로 바꾸면 파형 전체가 위로 올라가고, 음수로 바꾸면 아래로 내려가면서 소리의 전반적인 톤에 미묘한 변화를 줄 수 있습니다.
+# 모델 단계별 호출 수/지연/토큰과 재채점 비율 (교사 대시보드와 진단 페이지에 표시)
+@st.cache_resource
+def get_cascade_stats():
+    cascade_stats = ModelCascadeStats()
+    metrics.register_collector("model_cascade", cascade_stats.stats)
+    return cascade_stats
 
-이처럼, 각 변수(A, B, C, D)가 소리의 특정 요소(크기, 높낮이, 시작점, 톤)를 제어한다는 기본 원리를 이해하면, 거의 모든 음악적 아이디어를 수학적으로 모델링하고 구현해볼 수 있습니다.
-""",
-    "3-1": "네, 네 변수 A, B, C, D는 서로 독립적입니다. A(진폭)를 바꾼다고 해서 B(주파수)가 변하지 않으며, C(위상)를 바꿔도 A나 B에 영향을 주지 않습니다. 이 '독립성'이 바로 이 모델을 강력한 '사운드 시스템'으로 만듭니다. 마치 오디오 믹서에서 볼륨, 피치, 밸런스 노브가 각각 따로 작동하는 것과 같습니다. 각 변수가 소리의 한 가지 속성(크기, 높낮이, 시작점, 전체 음역대)만을 정교하게 제어하기 때문에, 우리는 이들을 조합하여 매우 복잡하고 의도적인 사운드를 체계적으로 디자인할 수 있습니다.",
-    "3-2": "이전에는 수학을 단순히 정해진 답을 찾는 계산 과목으로만 생각했습니다. 하지만 이번 사운드 디자인 활동을 통해, y=A*sin(Bx+C)+D 라는 하나의 수식이 음악이라는 예술적 결과물을 만드는 창의적인 '도구'가 될 수 있다는 것을 깨달았습니다. 변수 값을 바꾸며 소리가 실시간으로 변하는 것을 보며, 수학적 원리가 우리 주변의 소리, 빛, 파동 등 세상의 많은 현상을 설명하고 심지어 창조할 수 있는 강력한 언어라는 것을 느꼈습니다. 이제 수학은 딱딱한 학문이 아니라, 세상을 이해하고 표현하는 아름다운 방법 중 하나로 느껴집니다."
-}
+# 질문별 최종 답변 색인 (교사 세션끼리 공유하고, 대시보드를 열 때 새로 들어온 최종 제출만 붙임)
+@st.cache_resource
+def get_answer_index():
+    from answer_clusters import AnswerClusterIndex
+    index = AnswerClusterIndex(n_features=CONFIG["ANSWER_CLUSTER_FEATURES"], threshold=CONFIG["ANSWER_CLUSTER_THRESHOLD"])
+    metrics.register_collector("answer_clusters", index.stats)
+    return index
+
+# 규칙 채점으로 AI 호출 없이 돌려준 비율 (교사 대시보드에 표시)
+@st.cache_resource
+def get_pre_grader_stats():
+    pre_grader_stats = PreGraderStats()
+    metrics.register_collector("pre_grader", pre_grader_stats.stats)
+    return pre_grader_stats
+
+# 전체 페이지 재실행과 fragment 재실행에 걸린 시간 (교사 대시보드 사이드바에 표시)
+@st.cache_resource
+def get_rerun_timings():
+    return RerunTimings()
+
+# 세션별 st.session_state 크기와 프로세스 RSS (교사 대시보드와 주기적인 로그로 확인)
+@st.cache_resource
+def get_session_footprints():
+    footprints = SessionFootprints(idle_timeout=CONFIG["SESSION_IDLE_TIMEOUT"], log_interval=CONFIG["MEMORY_LOG_INTERVAL"])
+    metrics.register_collector("memory", footprints.summary)
+    return footprints
+
+# 학생이 정한 A, B, C, D로 만든 소리는 모든 세션이 공유하는 LRU에 보관 (같은 값이면 다시 계산하지 않음)
+@st.cache_resource
+def get_sound_synth():
+    from sound_synth import SoundSynth
+    synth = SoundSynth(
+        sample_rate=CONFIG["SOUND_SAMPLE_RATE"],
+        max_entries=CONFIG["SOUND_CACHE_ENTRIES"],
+        max_duration=CONFIG["SOUND_MAX_DURATION"]
+    )
+    metrics.register_collector("sound_synth", synth.stats)
+    return synth
+
+# 업로드 이미지의 축소/인코딩/썸네일 생성은 스크립트 스레드가 아닌 공용 스레드 풀에서 처리
+@st.cache_resource
+def get_image_ingestor():
+    ingestor = ImageIngestor(
+        CONFIG["IMAGE_UPLOAD_DIR"],
+        max_side=CONFIG["IMAGE_MAX_SIDE"],
+        thumb_side=CONFIG["IMAGE_THUMB_SIDE"],
+        workers=CONFIG["IMAGE_INGEST_WORKERS"]
+    )
+    metrics.register_collector("image_ingest", ingestor.stats)
+    return ingestor
+
+# 서버 지표를 일정 간격으로 파일(Prometheus 텍스트, JSON)에 써 둠. 수집 도구가 없으면 진단 페이지에서 직접 받을 수 있음
+@st.cache_resource
+def start_metrics_dump():
+    if not CONFIG["METRICS_DUMP_DIR"]:
+        return None
+    def dump_loop():
+        while True:
+            time.sleep(CONFIG["METRICS_DUMP_INTERVAL"])
+            try:
+                metrics.REGISTRY.dump(CONFIG["METRICS_DUMP_DIR"])
+            except OSError as e:
+                logger.warning("지표 파일 기록 실패: %s", e)
+    thread = threading.Thread(target=dump_loop, name="metrics-dump", daemon=True)
+    thread.start()
+    return thread
+
+# 화면이 그려진 뒤 백그라운드에서 무거운 모듈을 미리 불러와, 첫 AI 피드백 요청이 import 시간을 기다리지 않게 함
+@st.cache_resource
+def start_import_warmup():
+    def warm_up():
+        # 첫 화면 직후의 rerun과 CPU를 다투지 않도록 잠시 기다렸다가 시작
+        time.sleep(CONFIG["WARMUP_DELAY"])
+        for module_name in CONFIG["WARMUP_IMPORTS"]:
+            try:
+                importlib.import_module(module_name)
+            except ImportError as e:
+                logger.warning("미리 불러오기 실패 (%s): %s", module_name, e)
+    thread = threading.Thread(target=warm_up, name="import-warmup", daemon=True)
+    thread.start()
+    return thread
 
-PROMPT_TEMPLATE = """
-당신은 학생의 사고 과정을 돕는 유능하고 친절한 AI 학습 코치입니다. 당신의 목표는 학생이 정답을 완성하도록 돕는 것이지, 점수를 매기는 것이 아닙니다. 학생에게는 점수가 보이지 않습니다.
-
-**[핵심 지시사항]**
-1.  **용어 통일**: 학생은 고등학생입니다. '파라미터' 대신 반드시 '변수'라는 단어를 사용하세요.
-2.  **모범 답안 활용**: 아래 제공된 **[모범 답안]**은 최고 점수를 받을 수 있는 답변의 예시입니다. 이를 참고하여 학생 답변의 완성도 수준을 판단하고, 피드백의 방향을 정하세요. **절대 모범 답안의 내용을 학생에게 직접적으로 알려주지 마세요.**
-3.  **내부 채점**: 먼저, 주어진 **[채점 기준]**과 **[모범 답안]**을 바탕으로 학생의 답변을 냉정하게 내부적으로 채점합니다. **평가 요소별 점수**와 **총점**을 모두 계산합니다.
-4.  **피드백 분기 처리**:
-    *   **만약 총점이 만점이 아니라면**: 학생이 스스로 오류를 수정하도록 **'촉진 질문'**을 던져야 합니다. `suggestion` 필드에, 학생의 답변에서 부족한 점을 직접적으로 보완할 수 있는 구체적인 질문을 작성해주세요. (예: '소리의 높낮이는 변수 B와 관련이 있는데, B가 커지면 소리가 높아질까요, 낮아질까요? 그래프의 모양을 생각해보세요.')
-    *   **만약 총점이 만점이라면**: 훌륭합니다! `analysis` 필드에서 칭찬해주고, `suggestion` 필드에는 현재 학습 내용을 넘어서는 '심화 질문'이나 '확장 질문'을 제시하여 더 깊은 생각을 유도해주세요. (예: '아주 정확해요! 그렇다면 이 사인 함수 모델로 표현하기 어려운 소리에는 어떤 것들이 있을지 상상해볼까요?')
-
-**[평가 차원]: {dimension}**
-**[현재 질문]:** "{question_text}"
-**[채점 기준]:**
-{scoring_criteria}
-
-**[모범 답안]:** 
-{model_answer}
-
-**[학생 답변]:** "{student_answer}"
-
-**[출력 형식]**
-아래 JSON 형식에 맞춰 **반드시 JSON 객체로만** 출력하세요. 학생에게 점수는 절대 보여주지 않지만, 교사용 기록을 위해 모든 정보를 포함해야 합니다.
-**[채점 기준]**에 '-' 기호로 구분된 여러 평가 요소가 있다면, 각 요소를 개별적으로 채점하고 `scores` 객체에 모두 포함시켜야 합니다.
-
-{{
-  "scores": {{
-    "평가요소1 이름": "(0점 또는 1점 등, 요소별 배점)",
-    "평가요소2 이름": "(요소별 배점)"
-  }},
-  "total_score": "(내부적으로 계산한 총점)",
-  "analysis": "(학생 답변의 잘한 점을 긍정적으로 서술. 점수 언급 절대 금지.)",
-  "suggestion": "(위의 [핵심 지시사항] 4번 규칙에 따라 '촉진 질문' 또는 '심화 질문'을 작성.)"
-}}
-"""
+# --- 2. 과제 및 프레임워크 데이터 정의 ---
+from task_content import (
+    TASK_INFO, QUESTIONS, QUESTION_ORDER, SCORING_RUBRIC, MODEL_ANSWERS,
+    PROMPT_TEMPLATE, STUDENT_ANSWER_TEMPLATE
+)
 
 # --- 3. 세션 상태 및 헬퍼 함수 ---
-CONFIG = {
-    "TEACHER_PASSWORD": "2025",
-    "AI_MODEL": "gpt-4-turbo",
-    "MIN_ANSWER_LENGTH": 10,
-    "GSHEET_NAME": "trigonometric music"
-}
+from app_config import CONFIG
 
 def initialize_session():
     st.session_state.page = 'main'
     st.session_state.student_name = ""
     st.session_state.teacher_logged_in = False
     st.session_state.current_q_idx = 0
-    st.session_state.answers = {key: "" for key in QUESTION_ORDER}
-    st.session_state.feedbacks = {key: {} for key in QUESTION_ORDER}
-    st.session_state.attempts = {key: 0 for key in QUESTION_ORDER}
-    st.session_state.is_finalized = {key: False for key in QUESTION_ORDER}
-    st.session_state.uploaded_images = {key: None for key in QUESTION_ORDER}
-    st.session_state.image_paths = {key: "" for key in QUESTION_ORDER}
+    # 질문별 답변/피드백/이미지 상태 (question_state.QuestionState)
+    st.session_state.questions = new_question_states(QUESTION_ORDER)
     st.session_state.feedback_submitted = False ## 변경/추가된 부분 ##
+    st.session_state.resume_token = ""
 
-def reset_for_new_student(name):
+def release_uploaded_file(uploaded_file):
+    # 업로드 원본은 Streamlit의 업로드 저장소(메모리)에 세션이 끝날 때까지 남으므로, 처리를 넘긴 뒤 바로 지움
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    if ctx is None or not Runtime.exists():
+        return
+    try:
+        Runtime.instance().uploaded_file_mgr.remove_file(ctx.session_id, uploaded_file.file_id)
+    except Exception as e:
+        logger.warning("업로드 원본 삭제 실패: %s", e)
+
+def record_session_footprint():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    label = st.session_state.get("student_name") or st.session_state.get("page", "")
+    get_session_footprints().update(ctx.session_id, label, st.session_state.to_dict())
+
+def reset_for_new_student(name, token=None):
     initialize_session()
     st.session_state.student_name = name
     st.session_state.page = 'student_learning'
+    # 다른 서버 인스턴스로 다시 연결되면 새 세션이 되므로, 주소에 이름 대신 세션의 이어하기 코드를 남겨 두었다가 진행 상황을 되살림
+    if token is None:
+        try:
+            token = get_local_store().create_session(name)
+        except Exception as e:
+            logger.warning("이어하기 코드 발급 실패 (%s): %s", name, e)
+            return
+    st.session_state.resume_token = token
+    st.query_params["resume"] = token
 
-def save_to_gsheet(gspread_client, student_name, question_id, attempt, is_final, question_text, answer, image_path, feedback):
+def leave_student_session():
+    initialize_session()
+    st.query_params.pop("resume", None)
+
+# --- 세션 체크포인트: 학생 진행 상황을 저장소에 남겨 서버 재시작/재배포/다른 인스턴스 연결 후에도 이어서 함 ---
+CHECKPOINT_PAGES = ('student_learning', 'completion')
+
+def checkpoint_parts():
+    parts = {"session": {
+        "page": st.session_state.page,
+        "current_q_idx": st.session_state.current_q_idx,
+        "feedback_submitted": st.session_state.feedback_submitted,
+    }}
+    for q_key, state in st.session_state.questions.items():
+        parts[q_key] = state.checkpoint()
+    return parts
+
+def checkpoint_digests(parts):
+    return {part: hash(json.dumps(state, ensure_ascii=False, sort_keys=True)) for part, state in parts.items()}
+
+def checkpoint_session():
+    # 매 실행 끝에 불러, 마지막으로 저장한 뒤 바뀐 부분(현재 질문, 질문별 상태)만 기록함
+    token = st.session_state.get('resume_token')
+    if not token or st.session_state.get('page') not in CHECKPOINT_PAGES:
+        return
+    parts = checkpoint_parts()
+    digests = checkpoint_digests(parts)
+    saved = st.session_state.get('checkpoint_digests', {})
+    changed = {part: state for part, state in parts.items() if saved.get(part) != digests[part]}
+    if not changed:
+        return
     try:
-        sh = gspread_client.open(CONFIG["GSHEET_NAME"])
-        safe_name = "".join(c for c in student_name if c.isalnum() or c in " _-")
-        try:
-            worksheet = sh.worksheet(safe_name)
-        except gspread.WorksheetNotFound:
-            worksheet = sh.add_worksheet(title=safe_name, rows="1000", cols="10")
-            worksheet.append_row([
-                "Timestamp", "Question ID", "Attempt", "Is Final", "Question Text",
-                "Student Answer", "Image Path", "Scores", "Total Score", "Feedback"
-            ], value_input_option='USER_ENTERED')
-        
-        scores_str = json.dumps(feedback.get("scores", {}), ensure_ascii=False)
-        feedback_str = f"Analysis: {feedback.get('analysis', '')}\nSuggestion: {feedback.get('suggestion', '')}"
-        
-        worksheet.append_row([
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            question_id, attempt, is_final, question_text, answer, image_path,
-            scores_str, feedback.get("total_score", 0), feedback_str
-        ], value_input_option='USER_ENTERED')
+        with metrics.span("store.save_checkpoint"):
+            get_local_store().save_checkpoint(token, changed)
+    except Exception as e:
+        logger.warning("세션 체크포인트 저장 실패 (%s): %s", st.session_state.student_name, e)
+        return
+    st.session_state.checkpoint_digests = digests
+
+def restore_session(token):
+    # 저장된 진행 상황이 있으면 세션을 그 상태로 되돌리고 True를 돌려줌
+    try:
+        with metrics.span("store.load_checkpoint"):
+            parts = get_local_store().load_checkpoint(token)
+    except Exception as e:
+        logger.warning("세션 체크포인트 읽기 실패 (%s): %s", st.session_state.student_name, e)
+        return False
+    if not parts:
+        return False
+    session = parts.pop("session", {})
+    for q_key, data in parts.items():
+        if q_key in st.session_state.questions:
+            st.session_state.questions[q_key] = QuestionState.from_checkpoint(data)
+    st.session_state.current_q_idx = min(max(int(session.get("current_q_idx", 0)), 0), len(QUESTION_ORDER) - 1)
+    st.session_state.feedback_submitted = bool(session.get("feedback_submitted", False))
+    if session.get("page") in CHECKPOINT_PAGES:
+        st.session_state.page = session["page"]
+    st.session_state.checkpoint_digests = checkpoint_digests(checkpoint_parts())
+    return True
+
+def discard_session_checkpoint(token):
+    if not token:
+        return
+    try:
+        get_local_store().delete_checkpoint(token)
+    except Exception as e:
+        logger.warning("세션 체크포인트 삭제 실패: %s", e)
+
+def has_session_checkpoint(name):
+    try:
+        return get_local_store().has_checkpoint(name)
+    except Exception as e:
+        logger.warning("세션 체크포인트 확인 실패 (%s): %s", name, e)
+        return False
+
+def student_for_resume_token(token):
+    try:
+        return get_local_store().student_for_resume_token(token)
+    except Exception as e:
+        logger.warning("이어하기 코드 확인 실패: %s", e)
+        return None
+
+# 저장된 행 번호를 돌려줌 (실패하면 None)
+def save_submission(store, sheet_writer, student_name, question_id, attempt, is_final, question_text, answer, image_path, feedback):
+    try:
+        with metrics.span("store.add_submission"):
+            submission_id = store.add_submission(student_name, question_id, attempt, is_final, question_text, answer, image_path, feedback)
     except Exception as e:
-        st.warning(f"데이터를 Google Sheets에 저장하는 중 오류가 발생했습니다: {e}")
+        st.warning(f"데이터를 저장하는 중 오류가 발생했습니다: {e}")
+        return None
+    if sheet_writer is not None:
+        sheet_writer.notify()
+    return submission_id
 
 ## 변경/추가된 부분: 최종 피드백 저장 함수 ##
-def save_final_feedback_to_gsheet(gspread_client, student_name, rating, good_points, bad_points):
+def save_final_feedback(store, sheet_writer, student_name, rating, good_points, bad_points):
     try:
-        sh = gspread_client.open(CONFIG["GSHEET_NAME"])
-        safe_name = "".join(c for c in student_name if c.isalnum() or c in " _-")
-        worksheet = sh.worksheet(safe_name)
-
-        feedback_answer = f"별점: {rating}\n\n좋았던 점:\n{good_points}\n\n아쉬웠던 점:\n{bad_points}"
-
-        worksheet.append_row([
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "Final_Feedback",  # Question ID
-            1,                 # Attempt
-            True,              # Is Final
-            "수업 만족도 및 피드백", # Question Text
-            feedback_answer,   # Student Answer
-            "", "", "", ""     # Image, Scores, Total Score, Feedback (empty)
-        ], value_input_option='USER_ENTERED')
+        with metrics.span("store.add_final_feedback"):
+            store.add_final_feedback(student_name, rating, good_points, bad_points)
     except Exception as e:
-        st.warning(f"최종 피드백을 Google Sheets에 저장하는 중 오류가 발생했습니다: {e}")
+        st.warning(f"최종 피드백을 저장하는 중 오류가 발생했습니다: {e}")
+        return
+    if sheet_writer is not None:
+        sheet_writer.notify()
+
+
+# 질문별 프롬프트 앞부분은 서버 시작 시 한 번만 만들어 둠 (내용이 바뀌면 인자 해시가 달라져 다시 만듦)
+@st.cache_resource
+def get_compiled_prompts(questions, scoring_rubric, model_answers, prompt_template, answer_template):
+    return compile_prompts(questions, scoring_rubric, model_answers, prompt_template, answer_template)
 
+def get_ai_feedback(client, q_key, student_answer, cache=None, on_delta=None, scheduler=None, on_wait=None):
+    # 어떻게 끝났는지(outcome)를 라벨로 붙여, 규칙 채점/캐시/AI 호출/오류별 응답 시간을 나눠 봄
+    with metrics.span("ai_feedback", q_key=q_key) as span:
+        content, outcome = request_ai_feedback(client, q_key, student_answer, cache, on_delta, scheduler, on_wait)
+        span.set(outcome=outcome)
+        if outcome == "error":
+            span.fail(json.loads(content).get("kind", "error"))
+        return content
 
-def get_ai_feedback(client, q_key, student_answer):
+def feedback_error(message, kind):
+    return json.dumps({"error": message, "kind": kind}, ensure_ascii=False), "error"
+
+def ai_call_error(q_key, e):
+    if isinstance(e, SchedulerTimeout):
+        return feedback_error("지금 많은 친구들이 동시에 제출하고 있어서 AI 코치가 바빠요. 잠시 후 다시 제출해주세요.", "scheduler_timeout")
+    logger.warning("AI 피드백 요청 실패 (q_key=%s): %s", q_key, e)
+    return feedback_error(f"AI 서버에 문제가 발생했어요. 잠시 후 다시 시도해주세요: {e}", type(e).__name__)
+
+def request_ai_feedback(client, q_key, student_answer, cache, on_delta, scheduler, on_wait):
     if len(student_answer.strip()) < CONFIG['MIN_ANSWER_LENGTH']:
-        return json.dumps({ "error": f"답변이 너무 짧아요. 자신의 생각을 조금 더 자세히 ({CONFIG['MIN_ANSWER_LENGTH']}자 이상) 설명해주세요!" })
-    
-    q_info = QUESTIONS[q_key]
-    dimension = q_info["dimension"]
+        return json.dumps({ "error": f"답변이 너무 짧아요. 자신의 생각을 조금 더 자세히 ({CONFIG['MIN_ANSWER_LENGTH']}자 이상) 설명해주세요!" }), "too_short"
     
-    criteria_key = next((key for key in SCORING_RUBRIC.get(dimension, {}) if q_key.startswith(key)), q_key)
-    criteria_text = SCORING_RUBRIC.get(dimension, {}).get(criteria_key, "채점 기준을 찾을 수 없습니다.")
+    compiled = get_compiled_prompts(QUESTIONS, SCORING_RUBRIC, MODEL_ANSWERS, PROMPT_TEMPLATE, STUDENT_ANSWER_TEMPLATE)[q_key]
+
+    # 판단이 필요 없는 답변은 규칙으로 바로 촉진 질문을 돌려주고 AI를 부르지 않음
+    if CONFIG['PRE_GRADER']:
+        pre_graded = pre_grade(q_key, student_answer, QUESTIONS[q_key], compiled.criteria)
+        get_pre_grader_stats().record(q_key, pre_graded)
+        if pre_graded is not None:
+            logger.info("ai_feedback_pre_graded q_key=%s rule=%s", q_key, pre_graded["graded_by"])
+            return json.dumps(pre_graded, ensure_ascii=False), "pre_graded"
     
-    model_answer_text = MODEL_ANSWERS.get(q_key, "해당 질문에 대한 모범 답안이 제공되지 않았습니다.")
+    primary_model, escalation_model = model_route(CONFIG['AI_MODEL_ROUTES'], q_key, CONFIG['AI_MODEL'])
+    cache_key = None
+    if cache is not None:
+        # 모델 구성이 바뀌면 예전 피드백을 다시 쓰지 않도록 두 모델 이름을 모두 키에 넣음
+        route_name = f"{primary_model}>{escalation_model}" if escalation_model else primary_model
+        cache_key = feedback_cache_key(q_key, student_answer, route_name, CONFIG['AI_TEMPERATURE'], compiled.fingerprint)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached, "cache_hit"
     
-    prompt = PROMPT_TEMPLATE.format(
-        dimension=dimension,
-        question_text=q_info['text'],
-        scoring_criteria=criteria_text,
-        model_answer=model_answer_text,
-        student_answer=student_answer
-    )
+    messages = compiled.messages(student_answer)
+    ledger = get_token_ledger()
+    cascade_stats = get_cascade_stats()
     
+    def request_feedback(ticket, model, tier):
+        timeout = ticket.remaining() if ticket is not None else None
+        started = time.perf_counter()
+        # 재시도마다 따로 기록되므로 OpenAI 자체의 지연/오류율을 스케줄러 대기와 나눠 볼 수 있음
+        with metrics.span("openai.chat", model=model, tier=tier):
+            if on_delta is not None and CONFIG['AI_STREAMING']:
+                # 스트리밍 모드: analysis/suggestion이 도착하는 대로 on_delta로 화면에 보여줌
+                # (다시 채점하면 큰 모델의 응답이 처음부터 다시 표시됨)
+                stream = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=CONFIG['AI_TEMPERATURE'],
+                    response_format={"type": "json_object"},
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    timeout=timeout
+                )
+                content, time_to_first_token, usage = consume_feedback_stream(stream, on_delta, started=started)
+                if time_to_first_token is not None:
+                    metrics.observe("openai.first_token", time_to_first_token, model=model, tier=tier)
+                    logger.info("ai_feedback_time_to_first_token_ms=%.0f q_key=%s model=%s", time_to_first_token * 1000, q_key, model)
+            else:
+                response = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=CONFIG['AI_TEMPERATURE'],
+                    response_format={"type": "json_object"},
+                    timeout=timeout
+                )
+                content, usage = response.choices[0].message.content, response.usage
+        latency = time.perf_counter() - started
+        cascade_stats.record_call(tier, model, usage, latency)
+        if usage is not None:
+            if ticket is not None:
+                ticket.record_usage(usage.total_tokens)
+            ledger.record(q_key, usage, latency)
+            cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None) or 0
+            metrics.increment("openai_tokens_total", usage.prompt_tokens or 0, kind="prompt", tier=tier)
+            metrics.increment("openai_tokens_total", cached_tokens, kind="cached_prompt", tier=tier)
+            metrics.increment("openai_tokens_total", usage.completion_tokens or 0, kind="completion", tier=tier)
+            logger.info("ai_feedback_usage q_key=%s model=%s tier=%s prompt_tokens=%d cached_prompt_tokens=%d completion_tokens=%d latency_ms=%.0f",
+                        q_key, model, tier, usage.prompt_tokens, cached_tokens, usage.completion_tokens, latency * 1000)
+        return content
+
+    def call_model(model, tier):
+        if scheduler is not None:
+            estimated_tokens = len(compiled.system_prompt) + len(student_answer) + CONFIG['AI_COMPLETION_TOKEN_ESTIMATE']
+            return scheduler.call(lambda ticket: request_feedback(ticket, model, tier), estimated_tokens, on_wait=on_wait)
+        return request_feedback(None, model, tier)
+
     try:
-        response = client.chat.completions.create(
-            model=CONFIG['AI_MODEL'],
-            messages=[{"role": "system", "content": prompt}],
-            temperature=0.3,
-            response_format={"type": "json_object"}
-        )
-        return response.choices[0].message.content
+        content = call_model(primary_model, "primary")
     except Exception as e:
-        return json.dumps({"error": f"AI 서버에 문제가 발생했어요. 잠시 후 다시 시도해주세요: {e}"})
+        return ai_call_error(q_key, e)
+    model, outcome = primary_model, "ai"
+
+    # 빠른 모델의 응답이 형식에 맞지 않거나, 점수가 서로 맞지 않거나, 경계에 있으면 큰 모델로 한 번 더 채점
+    feedback, validation_error = parse_feedback(content, compiled.max_score)
+    reason = None
+    fallback = False
+    if escalation_model:
+        reason = escalation_reason(feedback, validation_error, compiled.max_score,
+                                   CONFIG['AI_MIN_CONFIDENCE'], CONFIG['AI_ESCALATE_PARTIAL_SCORE'])
+    if reason is not None:
+        logger.info("ai_feedback_escalated q_key=%s reason=%s from=%s to=%s", q_key, reason, primary_model, escalation_model)
+        metrics.increment("ai_escalations_total", q_key=q_key, reason=reason)
+        try:
+            escalated = call_model(escalation_model, "escalation")
+        except Exception as e:
+            # 다시 채점하지 못해도 빠른 모델의 응답이 형식에 맞으면 그대로 씀
+            if validation_error:
+                return ai_call_error(q_key, e)
+            logger.warning("AI 피드백 재채점 실패, 빠른 모델 결과 사용 (q_key=%s): %s", q_key, e)
+            fallback = True
+        else:
+            escalated_feedback, escalated_error = parse_feedback(escalated, compiled.max_score)
+            if escalated_error and not validation_error:
+                logger.warning("AI 피드백 재채점 형식 오류, 빠른 모델 결과 사용 (q_key=%s): %s", q_key, escalated_error)
+                fallback = True
+            else:
+                content, feedback, validation_error = escalated, escalated_feedback, escalated_error
+                model, outcome = escalation_model, "ai_escalated"
+    cascade_stats.record_result(q_key, reason, fallback)
+
+    # 점수는 응답 전체가 도착해 형식 검증을 통과한 뒤에만 기록됨
+    if validation_error:
+        logger.warning("AI 피드백 형식 오류 (q_key=%s): %s", q_key, validation_error)
+        return feedback_error(f"AI 코치의 응답 형식이 올바르지 않아요. 다시 제출해주세요. ({validation_error})", "invalid_format")
+
+    # 규칙 채점(rule:…)처럼 어느 모델이 채점했는지 남겨, 교사가 내보낸 기록에서 단계별로 비교할 수 있게 함
+    feedback["graded_by"] = f"ai:{model}"
+    content = json.dumps(feedback, ensure_ascii=False)
+    if cache_key is not None:
+        try:
+            cache.put(cache_key, content)
+        except OSError:
+            pass
+    return content, outcome
 
 # --- 4. UI 페이지 렌더링 함수들 ---
 def main_page():
@@ -283,31 +584,53 @@ def student_login_page():
     name = st.text_input("이름을 입력하세요:", key="student_name_input", value=st.session_state.get('student_name', ''))
     if st.button("탐구 시작하기", type="primary"):
         if name:
-            if st.session_state.get('student_name') != name:
-                reset_for_new_student(name)
-            else:
+            if st.session_state.get('student_name') == name:
                 st.session_state.page = 'student_learning'
-            st.rerun()
+                st.rerun()
+            # 이미 진행 상황이 저장된 이름이면 다른 학생의 기록일 수 있으므로, 이어하기 코드를 확인한 뒤에만 되살림
+            elif has_session_checkpoint(name):
+                st.session_state.pending_resume_name = name
+            else:
+                reset_for_new_student(name)
+                st.rerun()
         else:
             st.warning("이름을 입력해야 탐구를 시작할 수 있어요.")
+    # 이어서 하든 기록을 지우고 새로 시작하든 그 세션의 이어하기 코드가 있어야 함.
+    # 코드가 없으면 이 이름으로는 새로 시작할 수 없고, 선생님이 대시보드에서 코드를 알려주거나 기록을 지워야 함
+    pending_name = st.session_state.get('pending_resume_name')
+    if pending_name and pending_name == name:
+        st.info(f"'{pending_name}' 이름으로 저장된 탐구 기록이 있어요. 탐구 화면 왼쪽에 있던 이어하기 코드를 입력하세요. "
+                "코드를 모르면 선생님께 말씀드리거나, 다른 이름(예: 같은 이름의 친구가 있다면 '홍길동2')으로 시작하세요.")
+        with st.form("resume_form"):
+            code = st.text_input("이어하기 코드 (8자리)", max_chars=8)
+            code_cols = st.columns(2)
+            resume_clicked = code_cols[0].form_submit_button("이어서 하기", type="primary")
+            restart_clicked = code_cols[1].form_submit_button("이 기록을 지우고 처음부터 시작하기")
+        if resume_clicked or restart_clicked:
+            token = code.strip().upper()
+            if student_for_resume_token(token) != pending_name:
+                st.error("이어하기 코드가 맞지 않아요.")
+            else:
+                st.session_state.pop('pending_resume_name', None)
+                if restart_clicked:
+                    discard_session_checkpoint(token)
+                    reset_for_new_student(pending_name)
+                else:
+                    reset_for_new_student(pending_name, token)
+                    st.session_state.resumed = restore_session(token)
+                st.rerun()
     if st.button("처음으로"):
         st.session_state.page = 'main'
         st.rerun()
 
-def student_learning_page():
-    apply_custom_css()
-    q_key = QUESTION_ORDER[st.session_state.current_q_idx]
-    q_info = QUESTIONS[q_key]
-    is_finalized = st.session_state.is_finalized.get(q_key, False)
-
-    st.title(f"🎵 {TASK_INFO['TITLE']}")
-    with st.expander("과제 설명 및 목표 보기", expanded=(st.session_state.current_q_idx == 0)):
-        st.markdown(TASK_INFO['DESCRIPTION'])
-        st.info(TASK_INFO['GOAL'])
-
-    with st.sidebar:
+# 사이드바 진행 상황: 이 영역의 버튼은 사이드바만 다시 실행하고, 질문이 바뀔 때만 전체 페이지를 다시 그림
+@st.fragment
+def progress_sidebar(q_key):
+    with get_rerun_timings().measure("사이드바"):
+        q_info = QUESTIONS[q_key]
+        is_finalized = st.session_state.questions[q_key].finalized
         st.title(f"🧭 {st.session_state.student_name}님의 탐구 지도")
-        completed_count = sum(1 for v in st.session_state.is_finalized.values() if v)
+        completed_count = sum(1 for state in st.session_state.questions.values() if state.finalized)
         st.progress(completed_count / len(QUESTION_ORDER))
         st.markdown(f"**현재 단계: {q_info['step']}. {q_info['title']}**")
         nav_cols = st.columns(2)
@@ -320,69 +643,129 @@ def student_learning_page():
                 if nav_cols[1].button("다음 질문 ➡️", use_container_width=True, type="primary"):
                     st.session_state.current_q_idx += 1
                     st.rerun()
+        if st.session_state.get('resume_token'):
+            st.caption(f"이어하기 코드: **{st.session_state.resume_token}**  \n다른 기기나 창에서 같은 이름으로 이어 할 때 필요해요.")
         st.markdown("---")
         if st.button("탐구 처음부터 다시하기", use_container_width=True, type="secondary"):
-            initialize_session()
+            discard_session_checkpoint(st.session_state.get('resume_token'))
+            leave_student_session()
             st.success("모든 탐구 내용이 초기화되었습니다. 메인 페이지로 돌아갑니다.")
             st.rerun()
-    
-    col1, col2 = st.columns([1.5, 1], gap="large")
 
-    with col1:
-        st.markdown("#### ⚙️ GeoGebra 탐구 도구")
-        st.markdown("##### 도구 1: 삼각함수와 소리 파형 (`y = A*sin(B*x + C) + D`)")
-        st.components.v1.iframe("https://www.geogebra.org/classic/czuabdum", height=400, scrolling=True)
-        st.markdown("##### 도구 2: 음계와 주파수 관계")
-        st.components.v1.iframe("https://www.geogebra.org/classic/tasdredp", height=400, scrolling=True)
+# GeoGebra 도구는 전체 페이지를 다시 그릴 때(질문이 바뀔 때)만 보냄. 답변 입력/제출은 아래 fragment 안에서만 다시 실행됨
+def geogebra_tools():
+    st.markdown("#### ⚙️ GeoGebra 탐구 도구")
+    st.markdown("##### 도구 1: 삼각함수와 소리 파형 (`y = A*sin(B*x + C) + D`)")
+    st.components.v1.iframe("https://www.geogebra.org/classic/czuabdum", height=400, scrolling=True)
+    st.markdown("##### 도구 2: 음계와 주파수 관계")
+    st.components.v1.iframe("https://www.geogebra.org/classic/tasdredp", height=400, scrolling=True)
+    get_rerun_timings().add_iframes(2)
 
-    with col2:
+# 학생이 정한 함수를 실제 소리로 들려줌. 값을 바꿔 '소리 만들기'를 눌러도 이 영역만 다시 실행됨
+@st.fragment
+def sound_preview():
+    with get_rerun_timings().measure("소리 들어보기"):
+        st.markdown("##### 도구 3: 내 함수로 소리 들어보기 (`y = A*sin(B*t + C) + D`)")
+        st.caption("A, B, C, D에는 숫자나 t(초)에 대한 식을 쓸 수 있어요. 예: A = 1 - 0.1*t (점점 작아짐), B = 440 + 100*t (글리산도)")
+        with st.form("sound_form", border=False):
+            value_cols = st.columns(4)
+            a = value_cols[0].text_input("A (진폭)", value="0.7", key="sound_a")
+            b = value_cols[1].text_input("B (주파수)", value="784", key="sound_b")
+            c = value_cols[2].text_input("C (위상)", value="-pi/2", key="sound_c")
+            d = value_cols[3].text_input("D (수직 이동)", value="0", key="sound_d")
+            option_cols = st.columns([2, 1])
+            b_unit = option_cols[0].radio("B의 단위", ["주파수 (Hz)", "각진동수 (rad/s, 주파수×2π)"], horizontal=True, key="sound_b_unit")
+            duration = option_cols[1].number_input("길이(초)", min_value=0.5, max_value=CONFIG["SOUND_MAX_DURATION"], value=2.0, step=0.5, key="sound_duration")
+            if st.form_submit_button("🔊 소리 만들기", use_container_width=True):
+                st.session_state.sound_requested = True
+
+        # 한 번 만든 뒤에는 다시 그릴 때도 같은 소리를 보여줌 (공유 캐시에서 바로 꺼내 옴)
+        if st.session_state.get("sound_requested"):
+            from sound_synth import SoundExpressionError
+            try:
+                wav, (low, high) = get_sound_synth().render(a, b, c, d, duration, b_in_hz=b_unit.startswith("주파수"))
+            except SoundExpressionError as e:
+                st.warning(f"소리를 만들 수 없어요: {e}")
+                return
+            st.audio(wav, format="audio/wav")
+            if round(low) == round(high):
+                st.caption(f"실제 주파수: {low:,.0f}Hz")
+            else:
+                st.caption(f"실제 주파수: {low:,.0f}Hz ~ {high:,.0f}Hz")
+
+# 답변/피드백 영역: 입력, 제출, 피드백 표시는 이 영역만 다시 실행함
+@st.fragment
+def question_panel(q_key):
+    with get_rerun_timings().measure("답변 영역"):
+        q_info = QUESTIONS[q_key]
+        state = st.session_state.questions[q_key]
+        is_finalized = state.finalized
         st.markdown(f"#### 📝 **탐구 질문 {q_key}**")
         st.warning(q_info["text"])
         
-        answer = st.text_area("나의 생각을 여기에 작성해보세요:", value=st.session_state.answers.get(q_key, ""), height=150, key=f"ans_{q_key}", disabled=is_finalized, placeholder="여기에 답변을 입력하세요...")
-        st.session_state.answers[q_key] = answer
+        answer = st.text_area("나의 생각을 여기에 작성해보세요:", value=state.answer, height=150, key=f"ans_{q_key}", disabled=is_finalized, placeholder="여기에 답변을 입력하세요...")
+        state.answer = answer
 
         if q_info.get("has_image_upload", False):
-            uploaded_image = st.file_uploader("그래프 이미지를 업로드하세요.", type=["png", "jpg", "jpeg"], key=f"img_{q_key}", disabled=is_finalized)
-            if uploaded_image is not None:
-                st.session_state.uploaded_images[q_key] = uploaded_image
+            uploaded_image = st.file_uploader("그래프 이미지를 업로드하세요.", type=["png", "jpg", "jpeg"], key=f"img_{q_key}_{state.upload_round}", disabled=is_finalized)
+            # 새 파일이 올라오면 바로 백그라운드 처리를 시작하고, 세션에는 저장될 경로만 남김 (업로드 원본은 보관하지 않음)
+            if uploaded_image is not None and uploaded_image.file_id != state.image_upload_id:
+                state.image_path = get_image_ingestor().submit(uploaded_image.getvalue())
+                state.image_upload_id = uploaded_image.file_id
+                release_uploaded_file(uploaded_image)
+                state.upload_round += 1
+            elif uploaded_image is None and state.image_path:
+                st.caption("✅ 그래프 이미지를 올렸어요. 다른 이미지로 바꾸려면 새로 올려주세요.")
 
         if not is_finalized:
             if st.button("🚀 답변 제출하고 피드백 받기", use_container_width=True):
-                image_path = ""
-                if st.session_state.uploaded_images.get(q_key):
-                    img_file = st.session_state.uploaded_images[q_key]
-                    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-                    safe_student_name = "".join(c for c in st.session_state.student_name if c.isalnum())
-                    image_path = os.path.join("image_uploads", f"{safe_student_name}_{q_key}_{timestamp}.png")
-                    st.session_state.image_paths[q_key] = image_path
-                    
-                    with Image.open(img_file) as img:
-                        img.save(image_path, "PNG")
+                image_path = state.image_path
+                # 이미지 처리는 AI 호출과 함께 진행되고, 이미 끝나 실패한 경우에만 학생에게 알림
+                if image_path and get_image_ingestor().error(image_path, timeout=0):
+                    st.warning("업로드한 이미지를 읽을 수 없어 이미지 없이 제출합니다. 다른 파일로 다시 올려주세요.")
+                    state.image_path = image_path = ""
+
+                queue_box = st.empty()
+                stream_box = st.empty()
+
+                def show_queue_position(position):
+                    if position:
+                        queue_box.info(f"⏳ 지금 많은 친구들이 제출하고 있어요. 대기 순서: {position}번째")
+                    else:
+                        queue_box.empty()
+
+                def show_partial_feedback(fields):
+                    with stream_box.container(border=True):
+                        st.markdown("#### 💡 AI 학습 코치의 피드백")
+                        st.info(f"**생각해볼 점:** {fields['analysis']}")
+                        if fields['suggestion']:
+                            st.warning(f"**도움 질문:** {fields['suggestion']}")
 
                 with st.spinner("AI 코치가 답변을 분석하고 있어요..."):
-                    feedback_str = get_ai_feedback(client, q_key, answer)
+                    feedback_str = get_ai_feedback(get_openai_client(), q_key, answer, cache=get_feedback_cache(), on_delta=show_partial_feedback,
+                                                   scheduler=get_ai_scheduler(), on_wait=show_queue_position)
                 
                 feedback_json = json.loads(feedback_str)
-                st.session_state.feedbacks[q_key] = feedback_json
+                submission_id = None
                 if 'error' not in feedback_json:
-                    st.session_state.attempts[q_key] += 1
-                    save_to_gsheet(gc, st.session_state.student_name, q_key, st.session_state.attempts[q_key], False, q_info['text'], answer, image_path, feedback_json)
-                st.rerun()
+                    state.attempts += 1
+                    submission_id = save_submission(get_local_store(), get_sheet_writer(), st.session_state.student_name, q_key, state.attempts, False, q_info['text'], answer, image_path, feedback_json)
+                # 저장된 피드백은 세션에 전체를 남기지 않고 화면에 필요한 부분과 행 번호만 둠
+                state.set_feedback(feedback_json, submission_id)
+                # 다시 실행하지 않고 스트리밍 미리보기만 지운 뒤 아래에서 완성된 피드백을 이어서 그림
+                stream_box.empty()
 
-        if q_key in st.session_state.feedbacks and st.session_state.feedbacks[q_key]:
-            feedback = st.session_state.feedbacks[q_key]
-            
-            if "error" in feedback:
-                st.error(feedback["error"])
+        if state.has_feedback:
+            if state.error is not None:
+                st.error(state.error)
             else:
                 with st.container(border=True):
                     st.markdown("#### 💡 AI 학습 코치의 피드백")
-                    st.info(f"**생각해볼 점:** {feedback.get('analysis', '')}")
-                    st.warning(f"**도움 질문:** {feedback.get('suggestion', '')}")
+                    st.info(f"**생각해볼 점:** {state.analysis}")
+                    st.warning(f"**도움 질문:** {state.suggestion}")
                 
                 if not is_finalized:
-                    total_score = int(feedback.get("total_score", 0))
+                    total_score = state.total_score
                     max_score = q_info["max_score"]
 
                     if total_score >= max_score:
@@ -391,19 +774,48 @@ def student_learning_page():
                         st.info("AI 코치의 도움을 받아 답변을 수정하고 다시 피드백을 받거나, 현재 답변으로 최종 제출할 수 있습니다.")
                     
                     if st.button("✅ 이 질문 완료 & 다음으로", use_container_width=True, type="primary"):
-                        st.session_state.is_finalized[q_key] = True
-                        image_path = st.session_state.image_paths.get(q_key, "")
-                        save_to_gsheet(gc, st.session_state.student_name, q_key, st.session_state.attempts[q_key], True, q_info['text'], answer, image_path, feedback)
+                        state.finalized = True
+                        store = get_local_store()
+                        submission_id = save_submission(store, get_sheet_writer(), st.session_state.student_name, q_key, state.attempts, True, q_info['text'], answer, state.image_path, state.full_feedback(store))
+                        if submission_id is not None:
+                            state.submission_id = submission_id
+                            state.unsaved_feedback = None
                         
                         if st.session_state.current_q_idx < len(QUESTION_ORDER) - 1:
                             st.session_state.current_q_idx += 1
                         else:
                             st.session_state.page = 'completion'
+                        # 질문이 바뀌므로 전체 페이지(사이드바 진행률, 도구)를 다시 그림
                         st.rerun()
+    # 답변 입력/제출은 이 fragment 안에서만 다시 실행되므로 여기서도 진행 상황을 남김
+    checkpoint_session()
+
+
+def student_learning_page():
+    apply_custom_css()
+    q_key = QUESTION_ORDER[st.session_state.current_q_idx]
+    is_finalized = st.session_state.questions[q_key].finalized
+
+    st.title(f"🎵 {TASK_INFO['TITLE']}")
+    with st.expander("과제 설명 및 목표 보기", expanded=(st.session_state.current_q_idx == 0)):
+        st.markdown(TASK_INFO['DESCRIPTION'])
+        st.info(TASK_INFO['GOAL'])
+
+    with st.sidebar:
+        progress_sidebar(q_key)
+    
+    col1, col2 = st.columns([1.5, 1], gap="large")
+
+    with col1:
+        geogebra_tools()
+        sound_preview()
+
+    with col2:
+        question_panel(q_key)
 
     if is_finalized:
         st.success("이 질문에 대한 탐구를 마쳤습니다! 사이드바에서 다른 질문으로 이동하거나, 모든 질문을 마쳤다면 완료 페이지로 이동하세요.")
-        if all(st.session_state.is_finalized.values()):
+        if all(state.finalized for state in st.session_state.questions.values()):
             if st.button("🎉 모든 탐구 완료! 결과 보러 가기", type="primary"):
                 st.session_state.page = 'completion'
                 st.rerun()
@@ -438,7 +850,7 @@ def completion_page():
             st.warning("좋았던 점과 아쉬웠던 점을 모두 작성해주세요.")
         else:
             with st.spinner("만족도 내용을 저장하고 있어요..."):
-                save_final_feedback_to_gsheet(gc, st.session_state.student_name, f"{rating_value}점", good_points, bad_points)
+                save_final_feedback(get_local_store(), get_sheet_writer(), st.session_state.student_name, rating_value, good_points, bad_points)
                 st.session_state.feedback_submitted = True
                 st.success("소중한 의견 감사합니다! 이제 최종 리포트를 확인하세요.")
                 st.rerun()
@@ -451,31 +863,33 @@ def completion_page():
         if dim not in report_data:
             report_data[dim] = {'score': 0, 'max_score': 0}
         
-        if st.session_state.is_finalized.get(q_key, False):
-            feedback = st.session_state.feedbacks.get(q_key, {})
-            report_data[dim]['score'] += int(feedback.get("total_score", 0))
+        state = st.session_state.questions[q_key]
+        if state.finalized:
+            report_data[dim]['score'] += state.total_score or 0
             report_data[dim]['max_score'] += q_info.get("max_score", 0)
             
     dims = list(report_data.keys())
     scores = [(report_data[d]['score'] / report_data[d]['max_score']) * 100 if report_data[d]['max_score'] > 0 else 0 for d in dims]
 
+    import pandas as pd
     report_df = pd.DataFrame({"역량 차원": dims, "성취도 (%)": scores})
     st.bar_chart(report_df.set_index("역량 차원"))
     st.markdown("---")
 
     st.subheader("📜 나의 탐구 여정 돌아보기")
     for q_key, q_info in QUESTIONS.items():
-        if st.session_state.is_finalized.get(q_key, False):
+        state = st.session_state.questions[q_key]
+        if state.finalized:
             with st.expander(f"**질문 {q_key}: {q_info['title']}**"):
                 st.markdown(f"**질문 내용:** {q_info['text']}")
-                st.info(f"**나의 최종 답변:** {st.session_state.answers.get(q_key, '')}")
-                feedback = st.session_state.feedbacks.get(q_key, {})
+                st.info(f"**나의 최종 답변:** {state.answer}")
+                feedback = state.full_feedback(get_local_store())
                 if feedback and 'error' not in feedback:
                     st.write("**AI 피드백 (교사용):**")
                     st.json(feedback)
 
     if st.button("다른 이름으로 새로 시작하기", use_container_width=True):
-        initialize_session()
+        leave_student_session()
         st.rerun()
 
 def teacher_login_page():
@@ -494,71 +908,438 @@ def teacher_login_page():
         st.session_state.page = 'main'
         st.rerun()
 
+# 학급 통계는 저장소에 새 기록이 생겼을 때(data_version이 바뀔 때)만 다시 계산하고, 교사 세션끼리 결과를 공유
+@st.cache_data(max_entries=4, show_spinner="학급 통계를 계산하고 있습니다...")
+def get_class_overview(data_version):
+    from class_analytics import compute_class_overview
+    with metrics.span("store.analytics_rows"):
+        rows = get_local_store().analytics_rows()
+    with metrics.span("class_overview.compute"):
+        return compute_class_overview(rows, QUESTIONS, QUESTION_ORDER)
+
+def render_class_overview(store):
+    try:
+        overview = get_class_overview(store.data_version())
+    except Exception as e:
+        st.error(f"학급 통계를 계산하는 중 오류가 발생했습니다: {e}")
+        return
+    if overview is None:
+        st.info("아직 제출된 학생 데이터가 없습니다.")
+        return
+
+    summary = overview["summary"]
+    metric_cols = st.columns(4)
+    metric_cols[0].metric("참여 학생", f"{summary['students']}명")
+    metric_cols[1].metric("모든 질문 완료", f"{summary['completed_students']}명")
+    metric_cols[2].metric("최종 제출 답변", f"{summary['final_answers']}건")
+    metric_cols[3].metric("전체 제출 기록", f"{summary['submissions']}건")
+
+    st.subheader("🎯 평가 차원별 성취도")
+    distribution = overview["dimension_distribution"]
+    st.bar_chart(distribution["평균(%)"], y_label="평균 성취도(%)")
+    st.dataframe(distribution.round(1))
+    with st.expander("학생별 평가 차원 성취도(%) 보기"):
+        st.dataframe(overview["dimension_scores"].round(0))
+
+    st.subheader("🔁 질문별 최종 제출까지 받은 피드백 횟수")
+    st.dataframe(overview["attempts"].round(1))
+
+    st.subheader("📈 첫 피드백 → 최종 제출 점수 변화")
+    st.dataframe(overview["improvement"].round(2))
+
+# 내보내기 파일도 저장소에 새 기록이 생겼을 때만 다시 만들고 교사 세션끼리 공유 (최근 것 하나만 보관)
+@st.cache_data(max_entries=1, show_spinner="내보내기 파일을 만들고 있습니다...")
+def get_class_export(data_version):
+    from class_export import export_zip_bytes, store_rows
+    with metrics.span("class_export", source="store"):
+        data, _ = export_zip_bytes(store_rows(get_local_store()), SCORING_RUBRIC, QUESTIONS)
+    return data
+
+def render_class_export(store):
+    st.subheader("📦 학급 전체 내보내기")
+    st.caption("모든 학생의 제출 기록(채점 요소별 점수 열 포함)과 수업 만족도를 Parquet와 CSV(gzip) 파일로 묶어 받습니다.")
+    version = store.data_version()
+    # 세션에는 어느 시점의 기록으로 만들었는지만 남김 (파일 내용은 cache_data에 있음)
+    if st.button("내보내기 파일 만들기"):
+        st.session_state.class_export_version = version
+    if st.session_state.get("class_export_version") != version:
+        return
+    try:
+        data = get_class_export(version)
+    except Exception as e:
+        st.error(f"내보내기 파일을 만드는 중 오류가 발생했습니다: {e}")
+        return
+    st.download_button("⬇️ 내보내기 파일 받기 (zip)", data, file_name=f"class_export_{datetime.now():%Y%m%d_%H%M}.zip",
+                       mime="application/zip")
+
+# 학생이 이어하기 코드를 잊었을 때 교사가 코드를 알려주거나 저장된 진행 상황을 지움 (지워야 같은 이름으로 새로 시작할 수 있음)
+def render_saved_sessions(store):
+    try:
+        sessions = store.saved_sessions()
+    except Exception as e:
+        st.error(f"저장된 진행 상황을 불러오는 중 오류가 발생했습니다: {e}")
+        return
+    with st.expander(f"💾 저장된 진행 상황과 이어하기 코드 ({len(sessions)}개)"):
+        if not sessions:
+            st.info("저장된 진행 상황이 없습니다.")
+            return
+        def question_label(session):
+            q_idx = min(max(int(session.get("current_q_idx", 0)), 0), len(QUESTION_ORDER) - 1)
+            return "완료" if session.get("page") == "completion" else QUESTION_ORDER[q_idx]
+        st.dataframe(
+            [{"학생": row["student_name"], "이어하기 코드": row["token"], "현재 질문": question_label(row["session"]),
+              "마지막 저장": row["updated_at"]} for row in sessions],
+            use_container_width=True
+        )
+        with st.form("delete_saved_session"):
+            token = st.selectbox("지울 진행 상황", [row["token"] for row in sessions],
+                                 format_func=lambda t: next(f"{row['student_name']} · {t} · {row['updated_at']}" for row in sessions if row["token"] == t))
+            if st.form_submit_button("선택한 진행 상황 지우기"):
+                try:
+                    store.delete_checkpoint(token)
+                    st.success("지웠습니다. 이 학생은 같은 이름으로 처음부터 시작할 수 있습니다.")
+                except Exception as e:
+                    st.error(f"진행 상황을 지우는 중 오류가 발생했습니다: {e}")
+
+def render_answer_clusters(store):
+    from answer_clusters import score_distribution
+    st.caption("질문별 최종 답변을 비슷한 것끼리 묶었습니다. 묶음마다 AI 점수 분포를 보고, 메모를 묶음 학생 모두에게 한 번에 남길 수 있습니다.")
+    index = get_answer_index()
+    try:
+        with metrics.span("answer_clusters.sync"):
+            index.sync(store)
+    except Exception as e:
+        st.error(f"답변 색인을 갱신하는 중 오류가 발생했습니다: {e}")
+        return
+    q_key = st.selectbox("질문 선택:", QUESTION_ORDER, key="cluster_question",
+                         format_func=lambda key: f"{key}. {QUESTIONS[key]['text'][:40]}…")
+    with metrics.span("answer_clusters.clusters"):
+        clusters = index.clusters(q_key)
+    if not clusters:
+        st.info("이 질문에 최종 제출된 답변이 아직 없습니다.")
+        return
+
+    max_score = QUESTIONS[q_key]["max_score"]
+    notes = store.answer_notes(q_key)
+    groups = [cluster for cluster in clusters if cluster["size"] > 1]
+    singles = [cluster["members"][0] for cluster in clusters if cluster["size"] == 1]
+    st.caption(f"최종 답변 {sum(cluster['size'] for cluster in clusters)}건 → 여러 명이 함께 묶인 묶음 {len(groups)}개, 혼자인 답변 {len(singles)}건")
+
+    def distribution_text(members):
+        return " · ".join(f"{score}점 {n}명" for score, n in score_distribution(members, max_score).items())
+
+    for number, cluster in enumerate(groups, start=1):
+        members = cluster["members"]
+        representative = members[0][2]["answer"]
+        with st.expander(f"묶음 {number} · {cluster['size']}명 · {distribution_text(members)} — {representative[:50]}"):
+            st.markdown(f"**대표 답변:** {representative}")
+            st.dataframe(
+                [{"학생": name, "AI 점수": payload["total_score"], "유사도": round(similarity, 2),
+                  "답변": payload["answer"], "메모": notes.get(name, "")} for name, similarity, payload in members],
+                use_container_width=True
+            )
+            member_notes = [notes[name] for name, _, _ in members if name in notes]
+            current_note = max(set(member_notes), key=member_notes.count) if member_notes else ""
+            with st.form(key=f"cluster_note_{q_key}_{cluster['cluster']}"):
+                note = st.text_area("이 묶음 학생 모두에게 남길 메모", value=current_note)
+                if st.form_submit_button(f"{cluster['size']}명에게 메모 저장"):
+                    try:
+                        store.save_answer_notes(q_key, [name for name, _, _ in members], note.strip())
+                        st.success("메모를 저장했습니다.")
+                    except Exception as e:
+                        st.error(f"메모를 저장하는 중 오류가 발생했습니다: {e}")
+
+    if singles:
+        with st.expander(f"다른 답변과 묶이지 않은 답변 {len(singles)}건"):
+            st.dataframe(
+                [{"학생": name, "AI 점수": payload["total_score"], "답변": payload["answer"], "메모": notes.get(name, "")}
+                 for name, _, payload in singles],
+                use_container_width=True
+            )
+
+def render_memory_footprint():
+    footprint = get_session_footprints().summary()
+    metric_cols = st.columns(4)
+    metric_cols[0].metric("프로세스 메모리(RSS)", f"{footprint['rss_bytes'] / 2**20:,.0f} MB")
+    metric_cols[1].metric("활동 중인 세션", f"{footprint['sessions']}개")
+    metric_cols[2].metric("세션 상태 합계", f"{footprint['total_bytes'] / 1024:,.0f} KB")
+    metric_cols[3].metric("세션당 평균", f"{footprint['mean_bytes'] / 1024:,.1f} KB")
+    st.caption(f"최근 {CONFIG['SESSION_IDLE_TIMEOUT'] // 60}분 안에 화면이 갱신된 세션만 셉니다. "
+               f"같은 내용이 {CONFIG['MEMORY_LOG_INTERVAL']}초마다 서버 로그(memory_footprint)에도 남습니다.")
+    if footprint["largest"]:
+        st.markdown("**세션 상태가 큰 세션**")
+        st.dataframe(
+            [{"세션": label or "(이름 없음)", "크기(KB)": round(size / 1024, 1)} for label, size in footprint["largest"]],
+            use_container_width=True
+        )
+
 ## 변경/추가된 부분: teacher_dashboard_page 수정 ##
 def teacher_dashboard_page():
     apply_custom_css()
     st.title("📊 교사용 대시보드")
     
+    store = get_local_store()
+    # 남아 있는 미복제 행이 있으면 Sheets 복제를 이어서 진행
+    sheet_writer = get_sheet_writer()
+    # 누르면 다시 그리면서 저장소의 최신 기록을 읽음
+    st.sidebar.button("🔄 새로고침")
     try:
-        sh = gc.open(CONFIG["GSHEET_NAME"])
-        # 'Sheet1' 같은 기본 시트를 제외하고 학생 이름만 가져옴
-        student_sheets = [w for w in sh.worksheets() if w.title not in ['Sheet1', '기본시트']]
-        student_names = sorted([w.title for w in student_sheets])
+        with metrics.span("store.student_names"):
+            student_names = store.student_names()
 
     except Exception as e:
         st.error(f"학생 목록을 불러오는 중 오류 발생: {e}")
         student_names = []
-        sh = None
 
-    if not student_names:
-        st.info("아직 제출된 학생 데이터가 없습니다.")
-    elif sh:
-        selected_name = st.selectbox("학생 선택:", student_names, key="teacher_student_select")
-        if selected_name:
-            try:
-                worksheet = sh.worksheet(selected_name)
-                data = worksheet.get_all_records()
-                if data:
-                    df = pd.DataFrame(data)
+    class_tab, cluster_tab, student_tab, memory_tab = st.tabs(["📈 학급 전체", "🧩 답변 묶음 검토", "🔍 학생별 기록", "🧠 서버 메모리"])
+    with class_tab:
+        render_class_overview(store)
+        st.markdown("---")
+        render_class_export(store)
+
+    with cluster_tab:
+        render_answer_clusters(store)
+
+    with memory_tab:
+        render_memory_footprint()
+
+    with student_tab:
+        render_saved_sessions(store)
+        if not student_names:
+            st.info("아직 제출된 학생 데이터가 없습니다.")
+        else:
+            selected_name = st.selectbox("학생 선택:", student_names, key="teacher_student_select")
+            if selected_name:
+                try:
+                    with metrics.span("store.sheet_records"):
+                        data = store.sheet_records(selected_name)
+                    if data:
+                        import pandas as pd
+                        df = pd.DataFrame(data)
                     
-                    # 최종 피드백 데이터 분리 및 표시
-                    final_feedback_df = df[df['Question ID'] == 'Final_Feedback']
-                    if not final_feedback_df.empty:
-                        st.subheader(f"🗣️ {selected_name} 학생의 최종 수업 피드백")
-                        feedback_content = final_feedback_df.iloc[0]['Student Answer']
-                        st.info(feedback_content)
-                        st.markdown("---")
-
-                    # 학습 과정 데이터 표시 (최종 피드백 제외)
-                    learning_df = df[df['Question ID'] != 'Final_Feedback']
-                    st.subheader(f"🔍 {selected_name} 학생의 학습 과정 추적")
-                    st.dataframe(learning_df)
-
-                    # 이미지 표시
-                    if 'Image Path' in df.columns:
-                        image_paths = df[df['Image Path'].notna() & (df['Image Path'] != '')]['Image Path'].unique().tolist()
-                        if image_paths:
-                            st.subheader("🖼️ 제출된 이미지")
-                            for img_path in image_paths:
-                                if os.path.exists(img_path):
-                                    st.image(img_path, caption=f"경로: {img_path}")
-                                else:
-                                    st.warning(f"이미지 파일을 찾을 수 없습니다: {img_path}")
+                        # 최종 피드백 데이터 분리 및 표시
+                        final_feedback_df = df[df['Question ID'] == 'Final_Feedback']
+                        if not final_feedback_df.empty:
+                            st.subheader(f"🗣️ {selected_name} 학생의 최종 수업 피드백")
+                            feedback_content = final_feedback_df.iloc[0]['Student Answer']
+                            st.info(feedback_content)
+                            st.markdown("---")
+
+                        # 학습 과정 데이터 표시 (최종 피드백 제외)
+                        learning_df = df[df['Question ID'] != 'Final_Feedback']
+                        st.subheader(f"🔍 {selected_name} 학생의 학습 과정 추적")
+                        st.dataframe(learning_df)
+
+                        # 이미지 표시
+                        if 'Image Path' in df.columns:
+                            image_paths = df[df['Image Path'].notna() & (df['Image Path'] != '')]['Image Path'].unique().tolist()
+                            if image_paths:
+                                st.subheader("🖼️ 제출된 이미지")
+                                ingestor = get_image_ingestor()
+                                # 썸네일만 먼저 보여주고 원본은 선택한 것만 불러옴
+                                image_cols = st.columns(3)
+                                for i, img_path in enumerate(image_paths):
+                                    with image_cols[i % 3]:
+                                        thumb = ingestor.ensure_thumbnail(img_path)
+                                        if thumb:
+                                            st.image(thumb, caption=f"경로: {img_path}")
+                                            if st.toggle("원본 보기", key=f"full_image_{img_path}"):
+                                                st.image(img_path)
+                                        elif ingestor.is_pending(img_path):
+                                            st.info(f"이미지를 처리하고 있습니다: {img_path}")
+                                        else:
+                                            st.warning(f"이미지 파일을 찾을 수 없습니다: {img_path}")
+                        else:
+                            st.info("이 학생의 데이터에는 이미지 경로 정보가 없습니다. (이전 버전에 생성된 시트일 수 있습니다.)")
                     else:
-                        st.info("이 학생의 데이터에는 이미지 경로 정보가 없습니다. (이전 버전에 생성된 시트일 수 있습니다.)")
-                else:
-                    st.info(f"{selected_name} 학생의 데이터가 비어있습니다.")
-            except Exception as e:
-                st.error(f"{selected_name} 학생의 데이터를 불러오는 중 오류가 발생했습니다: {e}")
-                
+                        st.info(f"{selected_name} 학생의 데이터가 비어있습니다.")
+                except Exception as e:
+                    st.error(f"{selected_name} 학생의 데이터를 불러오는 중 오류가 발생했습니다: {e}")
+
+    store_counts = store.counts()
+    st.sidebar.caption(f"저장된 제출 {store_counts['submissions']}건 · 만족도 {store_counts['final_feedback']}건")
+    if sheet_writer is not None:
+        handle_stats = get_sheet_handles().stats()
+        st.sidebar.caption(
+            f"Sheets 복제 대기 {store_counts['unsynced']}건 · API 호출 {handle_stats['api_calls']}회 · "
+            f"캐시로 절약 {handle_stats['api_calls_saved']}회"
+        )
+    else:
+        st.sidebar.caption("Google Sheets 복제 꺼짐 (인증 정보 없음)")
+    cache_stats = get_feedback_cache().stats()
+    st.sidebar.caption(
+        f"AI 피드백 캐시 적중 {cache_stats['memory_hits'] + cache_stats['disk_hits']}회 · "
+        f"미적중 {cache_stats['misses']}회 (적중률 {cache_stats['hit_rate']:.0%})"
+    )
+    token_totals = get_token_ledger().summary()["totals"]
+    st.sidebar.caption(
+        f"AI 토큰: 프롬프트 {token_totals['prompt_tokens']:,} (프롬프트 캐시 {token_totals['cached_share']:.0%}) · "
+        f"응답 {token_totals['completion_tokens']:,}"
+    )
+    cascade_stats = get_cascade_stats().stats()
+    st.sidebar.caption(
+        f"AI 채점 {cascade_stats['graded']}건 중 큰 모델로 재채점 {cascade_stats['escalated']}건 "
+        f"({cascade_stats['escalation_rate']:.0%})"
+    )
+    image_stats = get_image_ingestor().stats()
+    st.sidebar.caption(
+        f"이미지 저장 {image_stats['stored']}개 · 중복 {image_stats['deduplicated']}개 · 처리 중 {image_stats['pending']}개"
+    )
+    pre_grader_stats = get_pre_grader_stats().stats()
+    st.sidebar.caption(
+        f"규칙 채점으로 AI 호출 생략 {pre_grader_stats['pre_graded']}회 / {pre_grader_stats['checked']}회 "
+        f"({pre_grader_stats['avoided_share']:.0%})"
+    )
+    sound_stats = get_sound_synth().stats()
+    st.sidebar.caption(
+        f"소리 합성 {sound_stats['misses']}회 (평균 {sound_stats['mean_render_ms']:.1f} ms) · 캐시 적중 {sound_stats['hits']}회"
+    )
+    for scope, timing in sorted(get_rerun_timings().summary().items()):
+        st.sidebar.caption(
+            f"{scope}: 평균 {timing['mean_ms']:.0f} ms · p95 {timing['p95_ms']:.0f} ms · "
+            f"{timing['runs']}회 · iframe {timing['iframes_per_run']:.1f}개/회"
+        )
+    if st.sidebar.button("🩺 서버 진단", use_container_width=True):
+        st.session_state.page = 'diagnostics'
+        st.rerun()
     if st.sidebar.button("로그아웃"):
         st.session_state.teacher_logged_in = False
         st.session_state.page = 'main'
         st.rerun()
 
+# 수업 중 병목 확인용: 외부 호출/페이지 렌더링 구간별 지연·오류와 각 구성 요소의 통계를 한 화면에 모음
+# 교사 로그인(비밀번호)을 한 세션에서만 열림
+def diagnostics_page():
+    apply_custom_css()
+    st.title("🩺 서버 진단")
+    if st.sidebar.button("📊 대시보드로 돌아가기", use_container_width=True):
+        st.session_state.page = 'teacher_dashboard'
+        st.rerun()
+    st.sidebar.button("🔄 새로고침")
+
+    # 저장소/이미지처럼 아직 한 번도 쓰이지 않은 구성 요소도 통계에 나오도록 미리 만들어 둠
+    get_local_store(), get_feedback_cache(), get_ai_scheduler(), get_token_ledger(), get_pre_grader_stats(), get_cascade_stats()
+    get_image_ingestor(), get_session_footprints(), get_sheet_writer(), get_answer_index()
+    snapshot = metrics.REGISTRY.snapshot()
+
+    st.subheader("⏱️ OpenAI와 Google Sheets 비교")
+    comparison = [
+        ("OpenAI 응답", "openai.chat"), ("OpenAI 첫 토큰", "openai.first_token"), ("AI 요청 대기열", "ai_scheduler.queue_wait"),
+        ("Sheets 기록", "sheets.append_rows"), ("로컬 저장", "store.add_submission"), ("이미지 처리", "image.ingest"),
+    ]
+    metric_cols = st.columns(len(comparison))
+    for col, (label, name) in zip(metric_cols, comparison):
+        totals = metrics.REGISTRY.span_totals(name)
+        col.metric(label, f"{totals['p95_ms']:,.0f} ms" if totals["count"] else "-",
+                   help=f"{name}: p95 지연 시간 (평균 {totals['mean_ms']:,.0f} ms)")
+        col.caption(f"{totals['count']}회 · 오류 {totals['errors']}회")
+
+    counters = {(c["name"], tuple(sorted(c["labels"].items()))): c["value"] for c in snapshot["counters"]}
+    openai_retries = sum(v for (name, _), v in counters.items() if name == "openai_retries_total")
+    sheets_retries = sum(v for (name, _), v in counters.items() if name == "sheets_retries_total")
+    tokens = {}
+    for (name, labels), value in counters.items():
+        if name == "openai_tokens_total":
+            kind = dict(labels).get("kind")
+            tokens[kind] = tokens.get(kind, 0) + value
+    st.caption(
+        f"재시도: OpenAI {openai_retries}회 · Sheets {sheets_retries}회 | "
+        f"토큰: 프롬프트 {tokens.get('prompt', 0):,} (캐시 {tokens.get('cached_prompt', 0):,}) · 응답 {tokens.get('completion', 0):,} | "
+        f"서버 시작 후 {snapshot['uptime_seconds'] / 60:,.0f}분"
+    )
+
+    st.subheader("🪜 모델 단계별 채점")
+    cascade = get_cascade_stats().stats()
+    tier_spans = sorted((s for s in snapshot["spans"] if s["span"] == "openai.chat"), key=lambda s: s["labels"].get("tier") != "primary")
+    if tier_spans:
+        rows = []
+        for s in tier_spans:
+            tier, model = s["labels"].get("tier", ""), s["labels"].get("model", "")
+            usage = cascade["by_tier"].get(f"{tier}:{model}", {})
+            rows.append({
+                "단계": "빠른 모델" if tier == "primary" else "재채점",
+                "모델": model,
+                "호출": s["count"],
+                "오류": s["errors"],
+                "p50(ms)": round(s["p50_ms"], 1),
+                "p95(ms)": round(s["p95_ms"], 1),
+                "프롬프트 토큰": usage.get("prompt_tokens", 0),
+                "응답 토큰": usage.get("completion_tokens", 0),
+            })
+        st.dataframe(rows, use_container_width=True)
+        reasons = {}
+        for row in cascade["by_question"].values():
+            for reason, n in row["reasons"].items():
+                reasons[reason] = reasons.get(reason, 0) + n
+        st.caption(
+            f"AI 채점 {cascade['graded']}건 중 재채점 {cascade['escalated']}건 ({cascade['escalation_rate']:.0%})"
+            + (" · 이유: " + ", ".join(f"{reason} {n}건" for reason, n in sorted(reasons.items())) if reasons else "")
+        )
+    else:
+        st.info("아직 AI 채점 호출이 없습니다.")
+
+    st.subheader("📋 구간별 지연 시간")
+    if snapshot["spans"]:
+        st.dataframe(
+            [{
+                "구간": s["span"],
+                "라벨": ", ".join(f"{k}={v}" for k, v in s["labels"].items()),
+                "횟수": s["count"],
+                "오류": s["errors"],
+                "평균(ms)": round(s["mean_ms"], 1),
+                "p50(ms)": round(s["p50_ms"], 1),
+                "p95(ms)": round(s["p95_ms"], 1),
+                "p99(ms)": round(s["p99_ms"], 1),
+            } for s in snapshot["spans"]],
+            use_container_width=True
+        )
+    else:
+        st.info("아직 기록된 구간이 없습니다.")
+
+    errors = [(s["span"], error, n) for s in snapshot["spans"] for error, n in s["errors_by_type"].items()]
+    if errors:
+        st.subheader("⚠️ 오류 종류")
+        st.dataframe([{"구간": name, "오류": error, "횟수": n} for name, error, n in errors], use_container_width=True)
+
+    if snapshot["counters"]:
+        st.subheader("🔢 카운터")
+        st.dataframe(
+            [{"이름": c["name"], "라벨": ", ".join(f"{k}={v}" for k, v in c["labels"].items()), "값": c["value"]}
+             for c in snapshot["counters"]],
+            use_container_width=True
+        )
+
+    st.subheader("🧩 구성 요소별 통계")
+    for name, stats in sorted(snapshot["components"].items()):
+        with st.expander(name):
+            st.json(stats, expanded=True)
+
+    st.subheader("📤 내보내기")
+    download_cols = st.columns(2)
+    download_cols[0].download_button("Prometheus 텍스트 받기", metrics.REGISTRY.prometheus_text(snapshot),
+                                     file_name="metrics.prom", mime="text/plain", use_container_width=True)
+    download_cols[1].download_button("JSON 받기", metrics.REGISTRY.to_json(snapshot),
+                                     file_name="metrics.json", mime="application/json", use_container_width=True)
+    if CONFIG["METRICS_DUMP_DIR"]:
+        st.caption(f"같은 내용이 {CONFIG['METRICS_DUMP_INTERVAL']}초마다 "
+                   f"`{os.path.join(CONFIG['METRICS_DUMP_DIR'], 'metrics.prom')}`와 `metrics.json`에도 기록됩니다.")
+
 # --- 5. 메인 페이지 라우터 ---
 if 'page' not in st.session_state:
     initialize_session()
+    # 서버가 재시작되거나 다른 인스턴스로 다시 연결된 학생은 주소에 남은 이어하기 코드로 진행 상황을 되살림
+    resume_token = st.query_params.get("resume")
+    resume_name = student_for_resume_token(resume_token) if resume_token else None
+    if resume_name:
+        st.session_state.student_name = resume_name
+        st.session_state.resume_token = resume_token.strip().upper()
+        st.session_state.page = 'student_learning'
+        st.session_state.resumed = restore_session(st.session_state.resume_token)
+    elif resume_token:
+        st.query_params.pop("resume", None)
+
+if st.session_state.pop('resumed', False):
+    st.toast("저장된 진행 상황을 불러왔어요. 하던 곳부터 이어서 하세요.", icon="💾")
 
 page_map = {
     'main': main_page,
@@ -567,10 +1348,16 @@ page_map = {
     'completion': completion_page,
     'teacher_login': teacher_login_page,
     'teacher_dashboard': teacher_dashboard_page,
+    'diagnostics': diagnostics_page,
 }
 
-if st.session_state.page == 'teacher_dashboard' and not st.session_state.get('teacher_logged_in', False):
+if st.session_state.page in ('teacher_dashboard', 'diagnostics') and not st.session_state.get('teacher_logged_in', False):
     st.session_state.page = 'teacher_login'
 
 page_function = page_map.get(st.session_state.page, main_page)
-page_function()
\ No newline at end of file
+with get_rerun_timings().measure(f"전체 페이지: {st.session_state.page}"):
+    page_function()
+checkpoint_session()
+record_session_footprint()
+start_import_warmup()
+start_metrics_dump()
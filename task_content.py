@@ -0,0 +1,106 @@
+# 과제 및 프레임워크 데이터 정의
+# streamlit_app.py와 오프라인 도구(tools/)가 함께 사용하므로 Streamlit에 의존하지 않는 별도 모듈로 둠
+TASK_INFO = {
+    "TITLE": "나만의 '시그니처 사운드' 만들기",
+    "DESCRIPTION": "요즘 많은 크리에이터들이 영상 중간 부분에 자신만의 독특한 효과음, 즉 '시그니처 사운드'를 사용합니다. 우리도 GeoGebra와 삼각함수 `y = A*sin(Bx+C) + D`를 이용해서 세상에 하나뿐인 나만의 시그니처 사운드를 디자인해 봅시다!",
+    "GOAL": """
+        **<사운드 디자인 목표>**
+        1. 기본음 '도(C4)'보다 **한 옥타브 높은 솔(G5)** 음
+        2. 갑자기 시작하지 않고 **부드럽게** 시작하는 느낌
+        3. 너무 크지 않은 **적당한** 볼륨
+    """
+}
+
+QUESTIONS = {
+    "1-1": {"step": 1, "title": "Step 1. 소리와 수학 연결하기", "text": "목표 소리의 세 가지 특징을 수학적으로 표현하기 위해 각각 어떤 변수(A, B, C, D)를 사용해야 할지 연결하고 이유를 설명하세요.", "dimension": "다른 표상", "max_score": 1},
+    "1-2": {"step": 1, "title": "Step 1. 소리와 수학 연결하기", "text": "여러분이 디자인한 최종 시그니처 사운드를 나타내는 함수식을 서술하고, 해당 식의 GeoGebra 그래프를 캡처하여 첨부해주세요.", "dimension": "다른 표상", "max_score": 1, "has_image_upload": True},
+    "1-3": {"step": 1, "title": "Step 1. 소리와 수학 연결하기", "text": "완성한 수학식에서 각각의 변수(A, B, C, D)와 그 결과값은 현실 세계의 '소리'에서 구체적으로 무엇을 의미할까요?", "dimension": "다른 표상", "max_score": 1},
+    "2-1": {"step": 2, "title": "Step 2. 나만의 사운드 만들기", "text": "'사운드 디자인 목표'를 달성하기 위해 각각의 변수(A, B, C, D)의 값을 어떻게 정했나요? 값을 정한 이유와 계산 과정을 상세히 서술해주세요.", "dimension": "절차", "max_score": 2},
+    "2-2": {"step": 2, "title": "Step 2. 나만의 사운드 만들기", "text": "만약 사운드 디자인의 목표가 바뀌면 변수(A, B, C, D)들을 어떻게 변형하면 좋을지 구체적으로 서술해주세요. 즉, 수학적 조작이 음악적 결과에 어떤 영향을 미치는지 관계와 그 근거를 구체적으로 서술해주세요.", "dimension": "함의", "max_score": 2},
+    "3-1": {"step": 3, "title": "Step 3. 디자인 분석 및 나의 생각", "text": "여러분이 조절한 여러 변수(A, B, C, D)는 독립적인가요? 혹은 서로 영향을 주나요? 각각의 변수가 어떻게 하나의 '사운드 시스템'으로 작동하는지 설명해보세요.", "dimension": "부분-전체 관계", "max_score": 2},
+    "3-2": {"step": 3, "title": "Step 3. 디자인 분석 및 나의 생각", "text": "이번 '사운드 디자인' 활동을 통해 수학에 대한 여러분의 생각이나 느낌에 어떤 변화가 있었는지, 수학이 우리 생활과 어떻게 연결될 수 있는지 느낀점을 자유롭게 서술해주세요. ", "dimension": "메타인지 성찰", "max_score": 2}
+}
+QUESTION_ORDER = list(QUESTIONS.keys())
+
+SCORING_RUBRIC = {
+    "다른 표상": {
+        "1-1": "현실 → 수학 (1점): 소리의 세 가지 특징(높이, 시작 느낌, 볼륨)을 각각의 수학 변수(B, C, A 등)와 타당하게 연결하여 설명하였는가?",
+        "1-2": "수학적 모델 구축 (1점): 과제 목표(G5 음, 부드러운 시작 등)에 부합하는 타당한 함수식과 그에 맞는 그래프를 올바르게 제시하였는가?",
+        "1-3": "수학 → 현실 (1점): 자신이 설정한 변수(A, B, C, D) 값들이 각각 현실의 소리에서 어떤 구체적인 의미(예: 진폭, 주파수, 위상 이동 등)를 갖는지 정확하게 해석하였는가?"
+    },
+    "절차": {
+        "2-1": """- 절차 선택 (1점): '사운드 디자인 목표(G5, 부드러운 시작, 적당한 볼륨)'를 달성하기 위해 각 변수(A, B, C, D)의 값을 결정하는 합리적인 전략이나 사고 과정을 제시하였는가?
+- 절차 수행 (1점): 특히, B값을 G5의 주파수(약 784Hz)에 근거하여 설정하는 등, 선택한 전략을 구체적이고 논리적으로 수행하여 설명하였는가?"""
+    },
+    "함의": {
+        "2-2": """- 결과 예측 (1점): 바뀐 사운드 목표를 달성하기 위해 각 변수를 어떻게 조작해야 하는지, 그 관계를 타당하게 예측하였는가?
+- 논리적 근거 제시 (1점): 수학적 조작(예: B값 증가)이 음악적 결과(예: 소리 높아짐)로 이어지는 이유를 그래프의 변화와 연결하여 논리적으로 설명하였는가?"""
+    },
+    "부분-전체 관계": {
+        "3-1": """- 요소의 역할 분석 (1점): 각 변수(A, B, C, D)가 소리의 다른 속성(크기, 높낮이 등)을 '독립적으로' 제어하는 역할을 한다는 점을 명확히 설명하였는가?
+- 상호작용 및 전체 구조 설명 (1점): 각 변수들의 독립적인 역할 덕분에, 전체 모델이 어떻게 하나의 정교하고 통합된 '사운드 시스템'으로 작동하는지 종합적으로 설명하였는가?"""
+    },
+    "메타인지 성찰": {
+        "3-2": """- 수학의 가치/유용성 인식 (1점): 이번 활동을 통해 수학이 음악 디자인이나 실생활 문제 해결에 어떻게 창의적/도구적으로 사용될 수 있는지 구체적인 사례를 들어 설명하였는가?
+- 태도/신념의 변화 성찰 (1점): 이번 경험이 수학에 대한 자신의 기존 인식이나 학습 태도에 어떤 긍정적인 변화를 가져왔는지 성찰적으로 서술하였는가?"""
+    }
+}
+
+MODEL_ANSWERS = {
+    "1-1": "소리의 세 가지 특징은 다음과 같이 수학 변수와 연결됩니다. '소리의 높이'는 그래프의 진동 빈도를 결정하는 변수 B와 관련이 깊습니다. B가 클수록 주파수가 높아져 더 높은 소리가 납니다. '부드러운 시작'은 그래프의 시작점을 좌우로 이동시키는 변수 C(위상 이동)와 관련됩니다. 사인 곡선이 0에서 시작하지 않고 부드럽게 올라가는 지점에서 시작하도록 C 값을 조절할 수 있습니다. 마지막으로 '볼륨(크기)'은 그래프의 위아래 폭, 즉 진폭을 결정하는 변수 A와 직접적으로 관련됩니다.",
+    "1-3": "제가 만든 식 y = 0.7*sin(784x - 1.57)에서 각 변수는 다음과 같은 의미를 가집니다. A=0.7은 소리의 진폭으로, '적당한 볼륨'을 의미합니다. B=784는 주파수로, 목표인 '한 옥타브 높은 솔(G5)' 음을 만들어냅니다. C=-1.57(약 -π/2)은 위상 이동으로, x=0일 때 음수에서 시작하여 부드럽게 소리가 커지는 효과를 줍니다. D=0은 그래프의 중심선을 y=0에 유지시켜 소리가 특정 음높이에 치우치지 않게 합니다.",
+    "2-1": "목표 달성을 위해 각 변수 값을 다음과 같이 정했습니다. 1) '한 옥타브 높은 솔(G5)' 음을 만들기 위해, GeoGebra 도구 2나 관련 자료를 통해 G5의 주파수가 약 784Hz임을 확인했습니다. 그래서 변수 B 값을 784로 설정했습니다. 2) '부드러운 시작'을 위해, x=0에서 y값이 바로 최대가 아닌, 음수에서 시작해 증가하도록 C값을 조절했습니다. sin(C)가 음수가 되도록 C를 -π/2 (-1.57)로 설정하여 사인 그래프가 (0,-1) 근처에서 시작하게 만들었습니다. 3) '적당한 볼륨'을 위해, 진폭 A를 최댓값인 1보다 작은 0.7로 설정하여 너무 크지 않은 소리를 만들었습니다. 4) D는 소리의 전체적인 수직 이동인데, 특별한 목적이 없어 0으로 두었습니다.",
+    "2-2": """
+사운드 디자인의 목표가 바뀌면 그에 맞춰 변수를 유연하게 변형할 수 있습니다. 수학적 조작과 음악적 결과의 관계는 다음과 같습니다.
+
+1.  **'점점 커지거나 작아지는 소리'**: 이는 볼륨의 변화이므로 변수 A(진폭)를 조절해야 합니다. 상수가 아닌 시간에 따라 변하는 함수, 예를 들어 A = 0.1 * t (점점 커짐) 또는 A = 1 - 0.1*t (점점 작아짐) 형태로 바꾸면 시간에 따른 볼륨 변화를 표현할 수 있습니다.
+
+2.  **'음이 부드럽게 미끄러지듯 변하는 소리 (글리산도)'**: 이는 음높이의 연속적인 변화이므로 변수 B(주파수)를 조절해야 합니다. 시간에 따라 변하는 함수, 예를 들어 B = 440 + 100*t 와 같이 설정하면 낮은 음에서 높은 음으로 부드럽게 올라가는 소리를 만들 수 있습니다.
+
+3.  **'소리의 전체적인 음역대(톤)를 바꾸고 싶을 때'**: 이는 그래프의 수직 이동과 관련되므로 변수 D를 조절할 수 있습니다. D값을 양수로 바꾸면 파형 전체가 위로 올라가고, 음수로 바꾸면 아래로 내려가면서 소리의 전반적인 톤에 미묘한 변화를 줄 수 있습니다.
+
+이처럼, 각 변수(A, B, C, D)가 소리의 특정 요소(크기, 높낮이, 시작점, 톤)를 제어한다는 기본 원리를 이해하면, 거의 모든 음악적 아이디어를 수학적으로 모델링하고 구현해볼 수 있습니다.
+""",
+    "3-1": "네, 네 변수 A, B, C, D는 서로 독립적입니다. A(진폭)를 바꾼다고 해서 B(주파수)가 변하지 않으며, C(위상)를 바꿔도 A나 B에 영향을 주지 않습니다. 이 '독립성'이 바로 이 모델을 강력한 '사운드 시스템'으로 만듭니다. 마치 오디오 믹서에서 볼륨, 피치, 밸런스 노브가 각각 따로 작동하는 것과 같습니다. 각 변수가 소리의 한 가지 속성(크기, 높낮이, 시작점, 전체 음역대)만을 정교하게 제어하기 때문에, 우리는 이들을 조합하여 매우 복잡하고 의도적인 사운드를 체계적으로 디자인할 수 있습니다.",
+    "3-2": "이전에는 수학을 단순히 정해진 답을 찾는 계산 과목으로만 생각했습니다. 하지만 이번 사운드 디자인 활동을 통해, y=A*sin(Bx+C)+D 라는 하나의 수식이 음악이라는 예술적 결과물을 만드는 창의적인 '도구'가 될 수 있다는 것을 깨달았습니다. 변수 값을 바꾸며 소리가 실시간으로 변하는 것을 보며, 수학적 원리가 우리 주변의 소리, 빛, 파동 등 세상의 많은 현상을 설명하고 심지어 창조할 수 있는 강력한 언어라는 것을 느꼈습니다. 이제 수학은 딱딱한 학문이 아니라, 세상을 이해하고 표현하는 아름다운 방법 중 하나로 느껴집니다."
+}
+
+PROMPT_TEMPLATE = """
+당신은 학생의 사고 과정을 돕는 유능하고 친절한 AI 학습 코치입니다. 당신의 목표는 학생이 정답을 완성하도록 돕는 것이지, 점수를 매기는 것이 아닙니다. 학생에게는 점수가 보이지 않습니다.
+
+**[핵심 지시사항]**
+1.  **용어 통일**: 학생은 고등학생입니다. '파라미터' 대신 반드시 '변수'라는 단어를 사용하세요.
+2.  **모범 답안 활용**: 아래 제공된 **[모범 답안]**은 최고 점수를 받을 수 있는 답변의 예시입니다. 이를 참고하여 학생 답변의 완성도 수준을 판단하고, 피드백의 방향을 정하세요. **절대 모범 답안의 내용을 학생에게 직접적으로 알려주지 마세요.**
+3.  **내부 채점**: 먼저, 주어진 **[채점 기준]**과 **[모범 답안]**을 바탕으로 학생의 답변을 냉정하게 내부적으로 채점합니다. **평가 요소별 점수**와 **총점**을 모두 계산합니다.
+4.  **피드백 분기 처리**:
+    *   **만약 총점이 만점이 아니라면**: 학생이 스스로 오류를 수정하도록 **'촉진 질문'**을 던져야 합니다. `suggestion` 필드에, 학생의 답변에서 부족한 점을 직접적으로 보완할 수 있는 구체적인 질문을 작성해주세요. (예: '소리의 높낮이는 변수 B와 관련이 있는데, B가 커지면 소리가 높아질까요, 낮아질까요? 그래프의 모양을 생각해보세요.')
+    *   **만약 총점이 만점이라면**: 훌륭합니다! `analysis` 필드에서 칭찬해주고, `suggestion` 필드에는 현재 학습 내용을 넘어서는 '심화 질문'이나 '확장 질문'을 제시하여 더 깊은 생각을 유도해주세요. (예: '아주 정확해요! 그렇다면 이 사인 함수 모델로 표현하기 어려운 소리에는 어떤 것들이 있을지 상상해볼까요?')
+
+**[평가 차원]: {dimension}**
+**[현재 질문]:** "{question_text}"
+**[채점 기준]:**
+{scoring_criteria}
+
+**[모범 답안]:** 
+{model_answer}
+
+**[학생 답변]:** 다음 메시지로 주어집니다.
+
+**[출력 형식]**
+아래 JSON 형식에 맞춰 **반드시 JSON 객체로만** 출력하세요. 학생에게 점수는 절대 보여주지 않지만, 교사용 기록을 위해 모든 정보를 포함해야 합니다.
+**[채점 기준]**에 '-' 기호로 구분된 여러 평가 요소가 있다면, 각 요소를 개별적으로 채점하고 `scores` 객체에 모두 포함시켜야 합니다.
+
+{{
+  "scores": {{
+    "평가요소1 이름": "(0점 또는 1점 등, 요소별 배점)",
+    "평가요소2 이름": "(요소별 배점)"
+  }},
+  "total_score": "(내부적으로 계산한 총점)",
+  "confidence": "(채점 결과에 대한 확신도. 0~1 사이 숫자. 답변이 채점 기준의 경계에 있어 판단이 애매하면 낮게)",
+  "analysis": "(학생 답변의 잘한 점을 긍정적으로 서술. 점수 언급 절대 금지.)",
+  "suggestion": "(위의 [핵심 지시사항] 4번 규칙에 따라 '촉진 질문' 또는 '심화 질문'을 작성.)"
+}}
+"""
+
+# 학생 답변은 질문별로 고정된 앞부분(PROMPT_TEMPLATE) 뒤에 별도 메시지로 붙음
+STUDENT_ANSWER_TEMPLATE = '**[학생 답변]:** "{student_answer}"'
@@ -0,0 +1,37 @@
+import pytest
+
+from pre_grader import find_rule, mentions_variables
+from task_content import QUESTIONS
+
+
+def rule_name(q_key, answer):
+    rule = find_rule(q_key, answer, QUESTIONS[q_key]["text"])
+    return rule[0] if rule else None
+
+
+@pytest.mark.parametrize("answer", [
+    "비교해 보면 처음 소리보다 나중 소리가 더 좋게 들려요.",
+    "준비한 소리가 어디서 나는지 잘 들어 보았어요.",
+    "씨앗이 자라듯이 소리가 점점 퍼져 나가요.",
+    "소리 크기가 커지면 더 신나게 들려요.",
+])
+def test_ordinary_words_do_not_count_as_variables(answer):
+    assert not mentions_variables(answer)
+    assert rule_name("1-1", answer) == "missing_variables"
+
+
+@pytest.mark.parametrize("answer", [
+    "에이는 볼륨, 비는 음높이, 씨는 시작 위치, 디는 중심",
+    "A를 키우면 소리가 커지고 B를 키우면 높아져요.",
+    "진폭이 커지면 소리가 커져요.",
+    "소리의 높이 와 크기 를 바꿔 보았어요.",
+])
+def test_variable_mentions_go_to_the_model(answer):
+    assert mentions_variables(answer)
+    assert rule_name("1-3", answer) is None
+
+
+def test_missing_variables_only_for_mapping_questions():
+    answer = "소리를 점점 크게 하려면 그래프 높이를 시간에 따라 키우면 됩니다"
+    assert rule_name("2-2", answer) is None
+    assert rule_name("3-1", "서로 영향을 주지 않는 것 같아요") is None
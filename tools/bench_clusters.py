@@ -0,0 +1,128 @@
+# 답변 묶음 색인(answer_clusters.py)의 구축/추가/검색 시간 측정
+# 모범 답안 문장을 섞어 만든 "원형" 답변에 단어 빠뜨리기/순서 바꾸기/오타를 넣어 비슷한 답변 여러 개를 만들고,
+# 답변 수를 늘려 가며 색인 구축 시간, 한 건씩 추가하는 시간, 검색 시간, 묶음 수와 순도(같은 원형끼리 묶였는지)를 출력함.
+#
+#   python tools/bench_clusters.py
+#   python tools/bench_clusters.py --sizes 1000 5000 10000 --threshold 0.5
+#   python tools/bench_clusters.py --db class_data.sqlite3     # 실제 저장소의 최종 답변으로 측정
+import argparse
+import random
+import re
+import statistics
+import time
+from collections import Counter
+
+from common import DEFAULT_LOCAL_DB_PATH
+
+from answer_clusters import AnswerIndex, CharNgramVectorizer
+from task_content import MODEL_ANSWERS
+
+FILLERS = ["음", "제 생각에는", "그래서", "아마", "저는", "그리고", "예를 들면", "즉"]
+
+
+def make_archetypes(count, rng):
+    sentences = [s.strip() for text in MODEL_ANSWERS.values() for s in re.split(r"(?<=[.!?])\s+|\n+", text) if len(s.strip()) > 15]
+    return [" ".join(rng.sample(sentences, rng.randint(1, 3))) for _ in range(count)]
+
+
+def perturb(text, rng):
+    words = text.split()
+    words = [w for w in words if rng.random() > 0.15] or words[:1]
+    for _ in range(rng.randint(0, 2)):
+        i = rng.randrange(len(words))
+        words[i:i + 2] = words[i:i + 2][::-1]
+    for _ in range(rng.randint(0, 2)):
+        words.insert(rng.randrange(len(words) + 1), rng.choice(FILLERS))
+    chars = list(" ".join(words))
+    for _ in range(rng.randint(0, 3)):
+        chars[rng.randrange(len(chars))] = rng.choice("가나다라마바사아자차카타파하")
+    return "".join(chars)
+
+
+def synthetic_answers(size, archetype_count, rng):
+    archetypes = make_archetypes(archetype_count, rng)
+    labels = [rng.randrange(archetype_count) for _ in range(size)]
+    return [perturb(archetypes[label], rng) for label in labels], labels
+
+
+def purity(index, labels):
+    # 묶음마다 가장 많은 원형이 차지하는 비율의 가중 평균 (1.0이면 서로 다른 원형이 섞인 묶음이 없음)
+    clusters = index.clusters()
+    majority = sum(Counter(labels[key] for key, _, _ in cluster["members"]).most_common(1)[0][1] for cluster in clusters)
+    return majority / max(1, len(index))
+
+
+def bench(texts, labels, args, rng):
+    vectorizer = CharNgramVectorizer(args.features)
+    index = AnswerIndex(vectorizer, threshold=args.threshold)
+    # 처음 구축: 한 번에 벡터로 바꾸고 순서대로 묶음에 넣음 (대시보드를 처음 열 때)
+    build_count = max(1, len(texts) - args.incremental)
+    started = time.perf_counter()
+    index.add_many((i, texts[i], {"total_score": 0}) for i in range(build_count))
+    build_seconds = time.perf_counter() - started
+    # 이후 한 건씩 추가 (수업 중 새 최종 제출)
+    add_times = []
+    for i in range(build_count, len(texts)):
+        started = time.perf_counter()
+        index.add(i, texts[i], total_score=0)
+        add_times.append(time.perf_counter() - started)
+    query_times = []
+    for _ in range(args.queries):
+        text = texts[rng.randrange(len(texts))]
+        started = time.perf_counter()
+        index.query(text, k=10)
+        query_times.append(time.perf_counter() - started)
+    started = time.perf_counter()
+    index.clusters()
+    clusters_seconds = time.perf_counter() - started
+    stats = index.stats()
+    return {
+        "answers": len(texts),
+        "build_s": build_seconds,
+        "add_ms": statistics.median(add_times) * 1000 if add_times else 0.0,
+        "query_p50_ms": statistics.median(query_times) * 1000,
+        "query_p95_ms": sorted(query_times)[int(0.95 * (len(query_times) - 1))] * 1000,
+        "clusters_ms": clusters_seconds * 1000,
+        "clusters": stats["clusters"],
+        "purity": purity(index, labels) if labels is not None else None,
+        "memory_mb": stats["bytes"] / 2**20,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="답변 묶음 색인의 구축/검색 시간을 측정합니다.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 1000, 2000, 5000])
+    parser.add_argument("--archetypes", type=int, default=40, help="합성 답변의 원형 수")
+    parser.add_argument("--features", type=int, default=1024)
+    parser.add_argument("--threshold", type=float, default=0.6)
+    parser.add_argument("--incremental", type=int, default=100, help="마지막에 한 건씩 추가하는 답변 수")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--db", default=None, help="합성 답변 대신 이 저장소의 최종 답변을 질문별로 측정")
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    runs = []
+    if args.db:
+        from local_store import LocalStore
+        by_question = {}
+        for row in LocalStore(args.db or DEFAULT_LOCAL_DB_PATH).final_answers():
+            by_question.setdefault(row["question_id"], []).append(row["answer"])
+        for question_id, texts in sorted(by_question.items()):
+            runs.append((question_id, bench(texts, None, args, rng)))
+    else:
+        for size in args.sizes:
+            texts, labels = synthetic_answers(size, args.archetypes, rng)
+            runs.append((f"합성 {size}", bench(texts, labels, args, rng)))
+
+    print(f"특성 {args.features}개, 유사도 기준 {args.threshold}, 마지막 {args.incremental}건은 한 건씩 추가")
+    print(f"{'데이터':<12}{'답변':>7}{'구축(초)':>10}{'추가(ms)':>10}{'검색 p50':>10}{'검색 p95':>10}{'묶기(ms)':>10}{'묶음':>7}{'순도':>7}{'메모리(MB)':>11}")
+    for label, result in runs:
+        purity_text = f"{result['purity']:.2f}" if result["purity"] is not None else "-"
+        print(f"{label:<12}{result['answers']:>7}{result['build_s']:>10.2f}{result['add_ms']:>10.2f}"
+              f"{result['query_p50_ms']:>10.2f}{result['query_p95_ms']:>10.2f}{result['clusters_ms']:>10.1f}"
+              f"{result['clusters']:>7}{purity_text:>7}{result['memory_mb']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
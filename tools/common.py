@@ -0,0 +1,48 @@
+# tools/ 아래 오프라인 도구들이 함께 쓰는 설정/클라이언트 생성 함수
+import os
+import sys
+import tomllib
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    # python tools/xxx.py 로 실행해도 저장소 루트의 모듈(task_content, gsheet_sync 등)을 불러올 수 있게 함
+    sys.path.insert(0, ROOT_DIR)
+
+from app_config import CONFIG  # noqa: E402  (sys.path 설정 뒤에 불러옴)
+
+# 로컬 저장소는 도구를 어느 디렉터리에서 실행해도 저장소 루트의 파일을 기본으로 씀
+DEFAULT_LOCAL_DB_PATH = os.path.join(ROOT_DIR, CONFIG["LOCAL_DB_PATH"])
+GSPREAD_SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
+
+
+def load_secrets(path=None):
+    path = path or os.path.join(ROOT_DIR, ".streamlit", "secrets.toml")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def make_openai_client(secrets):
+    from openai import OpenAI
+    api_key = secrets.get("openai_api_key") or os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        raise SystemExit("OpenAI API 키가 없습니다. .streamlit/secrets.toml 또는 OPENAI_API_KEY를 확인하세요.")
+    return OpenAI(api_key=api_key, base_url=secrets.get("openai_base_url"), max_retries=0)
+
+
+def make_gspread_client(secrets):
+    import gspread
+    if "google_sheets_auth" not in secrets:
+        raise SystemExit("Google Sheets 인증 정보([google_sheets_auth])가 secrets에 설정되지 않았습니다.")
+    return gspread.service_account_from_dict(dict(secrets["google_sheets_auth"]), scopes=GSPREAD_SCOPES)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = (len(ordered) - 1) * q / 100
+    lower = int(index)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (index - lower)
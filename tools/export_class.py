@@ -0,0 +1,52 @@
+# 학급 전체 제출 기록을 분석용 파일(Parquet, gzip CSV)로 내보내는 도구
+# submissions.*에는 채점 요소별 점수 열(score_…)이, final_feedback.*에는 수업 만족도 응답이 들어감.
+#
+#   python tools/export_class.py --out class_export
+#   python tools/export_class.py --source sheet --out class_export    # 저장소가 없는 예전 수업: Sheets에서 한 번에 받아옴
+import argparse
+import os
+import time
+import tracemalloc
+
+from common import CONFIG, DEFAULT_LOCAL_DB_PATH, load_secrets, make_gspread_client
+
+from class_export import export_class, sheet_rows, store_rows
+from task_content import QUESTIONS, SCORING_RUBRIC
+
+
+def main():
+    parser = argparse.ArgumentParser(description="학급 전체 제출 기록을 Parquet/CSV로 내보냅니다.")
+    parser.add_argument("--source", choices=["store", "sheet"], default="store")
+    parser.add_argument("--db", default=DEFAULT_LOCAL_DB_PATH)
+    parser.add_argument("--sheet-name", default=CONFIG["GSHEET_NAME"])
+    parser.add_argument("--secrets", default=None)
+    parser.add_argument("--out", default="class_export")
+    parser.add_argument("--row-group-size", type=int, default=5000)
+    parser.add_argument("--ranges-per-request", type=int, default=100, help="Sheets values_batch_get 한 번에 받을 워크시트 수")
+    args = parser.parse_args()
+
+    handles = None
+    if args.source == "store":
+        from local_store import LocalStore
+        rows = store_rows(LocalStore(args.db))
+    else:
+        from gsheet_sync import SheetHandleCache
+        handles = SheetHandleCache(make_gspread_client(load_secrets(args.secrets)), args.sheet_name)
+        rows = sheet_rows(handles, ranges_per_request=args.ranges_per_request)
+
+    started = time.perf_counter()
+    tracemalloc.start()
+    summary = export_class(rows, args.out, SCORING_RUBRIC, QUESTIONS, row_group_size=args.row_group_size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    for table, result in summary.items():
+        print(f"{table}: {result['rows']}행 (row group {result['row_groups']}개)")
+        for path in result["files"]:
+            print(f"  {path} ({os.path.getsize(path) / 1024:,.1f} KB)")
+    print(f"\n{time.perf_counter() - started:.1f}초, 최대 Python 메모리 {peak / 2**20:.1f} MB", end="")
+    print(f", Sheets API 호출 {handles.stats()['api_calls']}회" if handles is not None else "")
+
+
+if __name__ == "__main__":
+    main()
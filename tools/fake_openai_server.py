@@ -0,0 +1,130 @@
+# 로컬에서 스케줄러/부하를 시험하기 위한 가짜 OpenAI 서버 (chat completions만 흉내 냄)
+#
+#   python tools/fake_openai_server.py --port 8765 --latency 2.0 --rate-limit 0.2
+#
+# .streamlit/secrets.toml 에 openai_base_url = "http://127.0.0.1:8765/v1" 을 넣으면 앱이 이 서버로 요청함.
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import common  # noqa: F401  (저장소 루트를 sys.path에 넣음)
+
+# 응답 내용은 부하 시험용 대역(fake_services)과 같은 것을 씀
+from fake_services import fake_feedback
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    options = None
+    lock = threading.Lock()
+    active = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_rate_limited(self):
+        self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                        headers={"retry-after": str(self.options.retry_after)})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+            return
+
+        opts = self.options
+        with self.lock:
+            over_capacity = FakeOpenAIHandler.active >= opts.max_concurrency
+            if not over_capacity:
+                FakeOpenAIHandler.active += 1
+        if over_capacity:
+            self._send_rate_limited()
+            return
+        try:
+            if random.random() < opts.rate_limit:
+                self._send_rate_limited()
+                return
+            if random.random() < opts.server_error:
+                self._send_json(500, {"error": {"message": "The server had an error", "type": "server_error"}})
+                return
+            messages = request.get("messages", [])
+            prompt_tokens = sum(len(m.get("content", "")) for m in messages)
+            content = json.dumps(fake_feedback(messages), ensure_ascii=False)
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(content), "total_tokens": prompt_tokens + len(content)}
+            if request.get("stream"):
+                self._stream(request, content, usage)
+            else:
+                time.sleep(opts.latency)
+                self._send_json(200, {
+                    "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": request.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": usage
+                })
+        finally:
+            with self.lock:
+                FakeOpenAIHandler.active -= 1
+
+    def _stream(self, request, content, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send_event(payload):
+            data = f"data: {payload}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        time.sleep(self.options.first_token_latency)
+        pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+        per_piece = max(0.0, self.options.latency - self.options.first_token_latency) / max(1, len(pieces))
+        for piece in pieces:
+            send_event(json.dumps({
+                "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": request.get("model"),
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+            }, ensure_ascii=False))
+            time.sleep(per_piece)
+        if (request.get("stream_options") or {}).get("include_usage"):
+            send_event(json.dumps({
+                "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": request.get("model"),
+                "choices": [], "usage": usage
+            }))
+        send_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="가짜 OpenAI chat completions 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=2.0, help="응답 완료까지 걸리는 시간(초)")
+    parser.add_argument("--first-token-latency", type=float, default=0.5, help="스트리밍 첫 토큰까지 걸리는 시간(초)")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="429를 돌려줄 확률")
+    parser.add_argument("--server-error", type=float, default=0.0, help="500을 돌려줄 확률")
+    parser.add_argument("--max-concurrency", type=int, default=10, help="이보다 많이 동시에 들어오면 429")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    options = parser.parse_args()
+
+    FakeOpenAIHandler.options = options
+    server = ThreadingHTTPServer((options.host, options.port), FakeOpenAIHandler)
+    print(f"가짜 OpenAI 서버: http://{options.host}:{options.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# Google Sheets에만 남아 있는 예전 제출 기록을 로컬 저장소(class_data.sqlite3)로 가져오는 도구
+# 가져온 행은 이미 Sheets에 있으므로 복제 완료로 표시하고, 같은 행은 다시 실행해도 한 번만 들어감.
+# 앱이 기록해 Sheets로 복제한 행도 (학생, 질문, 시도, 최종 여부, 시각)이 같은 기록이 이미 있으면 건너뜀.
+#
+#   python tools/import_sheets.py
+#   python tools/import_sheets.py --sheet-name "trigonometric music" --db class_data.sqlite3
+import argparse
+import time
+
+from common import CONFIG, DEFAULT_LOCAL_DB_PATH, load_secrets, make_gspread_client
+
+from gsheet_sync import SHEET_HEADER, ClassSnapshotCache, SheetHandleCache
+from local_store import LocalStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Google Sheets의 학생 워크시트를 로컬 저장소로 가져옵니다.")
+    parser.add_argument("--sheet-name", default=CONFIG["GSHEET_NAME"])
+    parser.add_argument("--db", default=DEFAULT_LOCAL_DB_PATH)
+    parser.add_argument("--secrets", default=None)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    handles = SheetHandleCache(make_gspread_client(load_secrets(args.secrets)), args.sheet_name)
+    snapshots = ClassSnapshotCache(handles, refresh_interval=0)
+    snapshots.refresh()
+    store = LocalStore(args.db)
+
+    # 워크시트 이름은 학생 이름에서 특수문자를 뺀 것이므로, 앱이 이미 기록한 학생이면 그 이름으로 가져와 같은 기록을 알아봄
+    names = store.names_by_worksheet()
+    total_rows = total_inserted = 0
+    for worksheet in snapshots.student_names():
+        student_name = names.get(worksheet, worksheet)
+        rows = [[record.get(column, "") for column in SHEET_HEADER] for record in snapshots.records(worksheet)]
+        inserted = store.import_sheet_rows(student_name, rows, synced=True)
+        total_rows += len(rows)
+        total_inserted += inserted
+        print(f"{student_name}: {len(rows)}행 중 {inserted}행 추가")
+
+    print(f"\n워크시트 {len(snapshots.student_names())}개, {total_rows}행 중 {total_inserted}행 추가 "
+          f"({time.perf_counter() - started:.1f}초, Sheets API 호출 {handles.stats()['api_calls']}회)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# 예전 버전 앱의 로그(student_data/*.json)를 로컬 저장소(class_data.sqlite3)로 옮기는 도구
+# 파일을 조금씩 읽어 batch 크기만큼 모이면 한 트랜잭션으로 넣으므로 몇 GB짜리 보관 파일도 메모리에 올리지 않음.
+# 같은 기록은 source_key로 걸러져 다시 실행해도 한 번만 들어가고, 옮긴 기록은 교사 대시보드에 바로 나타남.
+#
+#   python tools/ingest_legacy.py student_data/*.json
+#   python tools/ingest_legacy.py archive/2024_1학기.json --student-name "1반 김철수"
+#   python tools/ingest_legacy.py student_data/*.json --mirror-to-sheets   # Google Sheets에도 복제 (앱이 돌 때 기록됨)
+import argparse
+import os
+import sys
+import time
+
+from common import DEFAULT_LOCAL_DB_PATH
+
+from legacy_logs import iter_legacy_submissions, legacy_store_row
+from local_store import LocalStore
+
+
+class Progress:
+    def __init__(self, total_bytes, interval=2.0):
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.done_bytes = 0
+        self.file_bytes = 0
+        self.rows = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.started = time.perf_counter()
+        self._last_print = 0.0
+
+    def on_read(self, bytes_read):
+        self.file_bytes = bytes_read
+
+    def on_skip(self, entry):
+        self.skipped += 1
+
+    def add_batch(self, rows, inserted):
+        self.rows += rows
+        self.inserted += inserted
+
+    def finish_file(self):
+        self.done_bytes += self.file_bytes
+        self.file_bytes = 0
+
+    def report(self, force=False):
+        now = time.perf_counter()
+        if not force and now - self._last_print < self.interval:
+            return
+        self._last_print = now
+        elapsed = now - self.started
+        read = self.done_bytes + self.file_bytes
+        share = read / self.total_bytes if self.total_bytes else 1.0
+        print(f"\r{share:6.1%}  {read / 2**20:,.1f}/{self.total_bytes / 2**20:,.1f} MB  "
+              f"기록 {self.rows:,}건 (새로 {self.inserted:,}건, 다른 과제 {self.skipped:,}건 건너뜀)  "
+              f"{self.rows / elapsed if elapsed else 0:,.0f}건/초", end="", file=sys.stderr, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="예전 student_data/*.json 로그를 로컬 저장소로 옮깁니다.")
+    parser.add_argument("paths", nargs="+", help="옮길 로그 파일 (JSON 배열)")
+    parser.add_argument("--db", default=DEFAULT_LOCAL_DB_PATH)
+    parser.add_argument("--student-name", default=None, help="로그에 학생 이름이 없으므로 지정하지 않으면 파일 이름을 씀")
+    parser.add_argument("--batch-size", type=int, default=2000, help="한 트랜잭션에 넣을 행 수")
+    parser.add_argument("--mirror-to-sheets", action="store_true", help="옮긴 행을 Google Sheets 복제 대상에 포함")
+    args = parser.parse_args()
+    if args.student_name and len(args.paths) > 1:
+        parser.error("--student-name은 파일 하나를 옮길 때만 쓸 수 있습니다.")
+
+    store = LocalStore(args.db)
+    progress = Progress(sum(os.path.getsize(path) for path in args.paths))
+    for path in args.paths:
+        file_rows = file_inserted = 0
+        batch = []
+        submissions = iter_legacy_submissions(path, args.student_name, on_progress=progress.on_read, on_skip=progress.on_skip)
+        for submission in submissions:
+            batch.append(legacy_store_row(submission, synced=not args.mirror_to_sheets))
+            if len(batch) < args.batch_size:
+                continue
+            inserted = store.insert_submissions(batch)
+            file_rows, file_inserted = file_rows + len(batch), file_inserted + inserted
+            progress.add_batch(len(batch), inserted)
+            progress.report()
+            batch = []
+        inserted = store.insert_submissions(batch)
+        file_rows, file_inserted = file_rows + len(batch), file_inserted + inserted
+        progress.add_batch(len(batch), inserted)
+        progress.finish_file()
+        progress.report(force=True)
+        print(file=sys.stderr)
+        print(f"{path}: {file_rows}건 중 {file_inserted}건 추가 ({file_rows - file_inserted}건은 이미 있음)")
+
+    elapsed = time.perf_counter() - progress.started
+    print(f"\n파일 {len(args.paths)}개, 기록 {progress.rows:,}건 중 {progress.inserted:,}건 추가, "
+          f"다른 과제 기록 {progress.skipped:,}건 건너뜀 ({elapsed:.1f}초)")
+    if args.mirror_to_sheets and progress.inserted:
+        print("추가된 행은 앱이 실행 중일 때 Google Sheets에 복제됩니다.")
+
+
+if __name__ == "__main__":
+    main()
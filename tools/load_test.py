@@ -0,0 +1,257 @@
+# 학급 규모 부하 시험
+# 학생 N명이 동시에 로그인 → 질문 7개 답변/피드백 → 최종 제출 → 만족도 제출까지 진행하는 상황을
+# Streamlit AppTest로 재현하고, 화면 갱신(rerun)과 외부 호출(OpenAI, Sheets)의 지연 시간 분포를 출력함.
+# OpenAI와 Google Sheets는 fake_services.py의 대역을 쓰므로 실제 API 키나 요금 없이 돌릴 수 있음.
+#
+#   python tools/load_test.py --students 30 --openai-latency 4 --sheets-rpm 60
+import argparse
+import atexit
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from common import ROOT_DIR, percentile
+
+import streamlit as st
+from streamlit.runtime.runtime import Runtime
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.runtime.secrets import Secrets
+from streamlit.testing.v1 import AppTest
+
+from fake_services import CALLS
+from local_store import LocalStore
+from task_content import QUESTION_ORDER, QUESTIONS
+
+APP_PATH = os.path.join(ROOT_DIR, "streamlit_app.py")
+
+
+class StepTimer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, step, seconds):
+        with self._lock:
+            self.durations[step].append(seconds)
+
+    def error(self, step):
+        with self._lock:
+            self.errors[step] += 1
+
+
+def find_button(at, label):
+    for button in at.button:
+        if button.label == label:
+            return button
+    raise LookupError(f"'{label}' 버튼이 화면에 없습니다.")
+
+
+def timed_run(at, timer, step, action=None):
+    started = time.perf_counter()
+    if action is None:
+        at.run()
+    else:
+        action.run()
+    timer.record(step, time.perf_counter() - started)
+    if at.exception:
+        timer.error(step)
+        raise RuntimeError(f"{step}: {at.exception[0].message}")
+
+
+def share_apptest_globals(fake_services):
+    # AppTest는 한 프로세스에서 하나씩 돌리는 것을 전제로 실행마다 전역 상태를 바꿔 끼웠다가 되돌림.
+    # 학생 여러 명을 스레드로 동시에 돌리면 먼저 끝난 실행이 다른 학생의 전역 상태를 지우므로 한 번만 설정해 둠.
+    #   - secrets: AppTest에 넘기지 않고 프로세스 전체의 st.secrets로 설정
+    #   - Runtime: 실행이 끝나면 Runtime._instance가 None이 되므로, 마지막으로 만들어진 가짜 Runtime을 계속 돌려줌
+    #   - 스크립트 컴파일: AppTest는 rerun마다 새 ScriptCache로 다시 컴파일하는데, 실제 서버처럼 한 번 컴파일한 것을 공유함
+    #     (Python 3.11의 ast.parse는 여러 스레드에서 동시에 부르면 SystemError가 나기도 함)
+    st.secrets = Secrets()
+    st.secrets._secrets = {"fake_services": fake_services}
+
+    last_runtime = {}
+    original_instance = Runtime.instance.__func__
+
+    def instance(cls):
+        if cls._instance is not None:
+            last_runtime["runtime"] = cls._instance
+        return cls._instance or last_runtime.get("runtime") or original_instance(cls)
+
+    def exists(cls):
+        return cls._instance is not None or "runtime" in last_runtime
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+
+    shared_cache = ScriptCache()
+    compile_lock = threading.Lock()
+    original_get_bytecode = ScriptCache.get_bytecode
+
+    def get_bytecode(self, script_path):
+        with compile_lock:
+            return original_get_bytecode(shared_cache, script_path)
+
+    ScriptCache.get_bytecode = get_bytecode
+
+
+def graph_screenshot(index, size=(2400, 1500)):
+    # GeoGebra 캡처 크기 정도의 PNG (학생마다 색을 달리 해 중복 제거에 걸리지 않게 함)
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(img)
+    draw.line([(x, size[1] // 2 + int(300 * ((x * (index + 3)) % 200 - 100) / 100)) for x in range(0, size[0], 8)],
+              fill=((index * 53) % 256, 80, 200), width=6)
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def simulate_student(index, args, timer, think_time):
+    at = AppTest.from_file(APP_PATH, default_timeout=args.rerun_timeout)
+    name = f"부하학생{index:03d}"
+
+    timed_run(at, timer, "첫 화면")
+    timed_run(at, timer, "학생 시작", find_button(at, "👨‍🎓 학생으로 시작하기").click())
+    at.text_input(key="student_name_input").input(name)
+    timed_run(at, timer, "로그인", find_button(at, "탐구 시작하기").click())
+
+    for q_key in QUESTION_ORDER:
+        for attempt in range(args.attempts):
+            think_time()
+            # 학생마다 답변이 달라야 피드백 캐시가 아닌 AI 호출 경로를 거침
+            if q_key == "1-2":
+                # 함수식이 없으면 규칙 채점(off_topic)으로 끝나 AI 호출 경로를 거치지 않음
+                answer = f"{name}의 {q_key} 답변 {attempt + 1}: y = 0.5*sin(2*pi*784*x - 1.57) 로 G5 소리를 만들었어요."
+            else:
+                answer = f"{name}의 {q_key} 답변 {attempt + 1}: A는 소리의 크기, B는 소리의 높이와 관련이 있다고 생각합니다."
+            at.text_area(key=f"ans_{q_key}").input(answer)
+            if attempt == 0 and QUESTIONS[q_key].get("has_image_upload"):
+                at.get("file_uploader")[0].upload(f"{q_key}.png", graph_screenshot(index), "image/png")
+            timed_run(at, timer, "답변 제출(AI 피드백)", find_button(at, "🚀 답변 제출하고 피드백 받기").click())
+        timed_run(at, timer, "질문 완료", find_button(at, "✅ 이 질문 완료 & 다음으로").click())
+
+    think_time()
+    at.text_area[0].input("소리와 그래프를 같이 볼 수 있어서 좋았어요.")
+    at.text_area[1].input("기다리는 시간이 조금 길었어요.")
+    timed_run(at, timer, "만족도 제출", find_button(at, "만족도 제출하기").click())
+
+
+def print_table(title, rows):
+    print(f"\n[{title}]")
+    print(f"{'항목':<34}{'횟수':>7}{'실패':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'최대':>9}")
+    for label, values, failures in rows:
+        if not values:
+            continue
+        print(f"{label:<34}{len(values):>7}{failures:>6}"
+              f"{percentile(values, 50):>9.2f}{percentile(values, 95):>9.2f}{percentile(values, 99):>9.2f}{max(values):>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="가짜 OpenAI/Sheets로 학급 규모 부하를 재현합니다.")
+    parser.add_argument("--students", type=int, default=30)
+    parser.add_argument("--ramp", type=float, default=10.0, help="학생들이 접속하는 데 걸리는 시간(초)")
+    parser.add_argument("--attempts", type=int, default=1, help="질문마다 피드백을 받는 횟수")
+    parser.add_argument("--think-time", type=float, default=1.0, help="답변 사이 평균 대기 시간(초)")
+    parser.add_argument("--rerun-timeout", type=float, default=180.0)
+    parser.add_argument("--drain-timeout", type=float, default=120.0, help="끝난 뒤 Sheets 기록이 비워지길 기다리는 시간(초)")
+    parser.add_argument("--openai-latency", type=float, default=3.0)
+    parser.add_argument("--openai-first-token-latency", type=float, default=0.8)
+    parser.add_argument("--openai-model-latency", action="append", default=[], metavar="MODEL=SECONDS",
+                        help="모델별 응답 시간 (예: gpt-4o-mini=1.0). 여러 번 쓸 수 있음")
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--openai-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--openai-rpm", type=int, default=0, help="가짜 OpenAI의 분당 요청 한도 (0이면 없음)")
+    parser.add_argument("--sheets-latency", type=float, default=0.4)
+    parser.add_argument("--sheets-error-rate", type=float, default=0.0)
+    parser.add_argument("--sheets-rpm", type=int, default=60, help="가짜 Sheets의 분당 요청 한도")
+    parser.add_argument("--keep-workdir", action="store_true", help="저널/캐시/업로드가 남은 작업 폴더를 지우지 않음")
+    args = parser.parse_args()
+    model_latency = {}
+    for item in args.openai_model_latency:
+        model, _, seconds = item.partition("=")
+        model_latency[model] = float(seconds)
+    args.fake_services = {
+        "openai_latency": args.openai_latency,
+        "openai_first_token_latency": args.openai_first_token_latency,
+        "openai_model_latency": model_latency,
+        "openai_error_rate": args.openai_error_rate,
+        "openai_rate_limit_rate": args.openai_rate_limit_rate,
+        "openai_requests_per_minute": args.openai_rpm,
+        "sheets_latency": args.sheets_latency,
+        "sheets_error_rate": args.sheets_error_rate,
+        "sheets_requests_per_minute": args.sheets_rpm,
+    }
+
+    # 앱이 상대 경로로 만드는 파일(저널, 피드백 캐시, 업로드 폴더)이 저장소를 더럽히지 않도록 임시 폴더에서 실행
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    os.chdir(workdir)
+    print(f"작업 폴더: {workdir}")
+    if not args.keep_workdir:
+        # 앱의 SheetWriter도 atexit로 정리되므로, 그보다 먼저 등록해 가장 마지막에 지워지게 함
+        atexit.register(shutil.rmtree, workdir, True)
+
+    share_apptest_globals(args.fake_services)
+
+    timer = StepTimer()
+    failures = []
+    failures_lock = threading.Lock()
+
+    def think_time():
+        if args.think_time > 0:
+            time.sleep(random.expovariate(1 / args.think_time))
+
+    def run_student(index):
+        try:
+            simulate_student(index, args, timer, think_time)
+        except Exception as e:
+            with failures_lock:
+                failures.append((index, repr(e)))
+
+    started = time.perf_counter()
+    threads = []
+    for index in range(args.students):
+        thread = threading.Thread(target=run_student, args=(index,), name=f"student-{index}", daemon=True)
+        thread.start()
+        threads.append(thread)
+        if args.students > 1:
+            time.sleep(args.ramp / (args.students - 1))
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    # 앱의 SheetWriter가 아직 Sheets에 복제하지 못한 행 수 (앱과 같은 SQLite 파일을 읽음)
+    store = LocalStore(os.path.join(workdir, "class_data.sqlite3"))
+    drain_started = time.perf_counter()
+    while store.unsynced_count() and time.perf_counter() - drain_started < args.drain_timeout:
+        time.sleep(0.5)
+    drain_elapsed = time.perf_counter() - drain_started
+
+    print(f"\n학생 {args.students}명, 완주 {args.students - len(failures)}명, 소요 {elapsed:.1f}초")
+    print_table("화면 갱신 지연(초)", [
+        (step, values, timer.errors.get(step, 0)) for step, values in timer.durations.items()
+    ])
+
+    by_call = defaultdict(lambda: ([], [0]))
+    for service, operation, latency, ok in CALLS.snapshot():
+        values, failed = by_call[f"{service}.{operation}"]
+        values.append(latency)
+        if not ok:
+            failed[0] += 1
+    print_table("외부 호출 지연(초)", [(label, values, failed[0]) for label, (values, failed) in sorted(by_call.items())])
+
+    remaining = store.unsynced_count()
+    print(f"\n저장된 제출 {store.counts()['submissions']}건, Sheets 미전송 행: {remaining}개 (종료 후 {drain_elapsed:.1f}초 대기)")
+    for index, error in failures[:10]:
+        print(f"  학생 {index} 실패: {error}")
+
+    sys.exit(1 if failures or remaining else 0)
+
+
+if __name__ == "__main__":
+    main()
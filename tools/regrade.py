@@ -0,0 +1,493 @@
+# 저장된 답변을 현재 SCORING_RUBRIC / PROMPT_TEMPLATE로 다시 채점하는 오프라인 도구
+#
+#   python tools/regrade.py --source legacy student_data/*.json --out regrade.parquet
+#   python tools/regrade.py --source store --workers 8 --out regrade.parquet
+#   python tools/regrade.py --source sheet --workers 8 --out regrade.parquet
+#   python tools/regrade.py --source sheet --mode batch --out regrade.parquet
+#   python tools/regrade.py --source store --pre-grade-only    # 규칙 채점으로 AI 호출을 얼마나 줄일 수 있는지만 확인
+#   python tools/regrade.py --source store --cascade --out regrade.parquet
+#
+# 기본은 --model 하나로 모든 답변을 채점함. --cascade를 주면 앱과 같이 질문별 빠른 모델로 먼저 채점하고,
+# 앱과 같은 기준(escalation_reason)에 걸린 답변만 큰 모델로 다시 채점함 (--mode pool에서만).
+# 결과는 --checkpoint 파일(JSON Lines)에 한 건씩 기록되므로, 중간에 멈춰도 같은 명령으로 다시 실행하면
+# 끝난 답변은 건너뛰고 이어서 채점함. 요청 실패(429, 시간 초과 등)나 형식 오류로 끝난 답변은 다시 채점함.
+# 마지막에 체크포인트 전체를 Parquet 파일로 씀.
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from types import SimpleNamespace
+
+from common import CONFIG, DEFAULT_LOCAL_DB_PATH, load_secrets, make_gspread_client, make_openai_client, percentile
+
+from ai_coach import ModelCascadeStats, compile_prompts, escalation_reason, model_route, parse_feedback
+from ai_scheduler import AIRequestScheduler
+from legacy_logs import iter_legacy_submissions
+from pre_grader import pre_grade
+from task_content import MODEL_ANSWERS, PROMPT_TEMPLATE, QUESTIONS, SCORING_RUBRIC, STUDENT_ANSWER_TEMPLATE
+
+RESULT_COLUMNS = [
+    ("submission_id", "string"), ("source", "string"), ("student_name", "string"), ("timestamp", "string"),
+    ("question_id", "string"), ("attempt", "int64"), ("is_final", "bool_"), ("answer", "string"),
+    ("original_total_score", "float64"), ("new_total_score", "float64"), ("score_delta", "float64"),
+    ("new_scores", "string"), ("analysis", "string"), ("suggestion", "string"), ("model", "string"),
+    ("latency_s", "float64"), ("prompt_tokens", "int64"), ("completion_tokens", "int64"),
+    ("escalation_reason", "string"), ("error", "string"), ("graded_at", "string"),
+]
+
+
+# --- 채점 대상 읽기 ---
+def iter_sheet_submissions(secrets, sheet_name):
+    from gsheet_sync import ClassSnapshotCache, SheetHandleCache
+    handles = SheetHandleCache(make_gspread_client(secrets), sheet_name)
+    snapshots = ClassSnapshotCache(handles, refresh_interval=0)
+    snapshots.refresh()
+    for student_name in snapshots.student_names():
+        for row_number, record in enumerate(snapshots.records(student_name), start=2):
+            question_id = str(record.get("Question ID", ""))
+            if question_id not in QUESTIONS:
+                continue
+            yield {
+                "submission_id": f"sheet:{student_name}:{row_number}",
+                "source": "sheet",
+                "student_name": student_name,
+                "timestamp": str(record.get("Timestamp", "")),
+                "question_id": question_id,
+                "attempt": int(record.get("Attempt") or 1),
+                "is_final": str(record.get("Is Final", "")).upper() == "TRUE",
+                "answer": str(record.get("Student Answer", "")),
+                "original_total_score": record.get("Total Score"),
+            }
+
+
+def iter_store_submissions(db_path):
+    from local_store import LocalStore
+    if not os.path.exists(db_path):
+        raise SystemExit(f"로컬 저장소 파일이 없습니다: {db_path}")
+    for row in LocalStore(db_path).iter_submissions():
+        if row["question_id"] not in QUESTIONS:
+            continue
+        yield {
+            "submission_id": f"store:{row['id']}",
+            "source": "store",
+            "student_name": row["student_name"],
+            "timestamp": row["created_at"],
+            "question_id": row["question_id"],
+            "attempt": row["attempt"],
+            "is_final": bool(row["is_final"]),
+            "answer": row["answer"],
+            "original_total_score": row["total_score"],
+        }
+
+
+def iter_submissions(args, secrets):
+    if args.source == "legacy":
+        for path in args.paths:
+            yield from iter_legacy_submissions(path)
+    elif args.source == "store":
+        yield from iter_store_submissions(args.db)
+    else:
+        yield from iter_sheet_submissions(secrets, args.sheet_name)
+
+
+# --- 체크포인트 ---
+# 다시 실행해도 결과가 바뀌지 않는 오류. 나머지 오류(request_failed, batch_error, invalid_response)는 다시 채점함
+PERMANENT_ERRORS = ("unknown_question", "too_short")
+
+
+def is_finished(record):
+    return not record["error"] or record["error"] in PERMANENT_ERRORS
+
+
+def load_checkpoint(path):
+    done = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                done[record["submission_id"]] = record
+    return done
+
+
+def as_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def make_result(submission, model, feedback=None, error="", latency=None, usage=None, reason=None):
+    original = as_number(submission.get("original_total_score"))
+    new = as_number(feedback.get("total_score")) if feedback else None
+    return {
+        "submission_id": submission["submission_id"],
+        "source": submission["source"],
+        "student_name": submission["student_name"],
+        "timestamp": submission.get("timestamp", ""),
+        "question_id": submission["question_id"],
+        "attempt": submission.get("attempt", 1),
+        "is_final": bool(submission.get("is_final", False)),
+        "answer": submission["answer"],
+        "original_total_score": original,
+        "new_total_score": new,
+        "score_delta": new - original if new is not None and original is not None else None,
+        "new_scores": json.dumps(feedback.get("scores", {}), ensure_ascii=False) if feedback else "",
+        "analysis": feedback.get("analysis", "") if feedback else "",
+        "suggestion": feedback.get("suggestion", "") if feedback else "",
+        "model": model,
+        "latency_s": latency,
+        "prompt_tokens": getattr(usage, "prompt_tokens", None) if usage is not None else None,
+        "completion_tokens": getattr(usage, "completion_tokens", None) if usage is not None else None,
+        "escalation_reason": reason,
+        "error": error,
+        "graded_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def precheck(submission, args, prompts):
+    # 앱과 같은 기준으로, 채점하지 않을 답변과 규칙으로 결론이 나는 답변은 모델을 부르지 않고 바로 결과를 만듦
+    if submission["question_id"] not in QUESTIONS:
+        return make_result(submission, args.model, error="unknown_question")
+    if len(submission["answer"].strip()) < args.min_length:
+        return make_result(submission, args.model, error="too_short")
+    if not args.no_pre_grade:
+        question_id = submission["question_id"]
+        feedback = pre_grade(question_id, submission["answer"], QUESTIONS[question_id], prompts[question_id].criteria)
+        if feedback is not None:
+            return make_result(submission, feedback["graded_by"], feedback=feedback, latency=0.0)
+    return None
+
+
+# --- 방식 1: 제한된 작업자 풀로 동시에 채점 ---
+def request_grading(client, scheduler, compiled, submission, model, tier, args, cascade_stats):
+    messages = compiled.messages(submission["answer"])
+
+    def request(ticket):
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=args.temperature,
+            response_format={"type": "json_object"},
+            timeout=ticket.remaining()
+        )
+        if response.usage is not None:
+            ticket.record_usage(response.usage.total_tokens)
+        return response
+
+    started = time.perf_counter()
+    response = scheduler.call(request, len(compiled.system_prompt) + len(submission["answer"]) + 800)
+    cascade_stats.record_call(tier, model, response.usage, time.perf_counter() - started)
+    return response
+
+
+def add_usage(first, second):
+    if first is None or second is None:
+        return first or second
+    return SimpleNamespace(prompt_tokens=(first.prompt_tokens or 0) + (second.prompt_tokens or 0),
+                           completion_tokens=(first.completion_tokens or 0) + (second.completion_tokens or 0))
+
+
+def grade_one(client, scheduler, prompts, submission, args, cascade_stats):
+    question_id = submission["question_id"]
+    compiled = prompts[question_id]
+    if args.cascade:
+        model, escalation_model = model_route(CONFIG["AI_MODEL_ROUTES"], question_id, args.model)
+    else:
+        model, escalation_model = args.model, None
+
+    started = time.perf_counter()
+    try:
+        response = request_grading(client, scheduler, compiled, submission, model, "primary", args, cascade_stats)
+    except Exception as e:
+        return make_result(submission, model, error=f"request_failed: {e}", latency=time.perf_counter() - started)
+    usage = response.usage
+    feedback, error = parse_feedback(response.choices[0].message.content, compiled.max_score)
+
+    # 앱과 같은 기준으로 빠른 모델의 결과가 미덥지 않으면 큰 모델로 한 번 더 채점 (실패하면 형식에 맞는 빠른 모델 결과를 씀)
+    reason = None
+    fallback = False
+    if escalation_model:
+        reason = escalation_reason(feedback, error, compiled.max_score, args.min_confidence, args.escalate_partial)
+    if reason is not None:
+        try:
+            escalated = request_grading(client, scheduler, compiled, submission, escalation_model, "escalation", args, cascade_stats)
+        except Exception as e:
+            if error:
+                return make_result(submission, escalation_model, error=f"request_failed: {e}",
+                                   latency=time.perf_counter() - started, usage=usage, reason=reason)
+            fallback = True
+        else:
+            usage = add_usage(usage, escalated.usage)
+            escalated_feedback, escalated_error = parse_feedback(escalated.choices[0].message.content, compiled.max_score)
+            if escalated_error and not error:
+                fallback = True
+            else:
+                feedback, error, model = escalated_feedback, escalated_error, escalation_model
+    if args.cascade:
+        cascade_stats.record_result(question_id, reason, fallback)
+    latency = time.perf_counter() - started
+    if error:
+        return make_result(submission, model, error=f"invalid_response: {error}", latency=latency, usage=usage, reason=reason)
+    return make_result(submission, model, feedback=feedback, latency=latency, usage=usage, reason=reason)
+
+
+def run_pool(client, prompts, submissions, args, record, cascade_stats):
+    scheduler = AIRequestScheduler(
+        max_concurrency=args.workers,
+        requests_per_minute=args.requests_per_minute,
+        tokens_per_minute=args.tokens_per_minute,
+        default_deadline=args.deadline
+    )
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        in_flight = set()
+        for submission in submissions:
+            in_flight.add(pool.submit(grade_one, client, scheduler, prompts, submission, args, cascade_stats))
+            # 대기 작업을 작업자 수의 두 배로 묶어 두어, 입력이 아무리 커도 메모리가 늘지 않게 함
+            if len(in_flight) >= args.workers * 2:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record(future.result())
+        for future in wait(in_flight).done:
+            record(future.result())
+
+
+# --- 방식 2: OpenAI Batch API (24시간 안에 처리, 비용 절반) ---
+def run_batch(client, prompts, submissions, args, record):
+    state_path = args.checkpoint + ".batch.json"
+    pending = {submission["submission_id"]: submission for submission in submissions}
+    if os.path.exists(state_path):
+        with open(state_path, encoding="utf-8") as f:
+            state = json.load(f)
+        print(f"이전에 제출한 배치 {state['batch_id']}를 이어서 기다립니다.")
+    else:
+        if not pending:
+            return
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False, encoding="utf-8") as f:
+            for submission_id, submission in pending.items():
+                compiled = prompts[submission["question_id"]]
+                f.write(json.dumps({
+                    "custom_id": submission_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": args.model,
+                        "messages": compiled.messages(submission["answer"]),
+                        "temperature": args.temperature,
+                        "response_format": {"type": "json_object"}
+                    }
+                }, ensure_ascii=False) + "\n")
+            request_path = f.name
+        with open(request_path, "rb") as f:
+            input_file = client.files.create(file=f, purpose="batch")
+        os.remove(request_path)
+        batch = client.batches.create(input_file_id=input_file.id, endpoint="/v1/chat/completions", completion_window="24h")
+        state = {"batch_id": batch.id}
+        with open(state_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        print(f"배치 {batch.id}를 제출했습니다 ({len(pending)}건).")
+
+    while True:
+        batch = client.batches.retrieve(state["batch_id"])
+        counts = batch.request_counts
+        if counts is not None:
+            print(f"  상태: {batch.status} ({counts.completed}/{counts.total} 완료, 실패 {counts.failed})")
+        if batch.status in ("completed", "failed", "expired", "cancelled"):
+            break
+        time.sleep(args.poll_interval)
+
+    if batch.output_file_id:
+        for line in client.files.content(batch.output_file_id).text.splitlines():
+            item = json.loads(line)
+            submission = pending.get(item["custom_id"])
+            if submission is None:
+                continue
+            response = (item.get("response") or {}).get("body") or {}
+            if item.get("error") or not response.get("choices"):
+                record(make_result(submission, args.model, error=f"batch_error: {item.get('error')}"))
+                continue
+            compiled = prompts[submission["question_id"]]
+            feedback, error = parse_feedback(response["choices"][0]["message"]["content"], compiled.max_score)
+            usage = SimpleNamespace(**response["usage"]) if response.get("usage") else None
+            if error:
+                record(make_result(submission, args.model, error=f"invalid_response: {error}", usage=usage))
+            else:
+                record(make_result(submission, args.model, feedback=feedback, usage=usage))
+    os.remove(state_path)
+    if batch.status != "completed":
+        print(f"배치가 {batch.status} 상태로 끝났습니다. 다시 실행하면 남은 답변으로 새 배치를 만듭니다.")
+
+
+# --- 결과 저장 및 보고 ---
+def write_parquet(records, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = pa.schema([(name, getattr(pa, dtype)()) for name, dtype in RESULT_COLUMNS])
+    table = pa.Table.from_pylist(records, schema=schema)
+    pq.write_table(table, path, compression="zstd")
+
+
+def print_pre_grade_report(results, needs_ai):
+    # 길이 기준을 통과한 답변 중 규칙 채점으로 끝난 비율 (= 앱에서 AI 호출을 생략하는 비율)
+    by_rule = {}
+    for r in results:
+        if r["model"].startswith("rule:"):
+            by_rule[r["model"]] = by_rule.get(r["model"], 0) + 1
+    pre_graded = sum(by_rule.values())
+    checked = pre_graded + needs_ai
+    if not checked:
+        return
+    print(f"규칙 채점으로 AI 호출 생략: {pre_graded}/{checked}건 ({pre_graded / checked:.0%})")
+    for rule, count in sorted(by_rule.items(), key=lambda item: -item[1]):
+        print(f"  {rule}: {count}건")
+
+
+def print_cascade_report(cascade_stats):
+    stats = cascade_stats.stats()
+    if not stats["graded"]:
+        return
+    print(f"큰 모델로 다시 채점: {stats['escalated']}/{stats['graded']}건 ({stats['escalation_rate']:.0%})")
+    reasons = {}
+    for row in stats["by_question"].values():
+        for reason, count in row["reasons"].items():
+            reasons[reason] = reasons.get(reason, 0) + count
+    for reason, count in sorted(reasons.items(), key=lambda item: -item[1]):
+        print(f"  {reason}: {count}건")
+    for key, row in sorted(stats["by_tier"].items()):
+        print(f"  {key}: 호출 {row['calls']}회 · 평균 {row['mean_latency']:.2f}s · "
+              f"프롬프트 토큰 {row['prompt_tokens']} · 응답 토큰 {row['completion_tokens']}")
+
+
+def print_report(results, elapsed):
+    graded = [r for r in results if not r["error"]]
+    latencies = [r["latency_s"] for r in results if r["latency_s"] is not None and not r["model"].startswith("rule:")]
+    print(f"\n이번 실행: {len(results)}건 처리 (채점 {len(graded)}, 오류/제외 {len(results) - len(graded)}), {elapsed:.1f}초")
+    if elapsed > 0 and results:
+        print(f"처리량: {len(results) / elapsed * 60:.1f} 답변/분")
+    if latencies:
+        print("지연 시간: p50 {:.2f}s · p95 {:.2f}s · p99 {:.2f}s".format(
+            percentile(latencies, 50), percentile(latencies, 95), percentile(latencies, 99)))
+
+    deltas = [r for r in graded if r["score_delta"] is not None]
+    if deltas:
+        up = sum(1 for r in deltas if r["score_delta"] > 0)
+        down = sum(1 for r in deltas if r["score_delta"] < 0)
+        mean = sum(r["score_delta"] for r in deltas) / len(deltas)
+        print(f"점수 변화 (원래 점수와 비교 {len(deltas)}건): 평균 {mean:+.2f} · 상승 {up} · 하락 {down} · 동일 {len(deltas) - up - down}")
+        by_question = {}
+        for r in deltas:
+            by_question.setdefault(r["question_id"], []).append(r["score_delta"])
+        for question_id in sorted(by_question):
+            values = by_question[question_id]
+            print(f"  {question_id}: {len(values)}건, 평균 {sum(values) / len(values):+.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="저장된 답변을 현재 채점 기준으로 다시 채점합니다.")
+    parser.add_argument("--source", choices=["legacy", "store", "sheet"], required=True)
+    parser.add_argument("paths", nargs="*", help="--source legacy일 때 읽을 student_data/*.json 파일")
+    parser.add_argument("--db", default=DEFAULT_LOCAL_DB_PATH, help="--source store일 때 읽을 로컬 저장소")
+    parser.add_argument("--sheet-name", default=CONFIG["GSHEET_NAME"])
+    parser.add_argument("--mode", choices=["pool", "batch"], default="pool")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--requests-per-minute", type=int, default=500)
+    parser.add_argument("--tokens-per-minute", type=int, default=300000)
+    parser.add_argument("--deadline", type=float, default=300.0, help="답변 하나당 재시도를 포함한 최대 시간(초)")
+    parser.add_argument("--poll-interval", type=float, default=30.0)
+    parser.add_argument("--model", default=CONFIG["AI_MODEL"], help="--cascade가 없으면 모든 답변을 이 모델로 채점")
+    parser.add_argument("--cascade", action="store_true",
+                        help="앱처럼 질문별 빠른 모델로 먼저 채점하고, 미덥지 않은 결과만 큰 모델로 다시 채점")
+    parser.add_argument("--min-confidence", type=float, default=CONFIG["AI_MIN_CONFIDENCE"],
+                        help="--cascade: 빠른 모델의 확신도가 이보다 낮으면 다시 채점")
+    parser.add_argument("--escalate-partial", action="store_true", default=CONFIG["AI_ESCALATE_PARTIAL_SCORE"],
+                        help="--cascade: 2점 문항의 부분 점수도 다시 채점")
+    parser.add_argument("--temperature", type=float, default=CONFIG["AI_TEMPERATURE"])
+    parser.add_argument("--min-length", type=int, default=CONFIG["MIN_ANSWER_LENGTH"])
+    parser.add_argument("--no-pre-grade", action="store_true", help="규칙 채점 없이 모든 답변을 모델로 채점")
+    parser.add_argument("--pre-grade-only", action="store_true", help="모델을 부르지 않고 규칙 채점 비율만 출력")
+    parser.add_argument("--checkpoint", default="regrade_checkpoint.jsonl")
+    parser.add_argument("--out", default="regrade.parquet")
+    parser.add_argument("--secrets", default=None)
+    args = parser.parse_args()
+    if args.source == "legacy" and not args.paths:
+        parser.error("--source legacy에는 읽을 파일 경로가 필요합니다.")
+    if args.cascade and args.mode != "pool":
+        parser.error("--cascade는 빠른 모델의 결과를 보고 다시 채점하므로 --mode pool에서만 쓸 수 있습니다.")
+
+    prompts = compile_prompts(QUESTIONS, SCORING_RUBRIC, MODEL_ANSWERS, PROMPT_TEMPLATE, STUDENT_ANSWER_TEMPLATE)
+    if args.pre_grade_only:
+        secrets = load_secrets(args.secrets) if args.source == "sheet" else {}
+        results = []
+        needs_ai = 0
+        for submission in iter_submissions(args, secrets):
+            result = precheck(submission, args, prompts)
+            if result is None:
+                needs_ai += 1
+            else:
+                results.append(result)
+        print(f"답변 {len(results) + needs_ai}건 (길이 미달/알 수 없는 질문 {sum(1 for r in results if r['error'])}건)")
+        print_pre_grade_report(results, needs_ai)
+        return
+
+    secrets = load_secrets(args.secrets)
+    client = make_openai_client(secrets)
+
+    done = load_checkpoint(args.checkpoint)
+    if done:
+        retry_count = sum(1 for record in done.values() if not is_finished(record))
+        print(f"체크포인트에서 이미 끝난 {len(done) - retry_count}건을 건너뜁니다.")
+        if retry_count:
+            print(f"요청 실패/형식 오류로 끝난 {retry_count}건은 다시 채점합니다.")
+    results = []
+    needs_ai = [0]
+    cascade_stats = ModelCascadeStats()
+    checkpoint = open(args.checkpoint, "a", encoding="utf-8")
+
+    def record(result):
+        checkpoint.write(json.dumps(result, ensure_ascii=False) + "\n")
+        checkpoint.flush()
+        done[result["submission_id"]] = result
+        results.append(result)
+        if len(results) % 50 == 0:
+            print(f"  {len(results)}건 처리...")
+
+    def remaining_submissions():
+        for submission in iter_submissions(args, secrets):
+            previous = done.get(submission["submission_id"])
+            if previous is not None and is_finished(previous):
+                continue
+            skipped = precheck(submission, args, prompts)
+            if skipped is not None:
+                record(skipped)
+                continue
+            needs_ai[0] += 1
+            yield submission
+
+    started = time.perf_counter()
+    try:
+        if args.mode == "pool":
+            run_pool(client, prompts, remaining_submissions(), args, record, cascade_stats)
+        else:
+            run_batch(client, prompts, remaining_submissions(), args, record)
+    except KeyboardInterrupt:
+        print("\n중단했습니다. 같은 명령으로 다시 실행하면 이어서 채점합니다.")
+        sys.exit(1)
+    finally:
+        checkpoint.close()
+
+    print_report(results, time.perf_counter() - started)
+    print_pre_grade_report(results, needs_ai[0])
+    if args.cascade:
+        print_cascade_report(cascade_stats)
+    write_parquet(list(done.values()), args.out)
+    print(f"결과 {len(done)}건을 {args.out}에 저장했습니다.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# 콜드 스타트 측정
+# 새 파이썬 프로세스에서 앱의 첫 화면(메인 페이지)이 그려질 때까지 걸리는 시간을 여러 번 재고,
+# 첫 화면 시점에 무거운 모듈(pandas, openai 등)이 이미 불러와져 있으면 실패로 처리함.
+# 수업 시작에 맞춰 컨테이너가 늘어날 때의 지연이 다시 나빠지지 않았는지 확인하는 용도.
+#
+#   python tools/startup_bench.py --runs 5
+#   python tools/startup_bench.py --importtime     # 첫 화면까지 불러온 모듈을 누적 시간 순으로 출력
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT_DIR, percentile
+
+# 첫 화면을 그릴 때는 필요 없으므로 불러와져 있으면 안 되는 모듈 (PIL은 st.image가 직접 불러오므로 제외)
+HEAVY_MODULES = ["pandas", "openai", "gspread", "google.oauth2", "pyarrow"]
+
+# 자식 프로세스에서 실행할 코드: 첫 화면을 그리고 걸린 시간과 불러온 무거운 모듈을 JSON으로 출력
+CHILD_CODE = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app_path!r}, default_timeout=60)
+at.run()
+first_page = time.perf_counter() - started
+labels = [button.label for button in at.button]
+print(json.dumps({{
+    "first_page": first_page,
+    "rendered": any("학생으로 시작하기" in label for label in labels),
+    "exception": [str(e.message) for e in at.exception],
+    "heavy_modules": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def run_child(extra_args=()):
+    code = CHILD_CODE.format(app_path=os.path.join(ROOT_DIR, "streamlit_app.py"), heavy=HEAVY_MODULES)
+    # 앱이 만드는 파일(업로드 폴더, 캐시)이 저장소에 생기지 않도록 임시 폴더에서 실행
+    with tempfile.TemporaryDirectory(prefix="startup_bench_") as workdir:
+        started = time.perf_counter()
+        proc = subprocess.run([sys.executable, *extra_args, "-c", code], cwd=workdir, capture_output=True, text=True)
+        wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise SystemExit(f"자식 프로세스 실패:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["wall"] = wall
+    return result, proc.stderr
+
+
+def print_importtime(stderr, top):
+    # -X importtime 출력: "import time: self [us] | cumulative | imported package"
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.rstrip()))
+    print(f"\n[누적 import 시간 상위 {top}개] (최상위 모듈만)")
+    # 들여쓰기가 없는 줄이 최상위 import (하위 모듈은 단계마다 공백 두 칸씩 들여씀)
+    top_level = [(us, name.strip()) for us, name in rows if not name.startswith("  ")]
+    for us, name in sorted(top_level, reverse=True)[:top]:
+        print(f"{us / 1000:>9.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="새 프로세스에서 첫 화면까지 걸리는 시간을 잽니다.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=None, help="첫 화면 p50이 이 시간(초)을 넘으면 실패")
+    parser.add_argument("--importtime", action="store_true", help="-X importtime으로 한 번 더 실행해 느린 import를 출력")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    results = [run_child()[0] for _ in range(args.runs)]
+    first_page = [r["first_page"] for r in results]
+    wall = [r["wall"] for r in results]
+    print(f"실행 {args.runs}회")
+    print(f"  프로세스 시작 → 첫 화면 (프로세스 전체): p50 {percentile(wall, 50):.2f}초, 최대 {max(wall):.2f}초")
+    print(f"  streamlit import → 첫 화면:            p50 {percentile(first_page, 50):.2f}초, 최대 {max(first_page):.2f}초")
+
+    failed = False
+    if not all(r["rendered"] for r in results) or any(r["exception"] for r in results):
+        print(f"  첫 화면이 제대로 그려지지 않았습니다: {results[-1]['exception']}")
+        failed = True
+    heavy = sorted({name for r in results for name in r["heavy_modules"]})
+    if heavy:
+        print(f"  첫 화면 시점에 불러와진 무거운 모듈: {', '.join(heavy)}")
+        failed = True
+    if args.budget is not None and percentile(first_page, 50) > args.budget:
+        print(f"  예산 {args.budget:.2f}초 초과")
+        failed = True
+
+    if args.importtime:
+        _, stderr = run_child(["-X", "importtime"])
+        print_importtime(stderr, args.top)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()